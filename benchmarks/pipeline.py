@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#
+# pipeline.py
+# Author: Alex Kozadaev (2014)
+#
+# Pipelined vs serial sender benchmark. Sends the requests of radi.py
+# (plain and with the Message-Authenticator) to a local UDP socket (not
+# read - the packets are dropped by the kernel) serially (encode, sign,
+# sendto one request at a time like radi.py --count) and through
+# libradi.pipeline with the given numbers of the signing threads. The
+# results can be saved as json.
+#
+# usage: pipeline.py [-n REQUESTS] [-w WORKERS,...] [-o RESULTS_JSON]
+#
+
+import getopt
+import itertools
+import json
+import os
+import platform
+import socket
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import libradi  # noqa: E402
+from libradi import pipeline  # noqa: E402
+
+
+def make_request(signed):
+    avp = libradi.radius.intern_avp
+    rad = libradi.RadiusMessage("secret")
+    for name, value in (("User-Name", "johndoe"), ("Acct-Status-Type", 1),
+                        ("NAS-IP-Address", "127.0.0.1"),
+                        ("Framed-IP-Address", "10.0.0.1"),
+                        ("Framed-Protocol", 1),
+                        ("Calling-Station-Id", "00441234987654"),
+                        ("Called-Station-Id", "web.apn"),
+                        ("3GPP-IMSI", "12345678901234"),
+                        ("3GPP-IMEISV", "8654320150123401")):
+        rad.add_avp(avp(name, value))
+    if signed:
+        rad.add_avp(libradi.RadiusAvp("Message-Authenticator", bytes(16)))
+    return rad
+
+
+def serial(requests, count, dest):
+    """the radi.py --count loop"""
+    sock = libradi.create_socket(dest[0])
+    started = time.perf_counter()
+    pid = None
+    for n in range(count):
+        rad = next(requests)
+        if pid is not None:
+            rad.pid = pid
+        sock.sendto(rad.dump(), dest)
+        pid = (rad.pid + 1) & 0xff
+    elapsed = time.perf_counter() - started
+    sock.close()
+    return count, elapsed
+
+
+def benchmark(count, workers):
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    dest = sink.getsockname()
+    results = {}
+    try:
+        for signed in (False, True):
+            request = make_request(signed)
+            name = "signed" if signed else "plain"
+            runs = {"serial": serial(itertools.repeat(request), count, dest)}
+            for n in workers:
+                runs[f"pipeline-{n}"] = pipeline.Pipeline(dest, workers=n) \
+                    .send(itertools.repeat(request), count)
+            results[name] = {run: {"pps": round(sent / elapsed, 1),
+                                   "elapsed_s": round(elapsed, 3)}
+                             for run, (sent, elapsed) in runs.items()}
+    finally:
+        sink.close()
+    return {
+        "python": platform.python_version(),
+        "free_threaded": pipeline.free_threaded(),
+        "cpus": os.cpu_count(),
+        "requests": count,
+        "results": results,
+    }
+
+
+def report(results):
+    print(f"python {results['python']} (free-threaded: "
+          f"{results['free_threaded']}), {results['cpus']} CPUs")
+    for name, runs in results["results"].items():
+        base = runs["serial"]["pps"]
+        for run, result in runs.items():
+            print(f"{name:<7}{run:<14}{result['pps']:12.1f} pps  "
+                  f"x{result['pps'] / base:.2f}")
+
+
+def main():
+    opts, args = getopt.getopt(sys.argv[1:], "n:w:o:")
+    opts = dict(opts)
+    libradi.dictionary.initialize(os.path.join(ROOT, "dict"), "dictionary")
+    workers = [int(n) for n in opts.get("-w", "1,2,4").split(",")]
+    results = benchmark(int(opts.get("-n", 100000)), workers)
+    report(results)
+    if "-o" in opts:
+        with open(opts["-o"], "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
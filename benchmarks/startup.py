@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#
+# startup.py
+# Author: Alex Kozadaev (2014)
+#
+# radi.py cold start benchmark. Measures the wall time of "radi.py -h" and
+# of a single accounting start and the import times reported by
+# "python -X importtime". The results can be saved as json and compared
+# against a saved baseline.
+#
+# usage: startup.py [-n RUNS] [-o RESULTS_JSON] [-b BASELINE_JSON]
+#
+
+import getopt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RADI = os.path.join(ROOT, "radi.py")
+
+SCENARIOS = {
+    "help": [RADI, "-h"],
+    "send": [RADI, "-S", "-P", os.path.join(ROOT, "dict"), "--profile",
+             "bench"],
+}
+
+
+def run(args, cwd, importtime=False):
+    """run the python interpreter returning (wall time, stderr)"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    start = time.perf_counter()
+    result = subprocess.run(command + args, cwd=cwd, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, check=True)
+    return time.perf_counter() - start, result.stderr.decode()
+
+
+def parse_importtime(output):
+    """return the total import time and the cumulative import time of each
+    top level import (microseconds)"""
+    imports = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header
+        if not name.startswith("  "):  # top level import (one space)
+            imports[name.strip()] = int(cumulative)
+    return sum(imports.values()), imports
+
+
+def benchmark(runs):
+    results = {}
+    with tempfile.TemporaryDirectory() as cwd:  # keeps the profiles away
+        for name, args in SCENARIOS.items():
+            run(args, cwd)  # warm up the page cache and the bytecode
+            times = [run(args, cwd)[0] * 1000 for n in range(runs)]
+            total, imports = parse_importtime(run(args, cwd, True)[1])
+            results[name] = {
+                "wall_ms": round(statistics.median(times), 2),
+                "wall_min_ms": round(min(times), 2),
+                "import_us": total,
+                "imports": dict(
+                    sorted(imports.items(), key=lambda item: -item[1])[:10]),
+            }
+    return {
+        "python": platform.python_version(),
+        "runs": runs,
+        "results": results,
+    }
+
+
+def report(results, baseline=None):
+    for name, result in results["results"].items():
+        line = (f"{name:<6} wall {result['wall_ms']:8.2f} ms  "
+                f"imports {result['import_us'] / 1000:8.2f} ms")
+        if baseline and name in baseline["results"]:
+            base = baseline["results"][name]
+            line += (f"  (baseline {base['wall_ms']:.2f} ms / "
+                     f"{base['import_us'] / 1000:.2f} ms)")
+        print(line)
+        for module, cumulative in result["imports"].items():
+            print(f"         {module:<24} {cumulative / 1000:8.2f} ms")
+
+
+def main():
+    opts, args = getopt.getopt(sys.argv[1:], "n:o:b:")
+    opts = dict(opts)
+    baseline = None
+    if "-b" in opts:
+        with open(opts["-b"]) as f:
+            baseline = json.load(f)
+
+    results = benchmark(int(opts.get("-n", 20)))
+    report(results, baseline)
+    if "-o" in opts:
+        with open(opts["-o"], "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
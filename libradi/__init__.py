@@ -4,14 +4,20 @@
 # Author: Alex Kozadaev (2014)
 #
 
-import sys
+import importlib
 
-sys.path.append("libradi")
+# the submodules are imported on the first access (eg. libradi.radtypes),
+# so importing the package itself costs (almost) nothing
+__submodules__ = ("radtypes", "dictionary", "radius", "decoder", "pcap",
+                  "replay", "analysis", "profiles", "daemon", "pacing",
+                  "histogram", "client", "server", "flatdict", "eap",
+                  "stream", "balancer", "proxy",
+                  "identities", "scenario", "storm",
+                  "spool", "pipeline", "usage",
+                  "journal")
 
-import radtypes
-import dictionary
-
-from radius import *
+# the names re-exported from the radius module
+__radius_names__ = ("RadiusAvp", "RadiusMessage", "create_socket")
 
 __version__ = "0.06"
 __author__ = "Alex Kozadaev"
@@ -38,3 +44,16 @@ __license__ = \
     DEALINGS IN THE SOFTWARE."""
 
 __doc__ = "libradi - simple radius library"
+
+
+def __getattr__(name):
+    if name in __submodules__:
+        return importlib.import_module(f".{name}", __name__)
+    if name in __radius_names__:
+        return getattr(importlib.import_module(".radius", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(__submodules__) +
+                  list(__radius_names__))
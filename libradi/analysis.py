@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+#
+# analysis.py
+# Author: Alex Kozadaev (2014)
+#
+
+import ipaddress
+import multiprocessing
+from collections import Counter
+
+from . import decoder
+from . import dictionary
+from . import pcap
+
+DEFAULT_ATTRIBUTES = ("Acct-Status-Type", "Framed-IP-Address",
+                      "3GPP-Location-Info")
+
+# 3GPP TS 29.061 geographic location types
+LOCATION_TYPES = {
+    0: "CGI",
+    1: "SAI",
+    2: "RAI",
+    128: "TAI",
+    129: "ECGI",
+    130: "TAI+ECGI",
+}
+
+
+class PacketStats:
+    """Per attribute packet statistics
+
+    The counters are kept in columns - one Counter per attribute keyed by
+    the raw binary value, so the packets are never fully decoded. The
+    values are decoded (and resolved via the dictionary) once per distinct
+    value when the summary is built.
+
+    keys - a list of (vendor_id, attr_id) tuples of the counted attributes
+    """
+
+    def __init__(self, keys):
+        self.packets = 0
+        self.malformed = 0
+        self.codes = Counter()
+        self.columns = {tuple(key): Counter() for key in keys}
+
+    def add(self, packet):
+        """count a single radius packet"""
+        try:
+            code, pid, length, auth = decoder.unpack_header(packet)
+            columns = self.columns
+            for vendor_id, attr_id, value in decoder.iter_attributes(
+                    packet, length):
+                column = columns.get((vendor_id, attr_id))
+                if column is not None:
+                    column[bytes(value)] += 1
+        except ValueError:
+            self.malformed += 1
+            return
+        self.packets += 1
+        self.codes[code] += 1
+
+    def update(self, packets):
+        """count all packets in the iterable of (timestamp, packet)"""
+        for timestamp, packet in packets:
+            self.add(packet)
+        return self
+
+    def merge(self, other):
+        """add up the counters of another PacketStats object"""
+        self.packets += other.packets
+        self.malformed += other.malformed
+        self.codes.update(other.codes)
+        for key, column in other.columns.items():
+            self.columns.setdefault(key, Counter()).update(column)
+        return self
+
+
+def attribute_key(attribute):
+    """(vendor_id, attr_id) of the dictionary attribute (see
+    decoder.iter_attributes())"""
+    vendor = attribute.attr_vendor
+    if attribute.attr_parent and not vendor:
+        return (0, attribute.get_oid())  # extended attribute
+    return (vendor.vendor_id if vendor else 0, attribute.attr_id)
+
+
+def format_location_info(value):
+    """3GPP-Location-Info as the location type and the PLMN (MCC-MNC)"""
+    if len(value) < 4:
+        return "0x" + bytes(value).hex()
+    location_type = LOCATION_TYPES.get(value[0], str(value[0]))
+    mcc = f"{value[1] & 0xf}{value[1] >> 4}{value[2] & 0xf}"
+    mnc = f"{value[3] & 0xf}{value[3] >> 4}"
+    if value[2] >> 4 != 0xf:
+        mnc += str(value[2] >> 4)
+    return f"{location_type} {mcc}-{mnc}"
+
+
+def format_value(attribute, value, pool_prefix=24):
+    """string label the raw value is summarised under"""
+    name = attribute.attr_name.lower()
+    if name == "3gpp-location-info":
+        return format_location_info(value)
+    try:
+        decoded = decoder.decode_value(attribute, value)
+    except (ValueError, NotImplementedError):
+        return "0x" + bytes(value).hex()
+
+    if name in ("framed-ip-address", "framed-ipv6-prefix"):
+        address = str(decoded).split("/")[0]
+        prefix = pool_prefix if ":" not in address else max(pool_prefix, 64)
+        return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+    if attribute.has_defined_values():
+        return attribute.get_value_name(decoded) or str(decoded)
+    return str(decoded)
+
+
+def summarize(stats, attributes, pool_prefix=24, top=20):
+    """build the summary tables - a list of (title, total, rows) tuples
+    where rows is a list of (label, count) sorted by count"""
+    codes = [(decoder.PACKET_CODES.get(code, str(code)), count)
+             for code, count in stats.codes.most_common()]
+    tables = [("Packets", stats.packets + stats.malformed,
+               codes + [("Malformed", stats.malformed)])]
+
+    for attribute in attributes:
+        labels = Counter()
+        for value, count in stats.columns[attribute_key(attribute)].items():
+            labels[format_value(attribute, value, pool_prefix)] += count
+        tables.append((attribute.attr_name, sum(labels.values()),
+                       labels.most_common(top)))
+    return tables
+
+
+def format_tables(tables):
+    """format the summary tables as text"""
+    lines = []
+    for title, total, rows in tables:
+        lines.append(f"{title} ({total})")
+        total = total or 1
+        width = max([len(label) for label, count in rows] + [8])
+        for label, count in rows:
+            lines.append(f"  {label:<{width}} {count:>12} "
+                         f"{100.0 * count / total:6.2f}%")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def analyze_chunk(filename, chunk, keys):
+    """count the packets of a capture chunk (runs in a worker process)"""
+    with pcap.PcapReader(filename) as reader:
+        return PacketStats(keys).update(reader.packets(chunk))
+
+
+def analyze(filename, attributes=DEFAULT_ATTRIBUTES, jobs=1):
+    """analyze the capture file counting the values of the attributes
+    (list of attribute names) using jobs worker processes.
+    Returns (stats, attribute definitions)"""
+    attributes = [dictionary.get_attribute(name) for name in attributes]
+    keys = [attribute_key(attribute) for attribute in attributes]
+
+    with pcap.PcapReader(filename) as reader:
+        if jobs <= 1:
+            return PacketStats(keys).update(reader), attributes
+        chunks = reader.split(jobs * 4)  # smaller chunks balance better
+
+    stats = PacketStats(keys)
+    with multiprocessing.Pool(jobs) as pool:
+        results = pool.starmap(analyze_chunk,
+                               [(filename, chunk, keys) for chunk in chunks])
+    for result in results:
+        stats.merge(result)
+    return stats, attributes
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+#
+# balancer.py
+# Author: Alex Kozadaev (2014)
+#
+
+import asyncio
+import bisect
+import copy
+import hashlib
+import time
+
+from . import client
+
+STRATEGIES = ("round-robin", "weighted", "hash")
+VIRTUAL_NODES = 64  # consistent hash ring points per unit of weight
+# the attributes identifying the session (the first one found is hashed)
+SESSION_ATTRIBUTES = ("acct-session-id", "user-name", "calling-station-id",
+                      "framed-ip-address")
+
+
+def ring_hash(data):
+    return int.from_bytes(hashlib.md5(data).digest()[:8], "big")
+
+
+def session_key(message):
+    """return the value of the attribute identifying the session of the
+    RadiusMessage (see SESSION_ATTRIBUTES) - b"" if none is found. The
+    messages which are not decoded (eg. proxy.ForwardedRequest) provide
+    their own session_key()"""
+    if not hasattr(message, "avp_list"):
+        return message.session_key()
+    values = {}
+    for avp in message.avp_list:
+        name = avp.avp_def.attr_name.lower()
+        if name in SESSION_ATTRIBUTES and name not in values:
+            values[name] = avp
+    for name in SESSION_ATTRIBUTES:
+        if name in values:
+            return values[name].encoded_value().dump()
+    return b""
+
+
+class Member:
+    """a server of the pool - the client sending to it and its health.
+    secret is the secret of the server if it has its own (the messages
+    are signed with theirs otherwise)"""
+
+    def __init__(self, dest_tuple, client, weight=1, secret=None):
+        if weight < 1:
+            raise ValueError(f"invalid server weight: {weight}")
+        self.dest_tuple = dest_tuple
+        self.client = client
+        self.weight = weight
+        self.secret = secret
+        self.current = 0  # the smooth weighted round robin state
+        self.failures = 0  # consecutive failed requests
+        self.down_until = 0.0
+        self.requests = 0
+        self.inflight = set()  # the outstanding request tasks
+
+    def sign(self, message):
+        """the message to send to the server - a copy signed with the
+        secret of the server if it differs (the message itself may be
+        outstanding at the other servers)"""
+        if self.secret is None or self.secret == message.secret:
+            return message
+        message = copy.copy(message)
+        message.secret = self.secret
+        return message
+
+    def is_up(self, now):
+        return self.down_until <= now
+
+    def __str__(self):
+        host, port = self.dest_tuple[:2]
+        return f"{host}:{port}"
+
+
+class ServerPool:
+    """Load balancer over several radius servers
+
+    The requests are spread by the strategy:
+        round-robin - in turn
+        weighted    - in proportion to the weights (smooth weighted round
+                      robin - no bursts to the heavy servers)
+        hash        - by the session (see session_key) over a consistent
+                      hash ring, so the Start, Interim and Stop of a
+                      session reach the same server and adding/removing a
+                      server moves only its share of the sessions
+
+    A request not answered (after the retransmissions of the member
+    client) fails over to the next server. A server failing max_failures
+    requests in a row is marked down for dead_time seconds and its
+    outstanding requests are migrated to the other servers at once rather
+    than waiting for their timeouts. The down servers are tried again
+    when dead_time elapses (or when all the servers are down).
+
+    Has the RadiusClient interface (see client.py) - the stats are shared
+    by the members. Use open_pool() to create the pool."""
+
+    def __init__(self, members, secret, strategy="round-robin",
+                 max_failures=3, dead_time=10.0, key=session_key,
+                 stats=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown balancing strategy: {strategy}")
+        if not members:
+            raise ValueError("the server pool is empty")
+        self.members = members
+        self.secret = secret
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.dead_time = dead_time
+        self.key = key
+        self.stats = stats or client.ClientStats()
+        self.index = 0
+        self.failovers = 0
+        self.migrated = 0
+        self.migrating = set()  # the tasks cancelled by record_failure
+        self.ring = []  # sorted (hash, member index)
+        for index, member in enumerate(members):
+            for n in range(VIRTUAL_NODES * member.weight):
+                self.ring.append((ring_hash(f"{member}#{n}".encode()),
+                                  index))
+        self.ring.sort()
+
+    def select(self, message, tried):
+        """return the member to send the message to (None if all the
+        members were tried)"""
+        now = time.monotonic()
+        candidates = [member for member in self.members
+                      if member not in tried and member.is_up(now)]
+        if not candidates:  # all down - better than dropping the request
+            candidates = [member for member in self.members
+                          if member not in tried]
+            if not candidates:
+                return None
+
+        if self.strategy == "hash":
+            position = bisect.bisect(self.ring, (ring_hash(self.key(message)),
+                                                 len(self.members)))
+            for n in range(len(self.ring)):
+                member = self.members[self.ring[(position + n) %
+                                                len(self.ring)][1]]
+                if member in candidates:
+                    return member
+        if self.strategy == "weighted":
+            total = 0
+            for member in candidates:
+                member.current += member.weight
+                total += member.weight
+            best = max(candidates, key=lambda member: member.current)
+            best.current -= total
+            return best
+        for n in range(len(self.members)):
+            member = self.members[self.index]
+            self.index = (self.index + 1) % len(self.members)
+            if member in candidates:
+                return member
+        return candidates[0]
+
+    def record_failure(self, member):
+        member.failures += 1
+        if member.failures < self.max_failures or \
+                not member.is_up(time.monotonic()):
+            return
+        member.down_until = time.monotonic() + self.dead_time
+        for task in member.inflight:
+            if task.cancel():  # migrated by request()
+                self.migrating.add(task)
+
+    async def request(self, message):
+        """send the RadiusMessage returning the response packet or None if
+        no server answered"""
+        tried = []
+        while True:
+            member = self.select(message, tried)
+            if member is None:
+                return None
+            if tried:
+                self.failovers += 1
+            tried.append(member)
+            member.requests += 1
+            task = asyncio.ensure_future(
+                member.client.request(member.sign(message)))
+            member.inflight.add(task)
+            try:
+                response = await task
+            except asyncio.CancelledError:
+                if task not in self.migrating:
+                    raise  # the request itself is cancelled
+                self.migrating.discard(task)
+                self.migrated += 1
+                continue
+            finally:
+                member.inflight.discard(task)
+            if response is None:
+                self.record_failure(member)
+                continue
+            member.failures = 0
+            return response
+
+    def close(self):
+        for member in self.members:
+            member.client.close()
+
+
+async def open_pool(dest_tuples, secret, strategy="round-robin",
+                    weights=None, max_failures=3, dead_time=10.0, open=None,
+                    secrets=None, **kwargs):
+    """create a ServerPool of the servers dest_tuples (dest_ip, dest_port)
+    (see ServerPool). open is the coroutine function opening the client of
+    a server - called with the destination, the secret, the shared stats
+    and the other keyword arguments (client.open_client by default).
+    secrets are the secrets of the servers (see Member) - secret for all
+    of them by default"""
+    open = open or client.open_client
+    stats = kwargs.pop("stats", None) or client.ClientStats()
+    weights = weights or [1] * len(dest_tuples)
+    secrets = secrets or [secret] * len(dest_tuples)
+    if len(weights) != len(dest_tuples):
+        raise ValueError("the number of weights and servers differ")
+    if len(secrets) != len(dest_tuples):
+        raise ValueError("the number of secrets and servers differ")
+    members = []
+    try:
+        for dest_tuple, weight, server_secret in zip(dest_tuples, weights,
+                                                     secrets):
+            member = Member(dest_tuple, None, weight, server_secret)
+            member.client = await open(dest_tuple, server_secret,
+                                       stats=stats, **kwargs)
+            members.append(member)
+        return ServerPool(members, secret, strategy, max_failures,
+                          dead_time, stats=stats)
+    except BaseException:
+        for member in members:
+            member.client.close()
+        raise
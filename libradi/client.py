@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+#
+# client.py
+# Author: Alex Kozadaev (2014)
+#
+
+import asyncio
+import time
+
+from . import decoder
+from . import histogram
+from . import radius
+
+
+class ClientStats:
+    """Request/response counters and the latency histogram
+
+    The latencies are recorded into the interval histogram which is merged
+    into the total one by flush() - so the live reports can show the
+    percentiles of the last interval as well as of the whole run."""
+
+    COUNTERS = ("sent", "acked", "timeouts", "retransmits", "invalid")
+
+    def __init__(self):
+        self.sent = 0  # requests (the retransmissions are not counted)
+        self.acked = 0
+        self.timeouts = 0
+        self.retransmits = 0
+        self.invalid = 0  # unexpected or badly signed responses
+        self.histogram = histogram.Histogram()
+        self.interval = histogram.Histogram()
+
+    def record_latency(self, latency):
+        self.interval.record(latency)
+
+    def flush(self):
+        """merge the interval latencies into the total ones returning the
+        interval histogram"""
+        interval = self.interval
+        self.histogram.merge(interval)
+        self.interval = histogram.Histogram()
+        return interval
+
+    def counters(self):
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def merge(self, other):
+        """add up the stats of another ClientStats object"""
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.histogram.merge(other.histogram).merge(other.interval)
+        return self
+
+    def to_dict(self):
+        self.flush()
+        result = self.counters()
+        result["latency"] = self.histogram.summary()
+        result["histogram"] = self.histogram.to_dict()
+        return result
+
+
+class RadiusClient(asyncio.DatagramProtocol):
+    """Asynchronous radius client (UDP)
+
+    Up to 256 requests (the identifier space) can be outstanding at a
+    time - request() waits for a free identifier. The requests which are
+    not answered within timeout seconds are retransmitted (unchanged)
+    up to retries times. The responses are validated by the response
+    authenticator. The packets sent and received are added to the journal
+    (see libradi.journal) if given.
+
+    Use open_client() to create the client."""
+
+    def __init__(self, secret, timeout=3.0, retries=2, stats=None,
+                 journal=None):
+        self.secret = secret
+        self.timeout = timeout
+        self.retries = retries
+        self.stats = stats or ClientStats()
+        self.journal = journal
+        self.transport = None
+        self.pending = {}  # pid -> (future, request authenticator)
+        self.ids = asyncio.Queue()
+        for pid in range(256):
+            self.ids.put_nowait(pid)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if self.journal:
+            self.journal.received(data)
+        try:
+            code, pid, length, auth = decoder.unpack_header(data)
+        except ValueError:
+            self.stats.invalid += 1
+            return
+        future, request_auth = self.pending.get(pid, (None, None))
+        if future is None or future.done() or bytes(auth) != \
+                radius.response_authenticator(data[:length], request_auth,
+                                              self.secret):
+            self.stats.invalid += 1
+            return
+        future.set_result(data[:length])
+
+    def error_received(self, exc):
+        pass  # eg. ICMP port unreachable - the request times out
+
+    async def request(self, message):
+        """send the RadiusMessage (the identifier is assigned by the client)
+        returning the response packet or None if the request timed out"""
+        pid = await self.ids.get()
+        try:
+            message.pid = pid
+            return await self.request_packet(message.dump())
+        finally:
+            self.ids.put_nowait(pid)
+
+    async def request_packet(self, packet):
+        """send the request packet (its identifier must not be used by
+        any other outstanding request)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending[packet[1]] = (future, packet[4:20])
+        stats = self.stats
+        stats.sent += 1
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    stats.retransmits += 1
+                if self.journal:
+                    self.journal.sent(packet)
+                self.transport.sendto(packet)
+                try:
+                    response = await asyncio.wait_for(asyncio.shield(future),
+                                                      self.timeout)
+                except asyncio.TimeoutError:
+                    continue
+                stats.acked += 1
+                stats.record_latency(time.perf_counter() - started)
+                return response
+            stats.timeouts += 1
+            return None
+        finally:
+            del self.pending[packet[1]]
+            future.cancel()
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+
+async def open_client(dest_tuple, secret, **kwargs):
+    """create a RadiusClient sending the requests to dest_tuple
+    (dest_ip, dest_port). The keyword arguments are passed to RadiusClient"""
+    loop = asyncio.get_running_loop()
+    transport, client = await loop.create_datagram_endpoint(
+        lambda: RadiusClient(secret, **kwargs), remote_addr=dest_tuple)
+    return client
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# daemon.py
+# Author: Alex Kozadaev (2014)
+#
+
+import contextlib
+import io
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+
+# Protocol (line based, utf-8):
+#   request - a command line (the arguments are quoted as in a shell)
+#   reply - zero or more lines of the command output followed by a status
+#           line: ".OK" or ".ERROR <message>". The output lines starting
+#           with a dot are prefixed with an extra dot.
+#
+# Any number of requests can be sent over a single connection and they are
+# executed in order, eg.
+#   $ printf -- '-S -i 1234\n-T -i 1234\n' | nc -U /tmp/radi.sock
+STATUS_OK = ".OK"
+STATUS_ERROR = ".ERROR"
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            output, status = self.server.execute(line.decode("utf-8"))
+            reply = [("." + line if line.startswith(".") else line)
+                     for line in output.splitlines()]
+            reply.append(status)
+            self.wfile.write("".join(f"{line}\n"
+                                     for line in reply).encode("utf-8"))
+            self.wfile.flush()
+
+
+def remove_stale_socket(path):
+    """remove the socket left behind by a previous daemon - raises IOError
+    if a daemon is listening on it or the path is not a socket"""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise IOError(f"{path}: not a socket")
+    except FileNotFoundError:
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)  # nobody is listening
+            return
+    raise IOError(f"{path}: a daemon is already running")
+
+
+class CommandServer(socketserver.ThreadingMixIn,
+                    socketserver.UnixStreamServer):
+    """Unix socket server executing command lines
+
+    handler - callable executing a command (list of arguments). Anything
+              it prints is sent back to the client. The commands are
+              executed one at a time."""
+
+    daemon_threads = True
+
+    def __init__(self, path, handler):
+        remove_stale_socket(path)
+        self.path = path
+        self.handler = handler
+        self.lock = threading.Lock()
+        super().__init__(path, CommandHandler)
+
+    def execute(self, line):
+        """execute the command line returning (output, status line)"""
+        import shlex
+        output = io.StringIO()
+        with self.lock, contextlib.redirect_stdout(output):
+            try:
+                args = shlex.split(line)
+                if args:
+                    self.handler(args)
+                status = STATUS_OK
+            except Exception as e:  # the daemon must keep on running
+                status = f"{STATUS_ERROR} {e}".replace("\n", " ")
+            except SystemExit as e:
+                status = STATUS_ERROR if e.code else STATUS_OK
+        return output.getvalue(), status
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def quote(arg):
+    """quote the argument for shlex.split()"""
+    return "'" + arg.replace("'", "'\"'\"'") + "'"
+
+
+def send_commands(path, commands, output=None):
+    """send the command lines to the daemon writing the replies to output.
+    Returns the number of failed commands"""
+    output = output or sys.stdout
+    failed = 0
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        with sock.makefile("rwb") as stream:
+            for command in commands:
+                stream.write(command.encode("utf-8") + b"\n")
+                stream.flush()
+                for line in stream:
+                    line = line.decode("utf-8").rstrip("\n")
+                    if line.startswith(STATUS_ERROR):
+                        failed += 1
+                        print(f"ERROR: {line[len(STATUS_ERROR):].strip()}",
+                              file=sys.stderr)
+                        break
+                    if line == STATUS_OK:
+                        break
+                    output.write(line[1:] if line.startswith("..") else line)
+                    output.write("\n")
+                else:
+                    raise IOError("connection closed by the daemon")
+    return failed
+
+
+def run_client(path, args):
+    """thin client - forward the arguments to the daemon. The commands are
+    read from stdin (one per line) if there are no arguments. Returns the
+    exit code"""
+    if args:
+        commands = [" ".join(quote(arg) for arg in args)]
+    else:  # the lines are split by the daemon
+        commands = (line.rstrip("\n") for line in sys.stdin if line.strip())
+    try:
+        return 1 if send_commands(path, commands) else 0
+    except (IOError, OSError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+#
+# decoder.py
+# Author: Alex Kozadaev (2014)
+#
+
+import struct
+from . import radtypes
+from .dictionary import get_dictionary
+
+# Radius header (code, identifier, length) - the authenticator follows
+RADIUS_HDR = struct.Struct("!BBH")
+RADIUS_HDR_LEN = 20
+VENDOR_SPECIFIC = 26
+# extended attribute types (RFC 6929)
+EXTENDED_TYPES = range(241, 245)
+LONG_EXTENDED_TYPES = range(245, 247)
+EXTENDED_VENDOR_SPECIFIC = 26
+MORE_FLAG = 0x80
+# (type size, length size, continuation) of the standard VSAs
+STANDARD_FORMAT = (1, 1, False)
+# the value lengths of the fixed width types
+FIXED_LENGTHS = {"integer": 4, "signed": 4, "date": 4, "ipaddr": 4,
+                 "ipv6addr": 16, "short": 2, "byte": 1}
+
+PACKET_CODES = {
+    1: "Access-Request",
+    2: "Access-Accept",
+    3: "Access-Reject",
+    4: "Accounting-Request",
+    5: "Accounting-Response",
+    11: "Access-Challenge",
+    12: "Status-Server",
+    13: "Status-Client",
+    40: "Disconnect-Request",
+    41: "Disconnect-ACK",
+    42: "Disconnect-NAK",
+    43: "CoA-Request",
+    44: "CoA-ACK",
+    45: "CoA-NAK",
+}
+
+
+def unpack_header(data):
+    """return (code, pid, length, authenticator) of the radius packet in
+    data. The authenticator is a slice of data (no copy for memoryviews)"""
+    if len(data) < RADIUS_HDR_LEN:
+        raise ValueError("truncated radius header")
+    code, pid, length = RADIUS_HDR.unpack_from(data)
+    if not RADIUS_HDR_LEN <= length <= len(data):
+        raise ValueError(f"invalid radius packet length: {length}")
+    return code, pid, length, data[4:RADIUS_HDR_LEN]
+
+
+def iter_avps(data, length=None):
+    """iterate over the top level AVPs of a radius packet yielding
+    (code, start, end) offsets of each AVP within data"""
+    if length is None:
+        length = unpack_header(data)[2]
+    offset = RADIUS_HDR_LEN
+    while offset < length:
+        if offset + 2 > length:
+            raise ValueError(f"truncated AVP at offset {offset}")
+        code, avp_len = data[offset], data[offset + 1]
+        if avp_len < 2 or offset + avp_len > length:
+            raise ValueError(f"invalid AVP length at offset {offset}")
+        yield code, offset, offset + avp_len
+        offset += avp_len
+
+
+def vendor_format(vendor_id, dictionary=None):
+    """return (type size, length size, continuation) of the attributes of
+    the vendor - the standard (1, 1, False) format for unknown vendors"""
+    if dictionary is None:
+        dictionary = get_dictionary()
+    vendor = dictionary.get_vendor_by_id(vendor_id)
+    if vendor is None:
+        return STANDARD_FORMAT
+    return vendor.type_size, vendor.length_size, vendor.continuation
+
+
+def avp_key(data, start, end, dictionary=None):
+    """return the key identifying the AVP at data[start:end]: (code,) for
+    regular AVPs, (26, vendor_id, vendor_type) for VSAs (the vendor type
+    field is read in the format of the vendor), (code, extended_type) for
+    the extended attributes and (code, 26, vendor_id, vendor_type) for the
+    Extended-Vendor-Specific ones"""
+    code = data[start]
+    if code in EXTENDED_TYPES or code in LONG_EXTENDED_TYPES:
+        if end - start < 3:
+            return (code,)
+        extended_type = data[start + 2]
+        offset = start + (4 if code in LONG_EXTENDED_TYPES else 3)
+        if extended_type == EXTENDED_VENDOR_SPECIFIC and offset + 5 <= end:
+            vendor_id = struct.unpack_from("!L", data, offset)[0]
+            return (code, extended_type, vendor_id, data[offset + 4])
+        return (code, extended_type)
+    if code == VENDOR_SPECIFIC and end - start >= 7:
+        vendor_id = struct.unpack_from("!L", data, start + 2)[0]
+        type_size = vendor_format(vendor_id, dictionary)[0]
+        if start + 6 + type_size <= end:
+            return (code, vendor_id, int.from_bytes(
+                data[start + 6:start + 6 + type_size], "big"))
+    return (code,)
+
+
+def get_attribute(dictionary, vendor_id, attr_id):
+    """return the attribute definition of the (vendor_id, attr_id) of
+    iter_attributes - raises ValueError if the dictionary does not know
+    the attribute"""
+    if isinstance(attr_id, tuple):  # extended attribute
+        attribute = dictionary.get_attribute_by_id(attr_id[0])
+        try:
+            return attribute.children[attr_id[1]]
+        except KeyError:
+            raise ValueError(f"attribute {attr_id} not found")
+    return dictionary.get_attribute_by_id(attr_id, vendor_id)
+
+
+def is_concat(dictionary, vendor_id, attr_id):
+    """true if the consecutive attributes of the type are concatenated
+    into a single value (the concat flag - eg. EAP-Message)"""
+    try:
+        attribute = get_attribute(dictionary, vendor_id, attr_id)
+    except ValueError:
+        return False
+    return bool(attribute.attr_flags.get("concat"))
+
+
+def iter_fragments(data, length, dictionary):
+    """iterate over the attributes of a radius packet (see
+    iter_attributes) - the consecutive concat attributes are not joined"""
+    fragments = None  # the pending fragments of a long attribute
+    for code, start, end in iter_avps(data, length):
+        if fragments is not None and code != key[0]:
+            raise ValueError(f"incomplete fragmented attribute "
+                             f"at offset {start}")
+        if code in EXTENDED_TYPES or code in LONG_EXTENDED_TYPES:
+            if fragments is not None and \
+                    (end - start < 4 or (code, data[start + 2]) != key):
+                raise ValueError(f"incomplete long extended attribute "
+                                 f"at offset {start}")
+            long_extended = code in LONG_EXTENDED_TYPES
+            offset = start + (4 if long_extended else 3)
+            if offset > end:
+                raise ValueError(f"truncated extended attribute "
+                                 f"at offset {start}")
+            key = (code, data[start + 2])
+            if key[1] == EXTENDED_VENDOR_SPECIFIC and offset + 5 <= end:
+                vendor_id = struct.unpack_from("!L", data, offset)[0]
+                attr_id, offset = data[offset + 4], offset + 5
+            else:
+                vendor_id, attr_id = 0, key
+            more = long_extended and data[start + 3] & MORE_FLAG
+            if more or fragments is not None:
+                if fragments is None:
+                    fragments = []
+                fragments.append(data[offset:end])
+                if more:
+                    continue
+                value, fragments = b"".join(fragments), None
+            else:
+                value = data[offset:end]
+            yield vendor_id, attr_id, value
+            continue
+
+        if code != VENDOR_SPECIFIC or end - start < 7:
+            yield 0, code, data[start + 2:end]
+            continue
+
+        vendor_id = struct.unpack_from("!L", data, start + 2)[0]
+        type_size, length_size, continuation = \
+            vendor_format(vendor_id, dictionary)
+        header = type_size + length_size + continuation
+        offset = start + 6
+        while offset + header <= end:
+            attr_id = int.from_bytes(data[offset:offset + type_size], "big")
+            if length_size:
+                vsa_len = int.from_bytes(
+                    data[offset + type_size:offset + header - continuation],
+                    "big")
+                if vsa_len < header or offset + vsa_len > end:
+                    break  # not in the format of the vendor
+            else:
+                vsa_len = end - offset  # a single attribute
+            value = data[offset + header:offset + vsa_len]
+            more = continuation and data[offset + header - 1] & MORE_FLAG
+            offset += vsa_len
+            if not continuation:
+                yield vendor_id, attr_id, value
+                continue
+            if fragments is not None and \
+                    (VENDOR_SPECIFIC, vendor_id, attr_id) != key:
+                raise ValueError(f"incomplete continued attribute "
+                                 f"at offset {start}")
+            key = (VENDOR_SPECIFIC, vendor_id, attr_id)
+            if more or fragments is not None:
+                if fragments is None:
+                    fragments = []
+                fragments.append(value)
+                if more:
+                    continue
+                value, fragments = b"".join(fragments), None
+            yield vendor_id, attr_id, value
+
+        if offset != end:  # yield the malformed VSA as a whole
+            if fragments is not None:
+                raise ValueError(f"malformed continued attribute "
+                                 f"at offset {start}")
+            yield 0, code, data[start + 2:end]
+    if fragments is not None:
+        raise ValueError("truncated fragmented attribute")
+
+
+def iter_attributes(data, length=None, dictionary=None):
+    """iterate over all attributes of a radius packet yielding
+    (vendor_id, attr_id, value) tuples. The vendor specific attributes
+    are unpacked in the format of the vendor (vendor_id is 0 for the
+    standard attributes). The attr_id of the extended attributes (RFC
+    6929) is the (type, extended type) tuple - or the EVS type for the
+    Extended-Vendor-Specific attributes. The long extended attributes,
+    the continued VSAs and the consecutive attributes with the concat
+    flag (eg. EAP-Message) are reassembled. The vendor formats and the
+    flags are looked up in the dictionary (the default one if None).
+
+    The values are slices of data (no copy for memoryviews) except the
+    reassembled ones"""
+    if dictionary is None:
+        dictionary = get_dictionary()
+    key, values = None, []  # the previous attribute (concat candidate)
+    for vendor_id, attr_id, value in iter_fragments(data, length,
+                                                    dictionary):
+        if values and (vendor_id, attr_id) == key and \
+                (len(values) > 1 or is_concat(dictionary, *key)):
+            values.append(value)
+            continue
+        if values:
+            yield key + (values[0] if len(values) == 1
+                         else b"".join(values), )
+        key, values = (vendor_id, attr_id), [value]
+    if values:
+        yield key + (values[0] if len(values) == 1 else b"".join(values), )
+
+
+def decode_value(attribute, value):
+    """decode the binary value to the radtypes object according to the
+    attribute definition. The values of the types radtypes does not
+    implement and the malformed ones (eg. of a wrong length) are returned
+    as octets"""
+    length = FIXED_LENGTHS.get(attribute.attr_type)
+    if length is None or len(value) == length:
+        try:
+            return radtypes.get_type_obj(attribute.attr_type).load(value)
+        except (ValueError, NotImplementedError):
+            pass
+    return radtypes.OctetsType.load(value)
+
+
+def decode_attributes(data, dictionary=None, length=None):
+    """iterate over all attributes of a radius packet (see
+    iter_attributes) yielding (attribute definition, value) tuples. The
+    attributes are resolved via the dictionary (see dictionary.load) or
+    the default dictionary if None and the values decoded to the radtypes
+    objects. The definition is None (and the value is the binary value)
+    for the attributes the dictionary does not know"""
+    if dictionary is None:
+        dictionary = get_dictionary()
+    for vendor_id, attr_id, value in iter_attributes(data, length,
+                                                     dictionary):
+        try:
+            attribute = get_attribute(dictionary, vendor_id, attr_id)
+        except ValueError:
+            yield None, value
+            continue
+        yield attribute, decode_value(attribute, value)
@@ -5,33 +5,107 @@
 #
 
 import os.path
-import radtypes
+import threading
+from . import radtypes
 
 __dictionary = None
 __dict_path = "dict"
 __dict_file = "dictionary"
+# the loaded dictionaries by (absolute path, root file) - see load()
+__contexts = {}
+__contexts_lock = threading.Lock()
+
+
+# attribute types of the FreeRADIUS dictionaries (the sized types are
+# written as eg. octets[16])
+ATTRIBUTE_TYPES = frozenset((
+    "string", "octets", "ipaddr", "ipv4prefix", "integer", "integer64",
+    "date", "ifid", "ipv6addr", "ipv6prefix", "ether", "abinary", "byte",
+    "short", "signed", "tlv", "extended", "long-extended", "evs", "vsa",
+    "combo-ip", "combo-ipprefix", "bool", "float32", "float64", "text"))
+
+# ATTRIBUTE flags: name -> whether the flag takes a value (flag=value)
+ATTRIBUTE_FLAGS = {
+    "has_tag": False,
+    "encrypt": True,
+    "array": False,
+    "concat": False,
+    "virtual": False,
+    "internal": False,
+    "secret": False,
+}
+
+# value ranges (bits) of the numeric attribute types
+NUMERIC_TYPES = {
+    "byte": 8,
+    "short": 16,
+    "integer": 32,
+    "signed": 32,
+    "date": 32,
+    "integer64": 64,
+}
+
+# extended attribute types (RFC 6929) the EVS vendors are defined within
+EXTENDED_VENDOR_FORMATS = {
+    f"Extended-Vendor-Specific-{n}": 240 + n for n in range(1, 7)
+}
+
+
+class DictionaryError(ValueError):
+    """invalid dictionary file"""
 
 
 class AttributeDef:
 
-    def __init__(self, attr_name, attr_id, attr_type, attr_vendor=None):
+    def __init__(self, attr_name, attr_id, attr_type, attr_vendor=None,
+                 attr_flags=None, attr_parent=None):
         """ Attribute storage object
         Attribute contains the following:
         - attribute name
-        - attribute code (id)
+        - attribute code (id) - relative to the parent (if any)
         - attribute type (eg. integer, ipaddr)
         - vendor (if any) (dict of Vendor objects)
+        - flags (dict of eg. has_tag, encrypt)
+        - parent attribute (TLV or extended attribute) if any
         - a list of defined values (if any) (list of name, value tuples)"""
         self.attr_name = attr_name
         self.attr_id = attr_id  # attribute code
         self.attr_type = attr_type
         self.attr_vendor = attr_vendor
-        # list of values defined in the dictionary
-        self.attr_defined_values = []
+        self.attr_flags = attr_flags or {}
+        self.attr_parent = attr_parent
+        self.children = {}  # TLV/extended attribute members by code
+        # list of values defined in the dictionary (name, value string) -
+        # converted to the radtypes values on the first use
+        self.attr_values = []
+        self.defined_values = None
+
+    @property
+    def attr_defined_values(self):
+        """list of the defined values (name, radtypes value tuples)"""
+        if self.defined_values is None or \
+                len(self.defined_values) != len(self.attr_values):
+            self.defined_values = [
+                (name, radtypes.get_type_instance(self.attr_type, value))
+                for name, value in self.attr_values
+            ]
+        return self.defined_values
 
     def has_defined_values(self):
         """returns true if the attribute has a list of defined values"""
-        return len(self.attr_defined_values) > 0
+        return len(self.attr_values) > 0
+
+    def get_value_name(self, value):
+        """get the name of the defined value (None if it isn't defined)"""
+        for name, defined_value in iter(self.attr_defined_values):
+            if defined_value.value == value.value:
+                return name
+        return None
+
+    def get_oid(self):
+        """the attribute code with the codes of its parents (eg. (241, 1))"""
+        parent = self.attr_parent.get_oid() if self.attr_parent else ()
+        return parent + (self.attr_id, )
 
     def __str__(self):
         content = [
@@ -49,15 +123,354 @@ class AttributeDef:
 
 class VendorDef:
 
-    def __init__(self, vendor_name, vendor_id):
-        """Vendor storage object"""
+    def __init__(self, vendor_name, vendor_id, type_size=1, length_size=1,
+                 continuation=False):
+        """Vendor storage object (the format of the vendor attributes is
+        type_size and length_size octets - 1,1 by default)"""
         self.vendor_name = vendor_name
         self.vendor_id = vendor_id
+        self.type_size = type_size
+        self.length_size = length_size
+        self.continuation = continuation
+        self.parent = None  # extended attribute code for the EVS vendors
 
     def __str__(self):
         return f"VENDOR:\tname: {self.vendor_name}, id: {self.vendor_id}"
 
 
+class DictionaryParser:
+    """Single pass parser of the FreeRADIUS dictionary files
+
+    Supports ATTRIBUTE (with the flags and dotted OIDs), VALUE, VENDOR
+    (format=), BEGIN-VENDOR (format=Extended-Vendor-Specific-N), END-VENDOR,
+    BEGIN-TLV, END-TLV, FLAGS, $INCLUDE (relative to the including file)
+    and $INCLUDE- (optional include). Any error is reported as
+    DictionaryError with the file name and the line number."""
+
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+        self.directives = {
+            "ATTRIBUTE": self.parse_attribute,
+            "VALUE": self.parse_value,
+            "VENDOR": self.parse_vendor,
+            "BEGIN-VENDOR": self.parse_begin_vendor,
+            "END-VENDOR": self.parse_end_vendor,
+            "BEGIN-TLV": self.parse_begin_tlv,
+            "END-TLV": self.parse_end_tlv,
+            "FLAGS": self.parse_flags,
+            "$INCLUDE": self.parse_include,
+            "$INCLUDE-": self.parse_include,
+        }
+        self.files = []  # the stack of the included files
+        self.vendor = None  # BEGIN-VENDOR
+        self.tlvs = []  # BEGIN-TLV stack
+        self.internal = False  # FLAGS internal
+        self.lineno = 0  # the line being parsed
+        self.values = []  # (attribute, name, value, lineno, filename)
+        self.vendor_refs = {}  # vendor name -> the first reference location
+        # the attributes of the vendors defined later (number range checked
+        # in their format by finish) - (attribute, oid, location)
+        self.vendor_attributes = []
+        self.by_oid = {}  # (vendor, code) -> top level AttributeDef
+
+    @property
+    def location(self):
+        """(filename, line number) being parsed"""
+        return self.files[-1], self.lineno
+
+    def error(self, message, location=None):
+        filename, lineno = location or self.location
+        return DictionaryError(f"{filename}:{lineno}: {message}")
+
+    def parse(self, filename):
+        """parse the dictionary file (and the included files)"""
+        self.parse_file(filename)
+        self.finish()
+
+    def parse_file(self, filename):
+        filename = os.path.normpath(filename)
+        if filename in self.files:
+            raise self.error(f"recursive $INCLUDE of {filename}")
+        with open(filename, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+        self.files.append(filename)
+        self.dictionary.files.append(filename)
+        # the scope of the BEGIN-VENDOR, BEGIN-TLV and FLAGS is the file
+        state = self.vendor, self.tlvs, self.internal, self.lineno
+        self.vendor, self.tlvs, self.internal = None, [], False
+        directives, values = self.directives, self.values
+        try:
+            for lineno, line in enumerate(lines, 1):
+                if not line or line[0] == "#":
+                    continue
+                if "#" in line:
+                    line = line[:line.index("#")]
+                fields = line.split()
+                if not fields:
+                    continue
+                if fields[0] == "VALUE" and len(fields) == 4:
+                    # the most common definition - checked by finish()
+                    values.append((fields[1], fields[2], fields[3], lineno,
+                                   filename))
+                    continue
+                self.lineno = lineno
+                directive = directives.get(fields[0])
+                if directive is None:
+                    raise self.error(f"unknown directive {fields[0]}")
+                directive(fields)
+            if self.vendor:
+                raise self.error(f"BEGIN-VENDOR {self.vendor.vendor_name} "
+                                 "without END-VENDOR")
+            if self.tlvs:
+                raise self.error(f"BEGIN-TLV {self.tlvs[-1].attr_name} "
+                                 "without END-TLV")
+        finally:
+            self.files.pop()
+        self.vendor, self.tlvs, self.internal, self.lineno = state
+
+    def check_fields(self, fields, minimum, maximum=None):
+        if not minimum <= len(fields) <= (maximum or minimum):
+            raise self.error(f"invalid {fields[0]} definition")
+
+    def parse_number(self, value, what):
+        if value.isdigit():
+            return int(value)
+        try:
+            number = int(value, 16) if value[:2].lower() == "0x" \
+                else int(value)
+        except ValueError:
+            raise self.error(f"invalid {what}: {value}") from None
+        if number < 0:
+            raise self.error(f"invalid {what}: {value}")
+        return number
+
+    def parse_include(self, fields):
+        self.check_fields(fields, 2)
+        filename = fields[1]
+        if not os.path.isabs(filename):
+            filename = os.path.join(os.path.dirname(self.files[-1]),
+                                    filename)
+        if fields[0] == "$INCLUDE-" and not os.path.exists(filename):
+            return  # optional include
+        try:
+            self.parse_file(filename)
+        except (IOError, OSError) as e:
+            raise self.error(f"cannot read {filename}: {e.strerror}")
+
+    def get_vendor(self, name):
+        """get the vendor by name - the vendor may be defined later"""
+        vendor = self.dictionary.vendors.get(name.lower())
+        if vendor is None:
+            vendor = VendorDef(name, None)  # defined by VENDOR later
+            self.dictionary.vendors[name.lower()] = vendor
+            self.vendor_refs[name.lower()] = self.location
+        return vendor
+
+    def parse_vendor(self, fields):
+        self.check_fields(fields, 3, 4)
+        name, vendor_id = fields[1], self.parse_number(fields[2], "vendor id")
+        type_size, length_size, continuation = 1, 1, False
+        if len(fields) == 4:
+            option, sep, value = fields[3].partition("=")
+            try:
+                if option != "format":
+                    raise ValueError
+                sizes = value.split(",")
+                type_size, length_size = int(sizes[0]), int(sizes[1])
+                if len(sizes) > 2 and sizes[2] == "c":
+                    continuation = True
+                elif len(sizes) > 2:
+                    raise ValueError
+            except (ValueError, IndexError):
+                raise self.error(f"invalid vendor format: {fields[3]}")
+            if type_size not in (1, 2, 4) or length_size not in (0, 1, 2) or \
+                    continuation and (type_size, length_size) != (1, 1):
+                raise self.error(f"invalid vendor format: {fields[3]}")
+
+        vendor = self.dictionary.vendors.get(name.lower())
+        if vendor is None:
+            vendor = VendorDef(name, vendor_id)
+            self.dictionary.vendors[name.lower()] = vendor
+        elif vendor.vendor_id not in (None, vendor_id):
+            raise self.error(f"vendor {name} redefined with id {vendor_id}")
+        vendor.vendor_name, vendor.vendor_id = name, vendor_id
+        vendor.type_size, vendor.length_size = type_size, length_size
+        vendor.continuation = continuation
+
+    def parse_begin_vendor(self, fields):
+        self.check_fields(fields, 2, 3)
+        if self.vendor or self.tlvs:
+            raise self.error(f"nested BEGIN-VENDOR {fields[1]}")
+        vendor = self.get_vendor(fields[1])
+        if len(fields) == 3:
+            option, sep, value = fields[2].partition("=")
+            if option != "format" or value not in EXTENDED_VENDOR_FORMATS:
+                raise self.error(f"invalid vendor format: {fields[2]}")
+            vendor = self.get_evs_vendor(vendor,
+                                         EXTENDED_VENDOR_FORMATS[value])
+        self.vendor = vendor
+
+    def get_evs_vendor(self, vendor, parent):
+        """get the vendor of the Extended-Vendor-Specific attributes within
+        the parent extended attribute - kept apart from the vendor of the
+        Vendor-Specific attributes (the id is set by finish)"""
+        key = (vendor.vendor_name.lower(), parent)
+        evs_vendor = self.dictionary.evs_vendors.get(key)
+        if evs_vendor is None:
+            evs_vendor = VendorDef(vendor.vendor_name, vendor.vendor_id)
+            evs_vendor.parent = parent
+            self.dictionary.evs_vendors[key] = evs_vendor
+        return evs_vendor
+
+    def parse_end_vendor(self, fields):
+        self.check_fields(fields, 2)
+        if self.vendor is None or \
+                self.vendor.vendor_name.lower() != fields[1].lower():
+            raise self.error(f"END-VENDOR {fields[1]} without BEGIN-VENDOR")
+        self.vendor = None
+
+    def parse_begin_tlv(self, fields):
+        self.check_fields(fields, 2)
+        attribute = self.dictionary.attributes.get(fields[1].lower())
+        if attribute is None or attribute.attr_type != "tlv":
+            raise self.error(f"BEGIN-TLV of an unknown TLV {fields[1]}")
+        self.tlvs.append(attribute)
+
+    def parse_end_tlv(self, fields):
+        self.check_fields(fields, 2)
+        if not self.tlvs or \
+                self.tlvs[-1].attr_name.lower() != fields[1].lower():
+            raise self.error(f"END-TLV {fields[1]} without BEGIN-TLV")
+        self.tlvs.pop()
+
+    def parse_flags(self, fields):
+        self.check_fields(fields, 2)
+        if fields[1] not in ("internal", "!internal"):
+            raise self.error(f"unknown flag {fields[1]}")
+        self.internal = fields[1] == "internal"
+
+    def parse_flag_list(self, value):
+        flags = {}
+        for flag in value.split(","):
+            name, sep, flag_value = flag.partition("=")
+            if name not in ATTRIBUTE_FLAGS or \
+                    ATTRIBUTE_FLAGS[name] != bool(sep):
+                raise self.error(f"invalid attribute flag {flag}")
+            flags[name] = self.parse_number(flag_value, name) if sep \
+                else True
+        if flags.get("encrypt", 1) not in (1, 2, 3):
+            raise self.error(f"invalid encryption type {flags['encrypt']}")
+        return flags
+
+    def parse_attribute(self, fields):
+        if not 4 <= len(fields) <= 5:
+            raise self.error("invalid ATTRIBUTE definition")
+        name, oid, attr_type = fields[1:4]
+        if attr_type not in ATTRIBUTE_TYPES and \
+                attr_type.partition("[")[0] not in ATTRIBUTE_TYPES:
+            raise self.error(f"unknown type {attr_type} of {name}")
+
+        vendor, flags = self.vendor, None
+        if len(fields) == 5:
+            if fields[4].lower() in self.dictionary.vendors and \
+                    "=" not in fields[4]:
+                vendor = self.get_vendor(fields[4])  # the old syntax
+            else:
+                flags = self.parse_flag_list(fields[4])
+        if self.internal:
+            flags = dict(flags or {}, internal=True)
+
+        parent = self.tlvs[-1] if self.tlvs else None
+        if oid.isdigit():
+            attr_id = int(oid)
+        elif "." in oid:  # dotted OID - the parents must be defined
+            codes = [self.parse_number(code, "attribute number")
+                     for code in oid.split(".")]
+            parent = self.by_oid.get((vendor, codes[0]))
+            for code in codes[1:-1]:
+                parent = parent and parent.children.get(code)
+            if parent is None:
+                raise self.error(f"unknown parent of {name} ({oid})")
+            attr_id = codes[-1]
+        else:
+            attr_id = self.parse_number(oid, "attribute number")
+
+        if vendor and parent is None and vendor.vendor_id is None:
+            pending = (oid, self.location)  # checked in the vendor format
+        else:
+            pending = None
+            type_size = vendor.type_size if vendor and parent is None else 1
+            if not 0 < attr_id < 256 ** type_size:
+                raise self.error(f"invalid attribute number {oid} of {name}")
+
+        attributes, key = self.dictionary.attributes, name.lower()
+        attribute = attributes.get(key)
+        if attribute is not None:
+            if (attribute.attr_id, attribute.attr_type, attribute.attr_vendor,
+                    attribute.attr_parent) != (attr_id, attr_type, vendor,
+                                               parent):
+                raise self.error(f"attribute {name} redefined")
+            return
+
+        attribute = AttributeDef(name, attr_id, attr_type, vendor, flags,
+                                 parent)
+        attributes[key] = attribute
+        if pending is not None:
+            self.vendor_attributes.append((attribute, ) + pending)
+        if parent is not None:
+            parent.children.setdefault(attr_id, attribute)
+        else:
+            self.by_oid.setdefault((vendor, attr_id), attribute)
+
+    def parse_value(self, fields):
+        if len(fields) != 4:
+            raise self.error("invalid VALUE definition")
+        self.values.append((fields[1], fields[2], fields[3], self.lineno,
+                            self.files[-1]))
+
+    def finish(self):
+        """resolve the forward references once all files are parsed"""
+        dictionary = self.dictionary
+        for name, vendor in dictionary.vendors.items():
+            if vendor.vendor_id is None:
+                raise self.error(f"unknown vendor {vendor.vendor_name}",
+                                 self.vendor_refs[name])
+        for (name, parent), vendor in dictionary.evs_vendors.items():
+            vendor.vendor_name = dictionary.vendors[name].vendor_name
+            vendor.vendor_id = dictionary.vendors[name].vendor_id
+        for attribute, oid, location in self.vendor_attributes:
+            if not 0 < attribute.attr_id < \
+                    256 ** attribute.attr_vendor.type_size:
+                raise self.error(f"invalid attribute number {oid} of "
+                                 f"{attribute.attr_name}", location)
+
+        attributes = dictionary.attributes
+        for attr_name, name, value, lineno, filename in self.values:
+            attribute = attributes.get(attr_name.lower())
+            if attribute is None:
+                raise self.error(f"VALUE {name} of an unknown attribute "
+                                 f"{attr_name}", (filename, lineno))
+            if not value.isdigit() or \
+                    NUMERIC_TYPES.get(attribute.attr_type, 0) < len(value) * 4:
+                self.check_value(attribute, name, value, (filename, lineno))
+            attribute.attr_values.append((name, value))
+
+    def check_value(self, attribute, name, value, location):
+        """check the VALUE is valid - the numbers are only range checked
+        (the radtypes values are created on the first use)"""
+        bits = NUMERIC_TYPES.get(attribute.attr_type)
+        if bits and value.isdigit():
+            if int(value) >> bits:
+                raise self.error(f"VALUE {name} of {attribute.attr_name} "
+                                 f"out of range: {value}", location)
+            return
+        try:
+            radtypes.get_type_instance(attribute.attr_type, value)
+        except (ValueError, NotImplementedError, OverflowError) as e:
+            raise self.error(f"invalid VALUE {name} of "
+                             f"{attribute.attr_name}: {e}", location) from None
+
+
 class Dictionary:
     """data structure is as follows:
         attributes = { name : Attribute object instance }
@@ -70,67 +483,22 @@ class Dictionary:
         self.dict_file = dict_file
         self.attributes = {}
         self.vendors = {}
-        self.values = {}
+        # the vendors of the Extended-Vendor-Specific attributes by the
+        # (vendor name, extended attribute code)
+        self.evs_vendors = {}
+        self.files = []  # the dictionary files read
+        self.attributes_by_id = None  # built on the first lookup by id
+        self.vendors_by_id = None
         self.read_dictionary(self.dict_file, self.dict_path)
 
-    def read_one_file(self, filename):
-        """read a single dictionary file"""
-        includes = []
-        vendor = None
-        with open(filename) as f:
-            for line in f:
-                field = line.split()
-                if len(field) == 0 or field[0][0] == '#':
-                    continue
-
-                record_type, record_name = field[:2]
-                if record_type == "$INCLUDE":
-                    includes.append(record_name)
-                elif record_type == "ATTRIBUTE":
-                    attr_id, attr_type = field[2:4]
-                    attribute = AttributeDef(record_name, int(attr_id),
-                                             attr_type, vendor)
-                    self.attributes[record_name.lower()] = attribute
-                elif record_type == "VALUE":
-                    val_name, val_value = field[2:4]
-                    self.values.setdefault(record_name.lower(), []).append(
-                        (val_name, val_value))
-                elif record_type == "VENDOR":
-                    vendor_id = field[2]
-                    self.vendors[record_name.lower()] = VendorDef(
-                        record_name, int(vendor_id))
-                elif record_type == "BEGIN-VENDOR":
-                    vendor = self.vendors[record_name.lower()]
-                elif record_type == "END-VENDOR":
-                    vendor = None
-                else:
-                    pass  # ignoring everything we don't know
-
-        return includes
-
-    def read_dictionaries(self, filename, path):
-        """read values from dictionary files"""
-        full_name = os.path.join(path, filename)
-        try:
-            for fname in self.read_one_file(full_name):
-                self.read_dictionaries(fname, path)
-        except IOError:
-            raise IOError("Cannot read dictionary (IOError)")
-
     def read_dictionary(self, filename, path):
         """read dictionary files into a single dictionary db"""
-        self.read_dictionaries(filename, path)
-
-        # adding values to the attributes after processing all the files
-        for attr_name, values in self.values.items():
-            attribute = self.attributes[attr_name]
-            if attribute:
-                for name, value in values:
-                    value_obj = radtypes.get_type_instance(
-                        attribute.attr_type, value)
-                    attribute.attr_defined_values.append((name, value_obj))
-
-        self.values = None
+        full_name = os.path.join(path, filename)
+        try:
+            DictionaryParser(self).parse(full_name)
+        except (IOError, OSError) as e:
+            raise IOError(f"Cannot read dictionary {full_name} "
+                          f"({e.strerror})")
 
     def get_attribute(self, name):
         """get attribute by name"""
@@ -139,6 +507,34 @@ class Dictionary:
         except KeyError:
             raise ValueError(f"attribute {name} not found")
 
+    def get_attribute_by_id(self, attr_id, vendor_id=0):
+        """get attribute by its code (and vendor id for VSAs)"""
+        if self.attributes_by_id is None:
+            by_id = {}
+            for attr in self.attributes.values():
+                if attr.attr_parent:
+                    continue  # TLV and extended attribute members
+                vendor = attr.attr_vendor
+                key = (vendor.vendor_id if vendor else 0, attr.attr_id)
+                by_id.setdefault(key, attr)
+            self.attributes_by_id = by_id
+        try:
+            return self.attributes_by_id[(vendor_id, attr_id)]
+        except KeyError:
+            raise ValueError(f"attribute {attr_id} (vendor {vendor_id}) "
+                             "not found")
+
+    def get_vendor_by_id(self, vendor_id):
+        """get the vendor of the Vendor-Specific attributes by its id
+        (None if unknown)"""
+        if self.vendors_by_id is None:
+            by_id = {}
+            for vendor in self.vendors.values():
+                if vendor.parent is None:
+                    by_id.setdefault(vendor.vendor_id, vendor)
+            self.vendors_by_id = by_id
+        return self.vendors_by_id.get(vendor_id)
+
     def get_attribute_names(self):
         """get the list of all known attributes"""
         return self.attributes.keys()
@@ -153,24 +549,50 @@ class Dictionary:
         return "\n".join(contents)
 
 
+def load(dict_path="dict", dict_file="dictionary"):
+    """return the dictionary of the root dict_file in dict_path. Every
+    dictionary is read once and shared - the dictionaries are not changed
+    once loaded, so the contexts of several NAS vendors can coexist and
+    be used by several threads (eg. RadiusAvp(..., dictionary=...))"""
+    key = (os.path.abspath(dict_path), dict_file)
+    with __contexts_lock:
+        context = __contexts.get(key)
+        if context is None:
+            context = __contexts[key] = Dictionary(dict_path, dict_file)
+    return context
+
+
 def initialize(dict_path="dict", dict_file="dictionary"):
-    global __dict_file, __dict_path
+    """set the default dictionary (loaded on the first use). The default
+    dictionary is replaced if the path or the root file change"""
+    global __dictionary, __dict_file, __dict_path
+    if (dict_path, dict_file) != (__dict_path, __dict_file):
+        __dictionary = None
     __dict_path = dict_path
     __dict_file = dict_file
 
 
 def get_dictionary():
     global __dictionary
-    if not __dictionary:
-        global __dict_file, __dict_path
-        __dictionary = Dictionary(__dict_path, __dict_file)
+    if __dictionary is None:
+        __dictionary = load(__dict_path, __dict_file)
     return __dictionary
 
 
+def set_dictionary(dictionary):
+    """use the given (already loaded) dictionary - eg. FlatDictionary"""
+    global __dictionary
+    __dictionary = dictionary
+
+
 def get_attribute(*args, **kwargs):
     return get_dictionary().get_attribute(*args, **kwargs)
 
 
+def get_attribute_by_id(*args, **kwargs):
+    return get_dictionary().get_attribute_by_id(*args, **kwargs)
+
+
 if __name__ == "__main__":
     try:
         get_attribute("test")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+#
+# eap.py
+# Author: Alex Kozadaev (2014)
+#
+
+import hashlib
+import os
+import struct
+
+from . import decoder
+from . import radius
+
+# EAP packet (RFC 3748) - carried in the EAP-Message attributes (RFC 3579)
+#    0                   1                   2                   3
+#    0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1
+#   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+#   |     Code      |  Identifier   |            Length             |
+#   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+#   |     Type      |  Type-Data ...
+#   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+EAP_HDR = struct.Struct("!BBH")
+EAP_REQUEST, EAP_RESPONSE, EAP_SUCCESS, EAP_FAILURE = range(1, 5)
+EAP_IDENTITY, EAP_NOTIFICATION, EAP_NAK, EAP_MD5 = range(1, 5)
+
+ACCESS_REQUEST = 1
+ACCESS_ACCEPT = 2
+ACCESS_REJECT = 3
+ACCESS_CHALLENGE = 11
+
+STATE = 24
+EAP_MESSAGE = 79
+
+
+def pack(code, eap_id, eap_type=None, data=b""):
+    """create the EAP packet (Success/Failure have no type)"""
+    if eap_type is None:
+        return EAP_HDR.pack(code, eap_id & 0xff, EAP_HDR.size)
+    return b"".join((EAP_HDR.pack(code, eap_id & 0xff,
+                                  EAP_HDR.size + 1 + len(data)),
+                     bytes((eap_type, )), data))
+
+
+def unpack(data):
+    """return (code, identifier, type, type data) of the EAP packet - the
+    type is None for Success/Failure"""
+    if len(data) < EAP_HDR.size:
+        raise ValueError("truncated EAP packet")
+    code, eap_id, length = EAP_HDR.unpack_from(data)
+    if not EAP_HDR.size <= length <= len(data):
+        raise ValueError(f"invalid EAP packet length: {length}")
+    if code in (EAP_SUCCESS, EAP_FAILURE) or length == EAP_HDR.size:
+        return code, eap_id, None, data[EAP_HDR.size:EAP_HDR.size]
+    return code, eap_id, data[EAP_HDR.size], data[EAP_HDR.size + 1:length]
+
+
+def md5_response(eap_id, password, challenge):
+    """EAP-MD5 response value - MD5 of the identifier, the password and
+    the challenge (RFC 1994)"""
+    return hashlib.md5(b"".join((bytes((eap_id & 0xff, )), password,
+                                 bytes(challenge)))).digest()
+
+
+def md5_value(value):
+    """EAP-MD5 type data - the value size and the value"""
+    return b"".join((bytes((len(value), )), value))
+
+
+def parse_md5_value(data):
+    """return the value of the EAP-MD5 type data"""
+    if not data or data[0] + 1 > len(data):
+        raise ValueError("invalid EAP-MD5 value")
+    return bytes(data[1:data[0] + 1])
+
+
+def get_attributes(packet, length=None):
+    """return (EAP packet, State) of the radius packet - the EAP-Message
+    attributes are reassembled. Either is None if missing"""
+    fragments, state = [], None
+    for vendor_id, attr_id, value in decoder.iter_attributes(packet, length):
+        if vendor_id:
+            continue
+        if attr_id == EAP_MESSAGE:
+            fragments.append(value)
+        elif attr_id == STATE:
+            state = bytes(value)
+    if not fragments:
+        return None, state
+    return b"".join(fragments), state
+
+
+def create_request(secret, eap_packet, state=None, avps=()):
+    """create the Access-Request carrying the EAP packet (split into the
+    EAP-Message attributes) signed with the Message-Authenticator"""
+    message = radius.RadiusMessage(secret, ACCESS_REQUEST)
+    for avp in avps:
+        message.add_avp(avp)
+    message.add_avp(radius.RadiusAvp("EAP-Message", eap_packet))
+    if state is not None:
+        message.add_avp(radius.RadiusAvp("State", state))
+    message.add_avp(radius.RadiusAvp("Message-Authenticator", bytes(16)))
+    return message
+
+
+class EapConversation:
+    """EAP-MD5 conversation over the RadiusClient (see client.py)
+
+    Starts with the EAP-Response/Identity and answers the challenges of
+    the server. The State of every Access-Challenge is returned in the
+    next Access-Request. The responses must be signed with a valid
+    Message-Authenticator. The other EAP methods are refused with a Nak
+    offering EAP-MD5.
+
+    avps - the RadiusAvp objects added to every Access-Request"""
+
+    def __init__(self, client, identity, password, avps=(), max_rounds=8):
+        self.client = client
+        self.identity = identity.encode("utf-8")
+        self.password = password.encode("utf-8")
+        self.avps = [radius.RadiusAvp("User-Name", identity)] + list(avps)
+        self.max_rounds = max_rounds
+        self.rounds = 0
+        self.state = None
+
+    async def run(self):
+        """run the conversation returning the final radius code
+        (ACCESS_ACCEPT or ACCESS_REJECT) or None if it failed (a timeout or
+        an invalid response)"""
+        eap_packet = pack(EAP_RESPONSE, 0, EAP_IDENTITY, self.identity)
+        secret = self.client.secret
+        while self.rounds < self.max_rounds:
+            self.rounds += 1
+            message = create_request(secret, eap_packet, self.state,
+                                     self.avps)
+            message.authenticator = auth = os.urandom(16)
+            response = await self.client.request(message)
+            if response is None:
+                return None
+            if not radius.check_message_authenticator(response, secret,
+                                                      auth):
+                self.client.stats.invalid += 1
+                return None
+            if response[0] != ACCESS_CHALLENGE:
+                return response[0]
+            eap_message, self.state = get_attributes(response)
+            try:
+                eap_packet = self.respond(eap_message)
+            except ValueError:
+                return None
+        return None
+
+    def respond(self, eap_message):
+        """the EAP response to the EAP request of the Access-Challenge"""
+        if eap_message is None:
+            raise ValueError("Access-Challenge without EAP-Message")
+        code, eap_id, eap_type, data = unpack(eap_message)
+        if code != EAP_REQUEST:
+            raise ValueError(f"unexpected EAP code {code}")
+        if eap_type == EAP_IDENTITY:
+            return pack(EAP_RESPONSE, eap_id, EAP_IDENTITY, self.identity)
+        if eap_type == EAP_NOTIFICATION:
+            return pack(EAP_RESPONSE, eap_id, EAP_NOTIFICATION)
+        if eap_type == EAP_MD5:
+            challenge = parse_md5_value(data)
+            return pack(EAP_RESPONSE, eap_id, EAP_MD5, md5_value(
+                md5_response(eap_id, self.password, challenge)))
+        return pack(EAP_RESPONSE, eap_id, EAP_NAK, bytes((EAP_MD5, )))
@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+#
+# flatdict.py
+# Author: Alex Kozadaev (2014)
+#
+
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+
+from . import dictionary
+
+# The flat dictionary file (little endian):
+#   header
+#   attribute records (ATTRIBUTE_RECORD)
+#   vendor records (VENDOR_RECORD)
+#   value records (VALUE_RECORD)
+#   name hash table (u32 slots - attribute index + 1, 0 is empty)
+#   id hash table (u32 slots - attribute index + 1, 0 is empty)
+#   dictionary files (u32 offset, u32 length of the file names)
+#   string table (utf-8)
+#
+# The hash tables are open addressing tables (linear probing) keyed by the
+# crc32 of the lower case attribute name and of the (vendor id, parent,
+# attribute id) triplet.
+FLAT_MAGIC = b"RADIFD\x00\x02"
+HEADER = struct.Struct("<8sIIIIIIII")
+ATTRIBUTE_RECORD = struct.Struct("<IIIIIHHHBBB3x")
+VENDOR_RECORD = struct.Struct("<IIHBBBB2x")
+VALUE_RECORD = struct.Struct("<IIHH4x")
+FILE_RECORD = struct.Struct("<II")
+ID_KEY = struct.Struct("<III")
+NONE = 0xffffffff
+NO_VENDOR = 0xffff
+
+# boolean attribute flags in the order of the flag bits
+FLAG_BITS = ("has_tag", "array", "concat", "virtual", "internal", "secret")
+# the types of the attributes with members (AttributeDef.children)
+CONTAINER_TYPES = ("tlv", "extended", "long-extended")
+
+
+class FlatDictionary:
+    """Read-only dictionary mapped from a flat file (see build())
+
+    The dictionary is kept in fixed width records and a string table in a
+    shared read-only mapping, so any number of processes share a single
+    copy of it (no copy-on-write of the Python object graph after fork()).
+    The AttributeDef objects are created from the records on the first
+    lookup of the attribute and cached - a process only creates the
+    objects of the attributes it uses."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.definitions = {}  # AttributeDef by the record index
+        self.vendor_defs = {}  # VendorDef by the record index
+        self.by_name = {}  # AttributeDef by the lower case name
+        self.by_id = {}  # AttributeDef by (vendor id, attribute id)
+        self.members = None  # record index -> member record indexes
+        self.vendors_by_id = None  # built on the first lookup by id
+        with open(filename, "rb") as f:
+            check_owner(filename, os.fstat(f.fileno()))
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, self.attr_count, self.vendor_count, self.value_count,
+             self.name_slots, self.id_slots, self.file_count,
+             self.signature, strings_size) = HEADER.unpack_from(self.mmap)
+        except struct.error:
+            magic = None
+        if magic != FLAT_MAGIC:
+            self.mmap.close()
+            raise ValueError(f"{filename}: not a flat dictionary")
+        self.attrs_offset = HEADER.size
+        self.vendors_offset = (self.attrs_offset +
+                               self.attr_count * ATTRIBUTE_RECORD.size)
+        self.values_offset = (self.vendors_offset +
+                              self.vendor_count * VENDOR_RECORD.size)
+        self.names_offset = (self.values_offset +
+                             self.value_count * VALUE_RECORD.size)
+        self.ids_offset = self.names_offset + self.name_slots * 4
+        self.files_offset = self.ids_offset + self.id_slots * 4
+        self.strings_offset = (self.files_offset +
+                               self.file_count * FILE_RECORD.size)
+        if self.strings_offset + strings_size != len(self.mmap):
+            self.mmap.close()
+            raise ValueError(f"{filename}: truncated flat dictionary")
+
+    def string(self, offset, length):
+        start = self.strings_offset + offset
+        return self.mmap[start:start + length].decode("utf-8")
+
+    def get_files(self):
+        """the dictionary files the flat dictionary was built from"""
+        files = []
+        for index in range(self.file_count):
+            files.append(self.string(*FILE_RECORD.unpack_from(
+                self.mmap, self.files_offset + index * FILE_RECORD.size)))
+        return files
+
+    def is_current(self):
+        """true if the dictionary files have not changed since the build"""
+        try:
+            return file_signature(self.get_files()) == self.signature
+        except OSError:
+            return False
+
+    def lookup(self, offset, slots, key, match):
+        """probe the hash table returning the matching attribute index"""
+        mask = slots - 1
+        slot = zlib.crc32(key) & mask
+        unpack_from, data = struct.unpack_from, self.mmap
+        while True:
+            index = unpack_from("<I", data, offset + slot * 4)[0]
+            if index == 0:
+                return None
+            if match(index - 1):
+                return index - 1
+            slot = (slot + 1) & mask
+
+    def record(self, index):
+        return ATTRIBUTE_RECORD.unpack_from(
+            self.mmap, self.attrs_offset + index * ATTRIBUTE_RECORD.size)
+
+    def get_vendor(self, index):
+        vendor = self.vendor_defs.get(index)
+        if vendor is not None:
+            return vendor
+        name_off, vendor_id, name_len, type_size, length_size, \
+            continuation, parent = VENDOR_RECORD.unpack_from(
+                self.mmap, self.vendors_offset + index * VENDOR_RECORD.size)
+        vendor = dictionary.VendorDef(self.string(name_off, name_len),
+                                      vendor_id, type_size, length_size,
+                                      bool(continuation))
+        vendor.parent = parent or None
+        return self.vendor_defs.setdefault(index, vendor)
+
+    def get_vendor_by_id(self, vendor_id):
+        """get the vendor of the Vendor-Specific attributes by its id
+        (None if unknown)"""
+        if self.vendors_by_id is None:
+            by_id = {}
+            for index in range(self.vendor_count):
+                vendor = self.get_vendor(index)
+                if vendor.parent is None:
+                    by_id.setdefault(vendor.vendor_id, vendor)
+            self.vendors_by_id = by_id
+        return self.vendors_by_id.get(vendor_id)
+
+    def get_members(self, index):
+        """the indexes of the member records (TLV and extended attribute
+        members) of the attribute record"""
+        if self.members is None:
+            members = {}
+            for member in range(self.attr_count):
+                parent = self.record(member)[3]
+                if parent != NONE:
+                    members.setdefault(parent, []).append(member)
+            self.members = members
+        return self.members.get(index, ())
+
+    def get_attribute_def(self, index):
+        """the AttributeDef of the attribute record (created on the first
+        use, with its members in the children)"""
+        attribute = self.definitions.get(index)
+        if attribute is not None:
+            return attribute
+        (name_off, type_off, attr_id, parent, values_start, name_len, vendor,
+         values_count, type_len, flag_bits, encrypt) = self.record(index)
+        flags = {
+            name: True
+            for bit, name in enumerate(FLAG_BITS) if flag_bits & (1 << bit)
+        }
+        if encrypt:
+            flags["encrypt"] = encrypt
+        attribute = dictionary.AttributeDef(
+            self.string(name_off, name_len), attr_id,
+            self.string(type_off, type_len),
+            self.get_vendor(vendor) if vendor != NO_VENDOR else None, flags,
+            self.get_attribute_def(parent) if parent != NONE else None)
+        for value in range(values_start, values_start + values_count):
+            name_off, value_off, name_len, value_len = \
+                VALUE_RECORD.unpack_from(
+                    self.mmap, self.values_offset + value * VALUE_RECORD.size)
+            attribute.attr_values.append((self.string(name_off, name_len),
+                                          self.string(value_off, value_len)))
+        attribute = self.definitions.setdefault(index, attribute)
+        if attribute.attr_type in CONTAINER_TYPES and not attribute.children:
+            for member in map(self.get_attribute_def,
+                              self.get_members(index)):
+                attribute.children.setdefault(member.attr_id, member)
+        return attribute
+
+    def get_attribute(self, name):
+        """get attribute by name"""
+        attribute = self.by_name.get(name.lower())
+        if attribute is not None:
+            return attribute
+        key = name.lower().encode("utf-8")
+
+        def match(index):
+            record = self.record(index)
+            start = self.strings_offset + record[0]
+            return self.mmap[start:start + record[5]].lower() == key
+
+        index = self.lookup(self.names_offset, self.name_slots, key, match)
+        if index is None:
+            raise ValueError(f"attribute {name} not found")
+        attribute = self.by_name[name.lower()] = self.get_attribute_def(index)
+        return attribute
+
+    def get_attribute_by_id(self, attr_id, vendor_id=0):
+        """get attribute by its code (and vendor id for VSAs)"""
+        attribute = self.by_id.get((vendor_id, attr_id))
+        if attribute is not None:
+            return attribute
+        key = ID_KEY.pack(vendor_id, NONE, attr_id)
+
+        def match(index):
+            record = self.record(index)
+            if record[2] != attr_id or record[3] != NONE:
+                return False
+            if record[6] == NO_VENDOR:
+                return vendor_id == 0
+            return VENDOR_RECORD.unpack_from(
+                self.mmap, self.vendors_offset +
+                record[6] * VENDOR_RECORD.size)[1] == vendor_id
+
+        index = self.lookup(self.ids_offset, self.id_slots, key, match)
+        if index is None:
+            raise ValueError(f"attribute {attr_id} (vendor {vendor_id}) "
+                             "not found")
+        attribute = self.by_id[(vendor_id, attr_id)] = \
+            self.get_attribute_def(index)
+        return attribute
+
+    def get_attribute_names(self):
+        """get the list of all known attributes"""
+        return [self.string(record[0], record[5]).lower()
+                for record in map(self.record, range(self.attr_count))]
+
+    def __iter__(self):
+        return iter(self.get_attribute_names())
+
+    def __len__(self):
+        return self.attr_count
+
+    def close(self):
+        self.mmap.close()
+
+
+def check_owner(filename, stat):
+    """raise ValueError unless the file or directory (its os.stat result)
+    is owned by the user and writable by the owner only - the flat
+    dictionary is trusted as is (is_current only checks the files it
+    lists)"""
+    if hasattr(os, "getuid") and stat.st_uid != os.getuid():
+        raise ValueError(f"{filename}: not owned by the user")
+    if stat.st_mode & 0o022:
+        raise ValueError(f"{filename}: writable by others")
+
+
+def file_signature(files):
+    """crc32 of the names, sizes and modification times of the files"""
+    signature = 0
+    for filename in files:
+        stat = os.stat(filename)
+        signature = zlib.crc32(
+            f"{filename}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"),
+            signature)
+    return signature
+
+
+def table_size(count):
+    """hash table size - a power of two with at most 50% load"""
+    size = 8
+    while size < count * 2:
+        size <<= 1
+    return size
+
+
+def build(source, filename):
+    """write the dictionary (Dictionary object) to the flat file"""
+    strings, string_offsets = bytearray(), {}
+
+    def add_string(value):
+        offset = string_offsets.get(value)
+        if offset is None:
+            offset = string_offsets[value] = len(strings)
+            strings.extend(value.encode("utf-8"))
+        return offset, len(value.encode("utf-8"))
+
+    attributes = list(source.attributes.values())
+    indexes = {id(attribute): index
+               for index, attribute in enumerate(attributes)}
+    vendors = list(source.vendors.values()) + \
+        list(source.evs_vendors.values())
+    vendor_indexes = {id(vendor): index
+                      for index, vendor in enumerate(vendors)}
+
+    attr_records, value_records = [], []
+    names = [0] * table_size(len(attributes))
+    ids = [0] * table_size(len(attributes))
+    for index, attribute in enumerate(attributes):
+        attr_name_off, attr_name_len = add_string(attribute.attr_name)
+        type_off, type_len = add_string(attribute.attr_type)
+        vendor = attribute.attr_vendor
+        parent = attribute.attr_parent
+        flags = attribute.attr_flags
+        flag_bits = sum(1 << bit for bit, name in enumerate(FLAG_BITS)
+                        if flags.get(name))
+        attr_records.append(ATTRIBUTE_RECORD.pack(
+            attr_name_off, type_off, attribute.attr_id,
+            indexes[id(parent)] if parent else NONE, len(value_records),
+            attr_name_len, vendor_indexes[id(vendor)] if vendor else NO_VENDOR,
+            len(attribute.attr_values), type_len, flag_bits,
+            flags.get("encrypt", 0)))
+        for name, value in attribute.attr_values:
+            name_off, name_len = add_string(name)
+            value_off, value_len = add_string(value)
+            value_records.append(VALUE_RECORD.pack(name_off, value_off,
+                                                   name_len, value_len))
+
+        insert(names, attribute.attr_name.lower().encode("utf-8"), index)
+        if parent is None:
+            insert(ids, ID_KEY.pack(vendor.vendor_id if vendor else 0, NONE,
+                                    attribute.attr_id), index)
+
+    vendor_records = []
+    for vendor in vendors:
+        name_off, name_len = add_string(vendor.vendor_name)
+        vendor_records.append(VENDOR_RECORD.pack(
+            name_off, vendor.vendor_id, name_len, vendor.type_size,
+            vendor.length_size, vendor.continuation, vendor.parent or 0))
+
+    files = [os.path.abspath(name) for name in source.files]
+    file_records = [FILE_RECORD.pack(*add_string(name)) for name in files]
+
+    header = HEADER.pack(FLAT_MAGIC, len(attr_records), len(vendor_records),
+                         len(value_records), len(names), len(ids),
+                         len(file_records), file_signature(files),
+                         len(strings))
+    # a new file (O_EXCL, mode 0600) - never a file planted in its place
+    fd, temp_name = tempfile.mkstemp(
+        ".tmp", os.path.basename(filename) + ".",
+        os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.writelines(attr_records)
+            f.writelines(vendor_records)
+            f.writelines(value_records)
+            f.write(struct.pack(f"<{len(names)}I", *names))
+            f.write(struct.pack(f"<{len(ids)}I", *ids))
+            f.writelines(file_records)
+            f.write(strings)
+        os.replace(temp_name, filename)  # readers never see a partial file
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+
+def insert(table, key, index):
+    """insert the attribute index into the hash table (keeping the first
+    attribute of a duplicate key)"""
+    mask = len(table) - 1
+    slot = zlib.crc32(key) & mask
+    while table[slot]:
+        slot = (slot + 1) & mask
+    table[slot] = index + 1
+
+
+def cache_dir():
+    """the per-user cache directory of the flat dictionaries
+    ($XDG_CACHE_HOME/radi or ~/.cache/radi) - created private to the
+    user"""
+    base = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "radi")
+    os.makedirs(path, 0o700, exist_ok=True)
+    check_owner(path, os.stat(path))
+    return path
+
+
+def default_filename(dict_path, dict_file):
+    """the flat dictionary cache file of the dictionary"""
+    source = os.path.abspath(os.path.join(dict_path, dict_file))
+    return os.path.join(cache_dir(),
+                        f"{zlib.crc32(source.encode('utf-8')):08x}.flat")
+
+
+def load(dict_path="dict", dict_file="dictionary", filename=None):
+    """map the flat dictionary of the dictionary files - the flat file is
+    (re)built if it does not exist or the dictionary files have changed"""
+    filename = filename or default_filename(dict_path, dict_file)
+    try:
+        flat = FlatDictionary(filename)
+        if flat.is_current():
+            return flat
+        flat.close()
+    except (IOError, OSError, ValueError):
+        pass
+    build(dictionary.Dictionary(dict_path, dict_file), filename)
+    return FlatDictionary(filename)
+
+
+def install(dict_path="dict", dict_file="dictionary", filename=None):
+    """load the flat dictionary and use it for the libradi.dictionary
+    lookups (call before forking the worker processes)"""
+    flat = load(dict_path, dict_file, filename)
+    dictionary.set_dictionary(flat)
+    return flat
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+#
+# histogram.py
+# Author: Alex Kozadaev (2014)
+#
+
+from array import array
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class Histogram:
+    """Log-bucketed (HDR style) histogram of non-negative values
+
+    The values are counted in integer units (microseconds by default).
+    Every power of two range is split into 2 ** (precision - 1) linear
+    buckets, so the values up to 2 ** precision are counted exactly and
+    the relative error of the larger values is below 2 ** (1 - precision)
+    (1.6% with the default precision). The memory use depends only on the
+    range of the values - never on the number of the samples - and the
+    histograms with the same precision and unit can be merged (eg. the
+    results of the worker processes)."""
+
+    def __init__(self, precision=7, unit=1e-6):
+        if not 1 <= precision <= 16:
+            raise ValueError(f"invalid histogram precision: {precision}")
+        self.precision = precision
+        self.unit = unit
+        self.half = 1 << (precision - 1)
+        self.counts = array("Q")
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def index(self, value):
+        """bucket index of the (integer) value"""
+        shift = value.bit_length() - self.precision
+        if shift <= 0:
+            return value
+        return shift * self.half + (value >> shift)
+
+    def value(self, index):
+        """the lowest value counted in the bucket"""
+        shift = max(index // self.half - 1, 0)
+        return (index - shift * self.half) << shift
+
+    def record(self, value, count=1):
+        """count the value (in seconds if the unit is 1e-6)"""
+        self.record_units(int(value / self.unit + 0.5), count)
+
+    def record_units(self, units, count=1):
+        """count the value given in the histogram units"""
+        if units < 0:
+            raise ValueError(f"negative histogram value: {units}")
+        index = self.index(units)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += count
+        self.total += count
+        self.sum += units * count
+        if self.min is None or units < self.min:
+            self.min = units
+        if self.max is None or units > self.max:
+            self.max = units
+
+    def merge(self, other):
+        """add the counts of another histogram"""
+        if (other.precision, other.unit) != (self.precision, self.unit):
+            raise ValueError("merging incompatible histograms")
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+        for units in (other.min, other.max):
+            if units is not None:
+                self.min = units if self.min is None else min(self.min, units)
+                self.max = units if self.max is None else max(self.max, units)
+        return self
+
+    def percentile(self, percentile):
+        """the value below which the percentile of the samples fall (in
+        seconds if the unit is 1e-6). The upper bound of the bucket is
+        returned (capped with the maximum), so the value is never
+        underestimated"""
+        if not self.total:
+            return 0.0
+        rank = max(percentile / 100.0 * self.total, 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.value(index + 1) - 1, self.max) * self.unit
+        return self.max * self.unit
+
+    def mean(self):
+        return self.sum / self.total * self.unit if self.total else 0.0
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        """dictionary with the count, min, mean, max and the percentiles"""
+        result = {
+            "count": self.total,
+            "min": (self.min or 0) * self.unit,
+            "mean": self.mean(),
+            "max": (self.max or 0) * self.unit,
+        }
+        for percentile in percentiles:
+            result[f"p{percentile:g}"] = self.percentile(percentile)
+        return result
+
+    def to_dict(self):
+        """json serializable representation (the buckets are sparse)"""
+        return {
+            "precision": self.precision,
+            "unit": self.unit,
+            "min": self.min,
+            "max": self.max,
+            "sum": self.sum,
+            "counts": {str(index): count
+                       for index, count in enumerate(self.counts) if count},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """create the histogram from the to_dict() representation"""
+        histogram = cls(data["precision"], data["unit"])
+        counts = {int(index): count for index, count in data["counts"].items()}
+        if counts:
+            histogram.counts.extend([0] * (max(counts) + 1))
+            for index, count in counts.items():
+                histogram.counts[index] = count
+        histogram.total = sum(counts.values())
+        histogram.sum = data["sum"]
+        histogram.min, histogram.max = data["min"], data["max"]
+        return histogram
+
+    def __len__(self):
+        return self.total
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+#
+# identities.py
+# Author: Alex Kozadaev (2014)
+#
+
+import copy
+import ipaddress
+import math
+import struct
+
+# 3GPP-User-Location-Info location types (3GPP TS 29.061)
+CGI, SAI, RAI, TAI, ECGI = 0, 1, 2, 128, 129
+MASK64 = (1 << 64) - 1
+
+
+def mix(value):
+    """splitmix64 finalizer - the pseudo random 64 bit value of value"""
+    value = (value + 0x9e3779b97f4a7c15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xbf58476d1ce4e5b9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94d049bb133111eb) & MASK64
+    return value ^ (value >> 31)
+
+
+def plmn_bcd(mcc, mnc):
+    """the 3 octets of the PLMN identity (BCD - 3GPP TS 24.008)"""
+    if len(mcc) != 3 or len(mnc) not in (2, 3) or \
+            not (mcc + mnc).isdigit():
+        raise ValueError(f"invalid MCC/MNC: {mcc}/{mnc}")
+    digits = [int(digit) for digit in mcc + mnc]
+    mnc3 = digits[5] if len(mnc) == 3 else 0xf
+    return bytes(((digits[1] << 4) | digits[0], (mnc3 << 4) | digits[2],
+                  (digits[4] << 4) | digits[3]))
+
+
+class IdentityRange:
+    """Seekable range of the synthetic identities
+
+    The Nth identity is computed (O(1)) - nothing is stored and the range
+    is iterated lazily. The identities are unique within the whole space
+    (total) of the range. With shuffle set they are spread over the space
+    by a fixed permutation (an affine map modulo total) rather than
+    following each other. partition() splits the range between the
+    workers without any coordination.
+
+    Subclasses implement identity(position) for the positions in
+    range(total)."""
+
+    def __init__(self, total, shuffle=False):
+        if total < 1:
+            raise ValueError("empty identity range")
+        self.total = total
+        self.first = 0
+        self.size = total
+        self.multiplier = 1
+        if shuffle:  # coprime with total, so the map is a permutation
+            self.multiplier = int(total * 0.6180339887) | 1
+            while math.gcd(self.multiplier, total) != 1:
+                self.multiplier += 2
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("identity index out of range")
+        return self.identity((self.first + index) * self.multiplier %
+                             self.total)
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self[index]
+
+    def partition(self, part, parts):
+        """return the part (0 to parts - 1) of the range split into parts
+        (almost) equal disjoint ranges"""
+        if not 0 <= part < parts:
+            raise ValueError(f"invalid partition {part} of {parts}")
+        result = copy.copy(self)
+        start = self.size * part // parts
+        result.first = self.first + start
+        result.size = self.size * (part + 1) // parts - start
+        return result
+
+    def identity(self, position):
+        raise NotImplementedError()
+
+
+class DigitRange(IdentityRange):
+    """Identities of length digits starting with the prefix (and ending
+    with the suffix) - the digits in between count from start"""
+
+    def __init__(self, prefix, length, start=0, count=None, suffix="",
+                 shuffle=False):
+        if not (prefix + suffix).isdigit() and (prefix or suffix):
+            raise ValueError(f"invalid identity prefix: {prefix}")
+        self.prefix = prefix
+        self.suffix = suffix
+        self.digits = length - len(prefix) - len(suffix)
+        self.start = start
+        if self.digits < 1:
+            raise ValueError(f"the prefix is too long: {prefix}")
+        capacity = 10 ** self.digits - start
+        if count is None:
+            count = capacity
+        if start < 0 or count > capacity:
+            raise ValueError(f"the range does not fit {self.digits} digits")
+        super().__init__(count, shuffle)
+
+    def identity(self, position):
+        return f"{self.prefix}{self.start + position:0{self.digits}d}" \
+            f"{self.suffix}"
+
+
+class ImsiRange(DigitRange):
+    """IMSIs (15 digits) - MCC, MNC and the MSIN counting from start"""
+
+    def __init__(self, mcc, mnc, start=0, count=None, shuffle=False):
+        plmn_bcd(mcc, mnc)  # validate
+        super().__init__(mcc + mnc, 15, start, count, shuffle=shuffle)
+
+
+class ImeisvRange(DigitRange):
+    """IMEISVs (16 digits) - the TAC (8 digits), the serial number
+    counting from start and the software version (2 digits)"""
+
+    def __init__(self, tac, start=0, count=None, svn="00", shuffle=False):
+        if len(tac) != 8 or len(svn) != 2:
+            raise ValueError(f"invalid TAC/SVN: {tac}/{svn}")
+        super().__init__(tac, 16, start, count, svn, shuffle)
+
+
+class MsisdnRange(DigitRange):
+    """MSISDNs (E.164 - up to 15 digits) - the country code and the
+    national destination code (prefix) and the subscriber number"""
+
+    def __init__(self, prefix, length=12, start=0, count=None,
+                 shuffle=False):
+        if length > 15:
+            raise ValueError(f"MSISDN too long: {length}")
+        super().__init__(prefix, length, start, count, shuffle=shuffle)
+
+
+class AddressRange(IdentityRange):
+    """IPv4/IPv6 addresses of the network counting from start (the
+    network address is skipped by default and the IPv4 broadcast one is
+    never used)"""
+
+    def __init__(self, network, start=1, count=None, shuffle=False):
+        self.network = ipaddress.ip_network(network, strict=False)
+        self.start = start
+        capacity = self.network.num_addresses - start
+        if self.network.version == 4 and self.network.prefixlen < 31:
+            capacity -= 1
+        if count is None:
+            count = capacity
+        if start < 0 or count > capacity:
+            raise ValueError(f"the range does not fit {network}")
+        self.base = int(self.network.network_address) + start
+        super().__init__(count, shuffle)
+
+    def identity(self, position):
+        return str(ipaddress.ip_address(self.base + position))
+
+
+class PrefixRange(IdentityRange):
+    """Prefixes (ADDRESS/LENGTH) of prefix_length the network is split
+    into - eg. the Framed-IPv6-Prefix or the delegated prefixes"""
+
+    def __init__(self, network, prefix_length, start=0, count=None,
+                 shuffle=False):
+        self.network = ipaddress.ip_network(network, strict=False)
+        self.prefix_length = prefix_length
+        self.start = start
+        bits = self.network.max_prefixlen
+        if not self.network.prefixlen <= prefix_length <= bits:
+            raise ValueError(f"invalid prefix length: {prefix_length}")
+        self.shift = bits - prefix_length
+        capacity = (1 << (prefix_length - self.network.prefixlen)) - start
+        if count is None:
+            count = capacity
+        if start < 0 or count > capacity:
+            raise ValueError(f"the range does not fit {network}")
+        super().__init__(count, shuffle)
+
+    def identity(self, position):
+        address = ipaddress.ip_address(
+            int(self.network.network_address) +
+            ((self.start + position) << self.shift))
+        return f"{address}/{self.prefix_length}"
+
+
+class LocationRange(IdentityRange):
+    """Random 3GPP-User-Location-Info values (the location type, the PLMN
+    and the pseudo random area and cell codes of the location type)
+
+    The Nth value is derived from seed and N - the same range gives the
+    same values in every worker. The values are not unique."""
+
+    FORMATS = {
+        CGI: "!HH",  # LAC, CI
+        SAI: "!HH",  # LAC, SAC
+        RAI: "!HB",  # LAC, RAC
+        TAI: "!H",  # TAC
+        ECGI: "!L",  # ECI (28 bits)
+    }
+
+    def __init__(self, mcc, mnc, location_type=SAI, count=1 << 32, seed=0):
+        if location_type not in self.FORMATS:
+            raise ValueError(f"unsupported location type: {location_type}")
+        self.header = bytes((location_type, )) + plmn_bcd(mcc, mnc)
+        self.format = struct.Struct(self.FORMATS[location_type])
+        self.location_type = location_type
+        self.seed = mix(seed)
+        super().__init__(count)
+
+    def identity(self, position):
+        value = mix(self.seed ^ position)
+        if self.location_type == ECGI:
+            fields = (value & 0xfffffff, )
+        elif self.location_type == TAI:
+            fields = (value & 0xffff, )
+        else:  # 0 and 0xffff are reserved LACs
+            fields = (value % 0xfffe + 1, (value >> 16) & (
+                0xff if self.location_type == RAI else 0xffff))
+        return self.header + self.format.pack(*fields)
+
+
+RANGE_TYPES = {
+    "digits": DigitRange,
+    "imsi": ImsiRange,
+    "imeisv": ImeisvRange,
+    "msisdn": MsisdnRange,
+    "address": AddressRange,
+    "prefix": PrefixRange,
+    "location": LocationRange,
+}
+
+
+def create_range(spec):
+    """create the identity range of the spec - a dictionary with the range
+    type and the arguments of its class, eg.
+    {"type": "imsi", "mcc": "262", "mnc": "01", "count": 1000}"""
+    params = dict(spec)
+    range_type = params.pop("type", None)
+    if range_type not in RANGE_TYPES:
+        raise ValueError(f"unknown identity range type: {range_type}")
+    try:
+        return RANGE_TYPES[range_type](**params)
+    except TypeError as err:
+        raise ValueError(f"invalid {range_type} range: {err}")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+#
+# journal.py
+# Author: Alex Kozadaev (2014)
+#
+# Packet journal - the raw packets sent and received with their
+# timestamps kept in a fixed size ring buffer in a memory mapped file. A
+# packet is journalled by copying it into the mapping (nothing is
+# formatted or written by the process - the kernel writes the pages
+# back, even if the process dies), the oldest packets are overwritten
+# once the journal is full. The journal is decoded after the run (see
+# dump() and "python -m libradi.journal").
+#
+# The file is the header followed by the ring buffer of the records:
+#
+#   header: magic, capacity, head, tail, count, dropped (u64 each)
+#   record: timestamp (double), direction (u8), length (u16), packet
+#
+# The records are between tail (the oldest one) and head (where the next
+# one goes). A record never wraps around the end of the buffer - the rest
+# of the buffer is skipped (marked by a WRAP record if there is room).
+#
+
+import mmap
+import struct
+import sys
+import time
+
+from . import decoder
+from . import dictionary
+
+JOURNAL_MAGIC = b"RADIJRN1"
+JOURNAL_HDR = struct.Struct("!8sQQQQQ")
+RECORD_HDR = struct.Struct("!dBH")
+JOURNAL_SIZE = 16 * 1024 * 1024  # the ring buffer (bytes)
+SENT, RECEIVED, WRAP = 0, 1, 0xff
+DIRECTIONS = {SENT: "sent", RECEIVED: "received"}
+
+
+class Journal:
+    """Ring buffer journal writer (see the module notes) - the file is
+    created (or truncated) with the ring buffer of size bytes"""
+
+    def __init__(self, filename, size=JOURNAL_SIZE):
+        if size < RECORD_HDR.size + decoder.RADIUS_HDR_LEN:
+            raise ValueError(f"invalid journal size: {size}")
+        self.filename = filename
+        self.capacity = size
+        with open(filename, "w+b") as f:
+            f.truncate(JOURNAL_HDR.size + size)
+            self.mmap = mmap.mmap(f.fileno(), JOURNAL_HDR.size + size)
+        self.head = self.tail = self.count = self.dropped = 0
+        self.sync()
+
+    def sync(self):
+        """write the header (the positions of the records)"""
+        JOURNAL_HDR.pack_into(self.mmap, 0, JOURNAL_MAGIC, self.capacity,
+                              self.head, self.tail, self.count,
+                              self.dropped)
+
+    def evict(self):
+        """drop the oldest record (or skip the end of the buffer)"""
+        offset = JOURNAL_HDR.size + self.tail
+        if self.capacity - self.tail < RECORD_HDR.size or \
+                self.mmap[offset + 8] == WRAP:
+            self.tail = 0
+            return
+        length = RECORD_HDR.unpack_from(self.mmap, offset)[2]
+        self.tail += RECORD_HDR.size + length
+        self.count -= 1
+        self.dropped += 1
+
+    def write(self, direction, packet, timestamp=None):
+        """journal the packet (SENT or RECEIVED) at the timestamp (the
+        current time by default)"""
+        if timestamp is None:
+            timestamp = time.time()
+        size = RECORD_HDR.size + len(packet)
+        if size > self.capacity:
+            self.dropped += 1
+            return
+        if self.head + size > self.capacity:  # wrap around
+            while self.count and self.tail >= self.head:
+                self.evict()
+            if self.capacity - self.head >= RECORD_HDR.size:
+                RECORD_HDR.pack_into(self.mmap,
+                                     JOURNAL_HDR.size + self.head, 0.0,
+                                     WRAP, 0)
+            self.head = 0
+        while self.count and self.head <= self.tail < self.head + size:
+            self.evict()
+        if not self.count:
+            self.tail = self.head
+        offset = JOURNAL_HDR.size + self.head
+        RECORD_HDR.pack_into(self.mmap, offset, timestamp, direction,
+                             len(packet))
+        offset += RECORD_HDR.size
+        self.mmap[offset:offset + len(packet)] = packet
+        self.head += size
+        self.count += 1
+        self.sync()
+
+    def sent(self, packet):
+        self.write(SENT, packet)
+
+    def received(self, packet):
+        self.write(RECEIVED, packet)
+
+    def close(self):
+        if not self.mmap.closed:
+            self.sync()
+            self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read(filename):
+    """read the journal returning (the dropped packets, the list of the
+    (timestamp, direction, packet) records - the oldest first)"""
+    with open(filename, "rb") as f:
+        data = f.read()
+    if len(data) < JOURNAL_HDR.size or \
+            data[:len(JOURNAL_MAGIC)] != JOURNAL_MAGIC:
+        raise ValueError(f"{filename}: not a packet journal")
+    magic, capacity, head, tail, count, dropped = \
+        JOURNAL_HDR.unpack_from(data)
+    if len(data) != JOURNAL_HDR.size + capacity:
+        raise ValueError(f"{filename}: truncated packet journal")
+    records, offset = [], tail
+    while len(records) < count:
+        if capacity - offset < RECORD_HDR.size or \
+                data[JOURNAL_HDR.size + offset + 8] == WRAP:
+            offset = 0
+            continue
+        timestamp, direction, length = RECORD_HDR.unpack_from(
+            data, JOURNAL_HDR.size + offset)
+        start = JOURNAL_HDR.size + offset + RECORD_HDR.size
+        if start + length > len(data):
+            raise ValueError(f"{filename}: corrupted packet journal")
+        records.append((timestamp, direction, data[start:start + length]))
+        offset += RECORD_HDR.size + length
+    return dropped, records
+
+
+def format_packet(packet, context):
+    """the lines describing the packet (its attributes resolved via the
+    context - see dictionary.load)"""
+    try:
+        code, pid, length, auth = decoder.unpack_header(packet)
+        attributes = list(decoder.decode_attributes(packet, context, length))
+    except (ValueError, NotImplementedError) as err:
+        return [f"  malformed packet ({err}): {packet.hex()}"]
+    lines = [f"  {decoder.PACKET_CODES.get(code, code)} id {pid} "
+             f"length {length} auth {bytes(auth).hex()}"]
+    for attribute, value in attributes:
+        if attribute is None:
+            lines.append(f"    unknown attribute: {bytes(value).hex()}")
+            continue
+        name = attribute.get_value_name(value) \
+            if attribute.has_defined_values() else None
+        lines.append(f"    {attribute.attr_name} = {name or value}")
+    return lines
+
+
+def dump(filename, context, output=None):
+    """pretty print the journal (see format_packet) to the output file
+    (stdout by default)"""
+    output = output or sys.stdout
+    dropped, records = read(filename)
+    print(f"{filename}: {len(records)} packets ({dropped} dropped)",
+          file=output)
+    for timestamp, direction, packet in records:
+        clock = time.strftime("%H:%M:%S", time.localtime(timestamp))
+        print(f"{clock}.{int(timestamp % 1 * 1e6):06d} "
+              f"{DIRECTIONS.get(direction, direction)}", file=output)
+        for line in format_packet(packet, context):
+            print(line, file=output)
+
+
+def main(argv):
+    if len(argv) not in (2, 4):
+        print("usage: python -m libradi.journal JOURNAL [DICT_PATH "
+              "DICT_FILE]", file=sys.stderr)
+        return 2
+    dict_path, dict_file = argv[2:] or ("dict", "dictionary")
+    dump(argv[1], dictionary.load(dict_path, dict_file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
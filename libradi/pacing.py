@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+#
+# pacing.py
+# Author: Alex Kozadaev (2014)
+#
+
+import random
+import time
+
+PACING_MODES = ("constant", "poisson", "bucket")
+
+
+class RateProfile:
+    """Target packet rate (packets per second) over time"""
+
+    def __init__(self, rate):
+        check_rate(rate)
+        self.target = rate
+
+    def rate(self, elapsed):
+        """target rate after elapsed seconds"""
+        return self.target
+
+    def count(self, elapsed):
+        """target number of packets sent in elapsed seconds"""
+        return self.target * elapsed
+
+    def __str__(self):
+        return f"{self.target:g} pps"
+
+
+class RampProfile(RateProfile):
+    """Rate changing linearly from start to end over duration seconds (the
+    end rate is kept afterwards)"""
+
+    def __init__(self, start, end, duration):
+        check_rate(start)
+        check_rate(end)
+        if duration <= 0:
+            raise ValueError(f"invalid ramp duration: {duration}")
+        self.start, self.end, self.duration = start, end, duration
+
+    def rate(self, elapsed):
+        if elapsed >= self.duration:
+            return self.end
+        return self.start + (self.end - self.start) * elapsed / self.duration
+
+    def count(self, elapsed):
+        ramp = min(elapsed, self.duration)
+        count = (self.start + self.rate(ramp)) / 2 * ramp
+        return count + self.end * max(elapsed - self.duration, 0)
+
+    def __str__(self):
+        return f"{self.start:g}-{self.end:g} pps over {self.duration:g}s"
+
+
+class StepProfile(RateProfile):
+    """Rate changing in steps - a list of (duration, rate) tuples (the last
+    rate is kept afterwards)"""
+
+    def __init__(self, steps):
+        if not steps:
+            raise ValueError("no rate steps given")
+        for duration, rate in steps:
+            check_rate(rate)
+            if duration <= 0:
+                raise ValueError(f"invalid step duration: {duration}")
+        self.steps = list(steps)
+
+    def rate(self, elapsed):
+        for duration, rate in self.steps:
+            if elapsed < duration:
+                return rate
+            elapsed -= duration
+        return self.steps[-1][1]
+
+    def count(self, elapsed):
+        count = 0.0
+        for duration, rate in self.steps:
+            count += rate * min(elapsed, duration)
+            elapsed -= duration
+            if elapsed <= 0:
+                return count
+        return count + self.steps[-1][1] * elapsed
+
+    def __str__(self):
+        return ",".join(f"{rate:g}x{duration:g}s"
+                        for duration, rate in self.steps)
+
+
+class Pacer:
+    """Send packets at the rate of the profile with constant intervals
+
+    The packets are scheduled against absolute due times, so the timing
+    errors do not add up. The pacer sleeps only if it is ahead of the
+    schedule by more than resolution seconds - at high rates the packets
+    which are due within the resolution are sent back to back and the
+    sleep is shared between them. A pacer falling behind the schedule
+    catches up with at most max_lag seconds worth of packets (the rest is
+    dropped from the schedule rather than sent as a burst).
+
+    profile - RateProfile (or a number - constant rate)"""
+
+    def __init__(self, profile, resolution=0.001, max_lag=None,
+                 clock=time.perf_counter, sleep=time.sleep):
+        if not isinstance(profile, RateProfile):
+            profile = RateProfile(profile)
+        self.profile = profile
+        self.resolution = resolution
+        self.max_lag = resolution if max_lag is None else max_lag
+        self.clock = clock
+        self.sleep = sleep
+        self.started = None
+        self.due = None
+        self.sent = 0
+
+    def start(self):
+        self.started = self.due = self.clock()
+        self.sent = 0
+
+    def interval(self, elapsed):
+        """time to the next packet scheduled after elapsed seconds"""
+        return 1.0 / self.profile.rate(elapsed)
+
+    def next(self):
+        """schedule the next packet returning the time (seconds) to wait
+        before sending it - 0 if the packet can be sent right away. Allows
+        pacing without blocking (eg. with asyncio.sleep())"""
+        if self.started is None:
+            self.start()
+        now = self.clock()
+        ahead = self.due - now
+        if -ahead > self.max_lag:
+            self.due = now - self.max_lag  # too far behind - skip ahead
+        self.sent += 1
+        self.due += self.interval(self.due - self.started)
+        return ahead if ahead > self.resolution else 0
+
+    def wait(self):
+        """block until the next packet is due"""
+        delay = self.next()
+        if delay:
+            self.sleep(delay)
+
+    def elapsed(self):
+        return self.clock() - self.started if self.started is not None \
+            else 0.0
+
+    def report(self):
+        """return (elapsed, packets sent, actual rate, target rate)"""
+        elapsed = self.elapsed()
+        if elapsed <= 0:
+            return 0.0, self.sent, 0.0, self.profile.rate(0)
+        return (elapsed, self.sent, self.sent / elapsed,
+                self.profile.count(elapsed) / elapsed)
+
+
+class PoissonPacer(Pacer):
+    """Send packets as a Poisson process - exponentially distributed
+    intervals with the mean given by the profile rate"""
+
+    def __init__(self, profile, seed=None, **kwargs):
+        super().__init__(profile, **kwargs)
+        self.random = random.Random(seed)
+
+    def interval(self, elapsed):
+        return self.random.expovariate(self.profile.rate(elapsed))
+
+
+class TokenBucketPacer(Pacer):
+    """Token bucket - the tokens are refilled at the profile rate and up to
+    burst packets can be sent back to back after an idle period"""
+
+    def __init__(self, profile, burst=1, **kwargs):
+        if burst < 1:
+            raise ValueError(f"invalid burst size: {burst}")
+        super().__init__(profile, **kwargs)
+        self.burst = burst
+
+    def next(self):
+        if self.started is not None:
+            # the bucket holds at most burst tokens
+            self.max_lag = max(self.burst - 1, 0) * self.interval(
+                self.clock() - self.started) + self.resolution
+        return super().next()
+
+
+def check_rate(rate):
+    if rate <= 0:
+        raise ValueError(f"invalid rate: {rate}")
+
+
+def parse_profile(spec):
+    """parse the rate profile specification:
+        RATE - constant rate (eg. 1000)
+        START-END/DURATION - ramp (eg. 1000-50000/600)
+        RATExDURATION,... - steps (eg. 1000x60,5000x60,10000x60)
+    The rates are in packets per second and the durations in seconds"""
+    try:
+        if "x" in spec:
+            steps = []
+            for step in spec.split(","):
+                rate, sep, duration = step.partition("x")
+                steps.append((float(duration), float(rate)))
+            return StepProfile(steps)
+        if "/" in spec:
+            rates, sep, duration = spec.partition("/")
+            start, sep, end = rates.partition("-")
+            return RampProfile(float(start), float(end), float(duration))
+        return RateProfile(float(spec))
+    except ValueError as e:
+        raise ValueError(f"invalid rate profile '{spec}': {e}") from e
+
+
+def create_pacer(spec, mode="constant"):
+    """create the pacer for the rate profile specification (see
+    parse_profile()) - mode is one of PACING_MODES with an optional burst
+    size for the token bucket (eg. bucket:100)"""
+    profile = parse_profile(spec)
+    mode, sep, burst = mode.partition(":")
+    if mode == "constant":
+        return Pacer(profile)
+    if mode == "poisson":
+        return PoissonPacer(profile)
+    if mode == "bucket":
+        try:
+            return TokenBucketPacer(profile, int(burst or 1))
+        except ValueError as e:
+            raise ValueError(f"invalid token bucket burst '{burst}'") from e
+    raise ValueError(f"unknown pacing mode: {mode}")
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+#
+# pcap.py
+# Author: Alex Kozadaev (2014)
+#
+
+import ipaddress
+import mmap
+import struct
+import time
+
+# default radius ports (auth, acct, old auth, old acct, dynamic auth)
+RADIUS_PORTS = frozenset((1812, 1813, 1645, 1646, 3799))
+
+PCAP_MAGIC_USEC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+PCAPNG_SHB = 0x0a0d0d0a
+PCAPNG_BYTE_ORDER = 0x1a2b3c4d
+PCAPNG_IDB, PCAPNG_SPB, PCAPNG_EPB = 1, 3, 6
+
+# link layer types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 101)
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4, ETHERTYPE_IPV6 = 0x0800, 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8, 0x9100)
+IPPROTO_UDP = 17
+IPV6_EXT_HEADERS = (0, 43, 60)  # hop-by-hop, routing, destination options
+IPV6_FRAGMENT = 44
+# the locally administered MAC addresses of the written frames
+WRITER_MACS = bytes.fromhex("020000000002" "020000000001")
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class PcapReader:
+    """Memory mapped pcap/pcapng reader.
+
+    Iterating over the reader yields (timestamp, payload) tuples for every
+    UDP datagram to or from one of the radius ports. The payloads are
+    memoryview slices of the mapped file (nothing is copied) and are valid
+    until the reader is closed. The mapping is read sequentially with
+    read-ahead and the consumed pages are released, so the memory footprint
+    does not depend on the size of the capture."""
+
+    READAHEAD = 8 * 1024 * 1024  # must be a multiple of mmap.PAGESIZE
+
+    def __init__(self, filename, ports=RADIUS_PORTS):
+        self.filename = filename
+        self.ports = frozenset(ports)
+        with open(filename, "rb") as f:
+            try:
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"{filename}: empty capture file")
+        self.data = memoryview(self.mmap)
+        self.advise(getattr(mmap, "MADV_SEQUENTIAL", None), 0, len(self.data))
+        self.format = self.detect_format()
+
+    def detect_format(self):
+        """detect the capture format by the magic number"""
+        if len(self.data) < 24:
+            raise ValueError(f"{self.filename}: truncated capture file")
+        for endian in "<>":
+            magic = struct.unpack_from(endian + "L", self.data)[0]
+            if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+                self.endian = endian
+                self.resolution = 1e-6 if magic == PCAP_MAGIC_USEC else 1e-9
+                self.linktype = struct.unpack_from(endian + "L", self.data,
+                                                   20)[0]
+                return "pcap"
+            if magic == PCAPNG_SHB:
+                return "pcapng"
+        raise ValueError(f"{self.filename}: unknown capture file format")
+
+    def advise(self, option, start, length):
+        """madvise() the range of the mapping if the platform supports it"""
+        if option is None or not hasattr(self.mmap, "madvise"):
+            return
+        start -= start % mmap.PAGESIZE
+        length = min(length, len(self.data) - start)
+        if length > 0:
+            self.mmap.madvise(option, start, length)
+
+    def frames(self, chunk=None):
+        """iterate over (timestamp, linktype, frame) of the captured frames
+        (of the whole capture or the chunk returned by split())"""
+        if self.format == "pcap":
+            start, end = chunk[:2] if chunk else (24, len(self.data))
+            return self.pcap_frames(start, end)
+        start, end, context = chunk if chunk else (0, len(self.data), None)
+        return self.pcapng_frames(start, end, context)
+
+    def split(self, parts):
+        """split the capture into (start, end, context) chunks of about the
+        same size. Only the record headers are read"""
+        if self.format == "pcap":
+            blocks = self.pcap_blocks(24, len(self.data))
+        else:
+            blocks = self.pcapng_blocks(0, len(self.data))
+        step = max(len(self.data) // max(parts, 1), 1)
+        chunks, start, context = [], None, None
+        for offset, block_context in blocks:
+            if start is None:
+                start, context = offset, block_context
+            elif offset - start >= step:
+                chunks.append((start, offset, context))
+                start, context = offset, block_context
+        if start is not None:
+            chunks.append((start, len(self.data), context))
+        return chunks
+
+    def pcap_blocks(self, start, end):
+        """iterate over the record offsets (context is always None)"""
+        record = struct.Struct(self.endian + "8xL")
+        offset = start
+        while offset + 16 <= end:
+            yield offset, None
+            offset += 16 + record.unpack_from(self.data, offset)[0]
+
+    def pcapng_blocks(self, start, end, context=None):
+        """iterate over the block offsets and the (endian, interfaces)
+        context the blocks are read with"""
+        data = self.data
+        endian, interfaces = context if context else ("<", ())
+        offset = start
+        while offset + 12 <= end:
+            block_type = struct.unpack_from(endian + "L", data, offset)[0]
+            if block_type == PCAPNG_SHB:
+                magic = struct.unpack_from("<L", data, offset + 8)[0]
+                endian = "<" if magic == PCAPNG_BYTE_ORDER else ">"
+                interfaces = ()  # interfaces are scoped by section
+            block_len = struct.unpack_from(endian + "L", data, offset + 4)[0]
+            if block_len < 12 or offset + block_len > end:
+                break  # truncated capture
+            yield offset, (endian, interfaces)
+            if block_type == PCAPNG_IDB:
+                interfaces += (self.pcapng_interface(endian, offset + 8,
+                                                     offset + block_len), )
+            offset += block_len
+
+    def pcap_frames(self, start, end):
+        data, endian = self.data, self.endian
+        record = struct.Struct(endian + "LLL")
+        offset, window = start, 0
+        while offset + 16 <= end:
+            if offset >= window:
+                window = self.readahead(offset)
+            ts_sec, ts_frac, incl_len = record.unpack_from(data, offset)
+            offset += 16
+            if offset + incl_len > end:
+                break  # truncated capture
+            yield (ts_sec + ts_frac * self.resolution, self.linktype,
+                   data[offset:offset + incl_len])
+            offset += incl_len
+
+    def pcapng_frames(self, start, end, context=None):
+        data, window = self.data, 0
+        for offset, (endian, interfaces) in self.pcapng_blocks(
+                start, end, context):
+            if offset >= window:
+                window = self.readahead(offset)
+            block_type, block_len = struct.unpack_from(endian + "LL", data,
+                                                       offset)
+            body = offset + 8
+            if block_type == PCAPNG_EPB:
+                if_id, ts_high, ts_low, cap_len = struct.unpack_from(
+                    endian + "LLLL", data, body)
+                linktype, resolution = interfaces[if_id]
+                yield (((ts_high << 32) | ts_low) * resolution, linktype,
+                       data[body + 20:body + 20 + cap_len])
+            elif block_type == PCAPNG_SPB and interfaces:
+                orig_len = struct.unpack_from(endian + "L", data, body)[0]
+                cap_len = min(orig_len, block_len - 16)
+                linktype = interfaces[0][0]
+                yield 0.0, linktype, data[body + 4:body + 4 + cap_len]
+
+    def pcapng_interface(self, endian, start, end):
+        """parse the interface description block - (linktype, resolution)"""
+        linktype = struct.unpack_from(endian + "H", self.data, start)[0]
+        resolution = 1e-6
+        offset = start + 8
+        while offset + 4 <= end - 4:
+            code, length = struct.unpack_from(endian + "HH", self.data, offset)
+            if code == 0:
+                break
+            if code == 9 and length == 1:  # if_tsresol
+                tsresol = self.data[offset + 4]
+                if tsresol & 0x80:
+                    resolution = 2.0**-(tsresol & 0x7f)
+                else:
+                    resolution = 10.0**-tsresol
+            offset += 4 + ((length + 3) & ~3)
+        return linktype, resolution
+
+    def readahead(self, offset):
+        """prefetch the next window of the mapping and drop the pages which
+        have already been consumed. Returns the end of the current window"""
+        window = offset - offset % self.READAHEAD
+        self.advise(getattr(mmap, "MADV_WILLNEED", None),
+                    window + self.READAHEAD, self.READAHEAD)
+        if window >= self.READAHEAD:
+            self.advise(getattr(mmap, "MADV_DONTNEED", None),
+                        window - self.READAHEAD, self.READAHEAD)
+        return window + self.READAHEAD
+
+    def __iter__(self):
+        return self.packets()
+
+    def packets(self, chunk=None):
+        """iterate over (timestamp, payload) of the radius packets (of the
+        whole capture or the chunk returned by split())"""
+        ports = self.ports
+        for timestamp, linktype, frame in self.frames(chunk):
+            udp = udp_datagram(linktype, frame)
+            if udp is None or len(udp) < 8:
+                continue
+            src_port, dst_port, length = struct.unpack_from("!HHH", udp)
+            if src_port in ports or dst_port in ports:
+                yield timestamp, udp[8:max(8, min(length, len(udp)))]
+
+    def close(self):
+        self.data.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            pass  # payloads are still referenced - unmapped when collected
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PcapWriter:
+    """Buffered pcap writer of the UDP datagrams
+
+    The payloads are written as ethernet/IPv4 (or IPv6)/UDP frames sent
+    from src_tuple to dst_tuple (ip, port) - ready for the inspection or
+    tcpreplay. The records are collected in a buffer written to the file
+    in bulk when it fills up (buffer_size bytes)."""
+
+    def __init__(self, filename, src_tuple=None, dst_tuple=("127.0.0.1",
+                                                            1813),
+                 buffer_size=WRITE_BUFFER_SIZE):
+        dst = ipaddress.ip_address(dst_tuple[0])
+        if src_tuple is None:
+            src_tuple = ("127.0.0.1" if dst.version == 4 else "::1", 50000)
+        src = ipaddress.ip_address(src_tuple[0])
+        if src.version != dst.version:
+            raise ValueError("the source and destination IP versions differ")
+        self.version = dst.version
+        self.addresses = src.packed + dst.packed
+        self.ports = (src_tuple[1], dst_tuple[1])
+        self.ethernet = WRITER_MACS + struct.pack(
+            "!H", ETHERTYPE_IPV4 if self.version == 4 else ETHERTYPE_IPV6)
+        self.buffer_size = buffer_size
+        self.buffer = bytearray(struct.pack("<LHHlLLL", PCAP_MAGIC_USEC, 2,
+                                            4, 0, 0, 65535,
+                                            LINKTYPE_ETHERNET))
+        self.count = 0
+        self.file = open(filename, "wb")
+
+    def write(self, payload, timestamp=None):
+        """write the UDP payload captured at timestamp (now by default)"""
+        if timestamp is None:
+            timestamp = time.time()
+        udp_len = 8 + len(payload)
+        if self.version == 4:
+            ip = bytearray(struct.pack("!BBHHHBBH", 0x45, 0, 20 + udp_len,
+                                       self.count & 0xffff, 0, 64,
+                                       IPPROTO_UDP, 0) + self.addresses)
+            struct.pack_into("!H", ip, 10, checksum(ip))
+            udp = struct.pack("!HHHH", *self.ports, udp_len, 0)
+        else:  # the UDP checksum is mandatory over IPv6
+            ip = struct.pack("!LHBB", 0x60000000, udp_len, IPPROTO_UDP,
+                             64) + self.addresses
+            header = struct.pack("!HHH", *self.ports, udp_len)
+            udp = header + struct.pack("!H", checksum(b"".join((
+                self.addresses, struct.pack("!LL", udp_len, IPPROTO_UDP),
+                header, bytes(2), payload))) or 0xffff)
+        frame_len = len(self.ethernet) + len(ip) + udp_len
+        seconds = int(timestamp)
+        self.buffer += struct.pack("<LLLL", seconds,
+                                   int((timestamp - seconds) * 1e6),
+                                   frame_len, frame_len)
+        self.buffer += self.ethernet
+        self.buffer += ip
+        self.buffer += udp
+        self.buffer += payload
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def checksum(data):
+    """the internet checksum (RFC 1071) of the data"""
+    if len(data) % 2:
+        data = bytes(data) + b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def ip_packet(linktype, frame):
+    """strip the link layer header returning the IP packet (or None)"""
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        while len(frame) >= offset + 2:
+            ethertype = struct.unpack_from("!H", frame, offset)[0]
+            if ethertype not in ETHERTYPE_VLAN:
+                break
+            offset += 4
+        else:
+            return None
+        packet = frame[offset + 2:]
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if len(frame) < 16:
+            return None
+        ethertype, packet = struct.unpack_from("!H", frame, 14)[0], frame[16:]
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        if len(frame) < 20:
+            return None
+        ethertype, packet = struct.unpack_from("!H", frame, 0)[0], frame[20:]
+    elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        return frame[4:]  # the family is checked by the IP version
+    elif linktype in LINKTYPE_RAW or linktype in (LINKTYPE_IPV4,
+                                                  LINKTYPE_IPV6):
+        return frame
+    else:
+        return None
+
+    if ethertype in (ETHERTYPE_IPV4, ETHERTYPE_IPV6):
+        return packet
+    return None
+
+
+def udp_datagram(linktype, frame):
+    """return the UDP datagram (header included) carried in the frame or
+    None if the frame does not contain an unfragmented UDP datagram"""
+    packet = ip_packet(linktype, frame)
+    if not packet:
+        return None
+
+    version = packet[0] >> 4
+    if version == 4:
+        if len(packet) < 20:
+            return None
+        ihl = (packet[0] & 0x0f) * 4
+        total_len, frag = struct.unpack_from("!H2xH", packet, 2)
+        if packet[9] != IPPROTO_UDP or frag & 0x3fff:
+            return None  # not UDP or a fragment
+        return packet[ihl:total_len or len(packet)]
+    elif version == 6:
+        if len(packet) < 40:
+            return None
+        next_header, offset = packet[6], 40
+        end = 40 + struct.unpack_from("!H", packet, 4)[0]
+        while next_header in IPV6_EXT_HEADERS and offset + 8 <= len(packet):
+            next_header = packet[offset]
+            offset += (packet[offset + 1] + 1) * 8
+        if next_header != IPPROTO_UDP:
+            return None  # not UDP (fragments are not reassembled)
+        return packet[offset:end]
+    return None
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+#
+# pipeline.py
+# Author: Alex Kozadaev (2014)
+#
+# Pipelined sender - the requests are built by the producer (the caller),
+# encoded and signed in batches by a thread pool and sent by a dedicated
+# I/O thread, so the encoding, the MD5 of the authenticators and sendto()
+# of the consecutive batches overlap:
+#
+#   producer --> signing pool (workers) --> queue (depth) --> I/O thread
+#
+# The signed batches are queued in the order they were submitted (the
+# futures), so the requests are sent in order. The queue is bounded - the
+# producer blocks once depth batches are pending (back-pressure).
+#
+# NOTE: sendto() releases the GIL. hashlib releases it only for the large
+# buffers (not the radius packets), so the signing itself runs in
+# parallel on the free-threaded CPython builds only (see free_threaded).
+#
+
+import concurrent.futures
+import copy
+import os
+import queue
+import sys
+import threading
+import time
+
+from . import radius
+
+BATCH_SIZE = 64  # requests signed by a single task
+QUEUE_DEPTH = 8  # signed batches waiting for the I/O thread
+
+
+def free_threaded():
+    """true if the interpreter runs without the GIL"""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def default_workers():
+    """the number of the signing threads - one per CPU if the interpreter
+    runs without the GIL (a single one otherwise, the rest would only
+    contend for the GIL)"""
+    return (os.cpu_count() or 1) if free_threaded() else 1
+
+
+def sign_batch(requests):
+    """encode and sign the batch of the requests returning the packets"""
+    return [request.dump() for request in requests]
+
+
+class Pipeline:
+    """Pipelined sender of the requests (RadiusMessage interface) to
+    dest_tuple (dest_ip, dest_port) through the socket sock (a new one if
+    None). See the module notes.
+
+    workers - the signing threads (default_workers() if None)
+    batch - the requests signed by a single task
+    depth - the signed batches waiting to be sent at most
+    pacer - delays the packets until they are due (see libradi.pacing)
+    journal - the sent packets are added to (see libradi.journal)"""
+
+    def __init__(self, dest_tuple, sock=None, workers=None,
+                 batch=BATCH_SIZE, depth=QUEUE_DEPTH, pacer=None,
+                 journal=None):
+        if batch < 1 or depth < 1 or (workers is not None and workers < 1):
+            raise ValueError("invalid pipeline size: workers "
+                             f"{workers}, batch {batch}, depth {depth}")
+        self.dest_tuple = dest_tuple
+        self.sock = sock
+        self.workers = workers or default_workers()
+        self.batch = batch
+        self.depth = depth
+        self.pacer = pacer
+        self.journal = journal
+        self.sent = 0
+        self.error = None  # raised by the I/O thread
+
+    def sender(self, sock, batches):
+        """the I/O thread - send the signed batches until the end (None).
+        The batches are drained (not sent) after an error, so that the
+        producer is never blocked"""
+        dest, pacer, journal = self.dest_tuple, self.pacer, self.journal
+        while True:
+            future = batches.get()
+            if future is None:
+                return
+            if self.error:
+                future.cancel()
+                continue
+            try:
+                for packet in future.result():
+                    if pacer:
+                        pacer.wait()
+                    if journal:
+                        journal.sent(packet)
+                    sock.sendto(packet, dest)
+                    self.sent += 1
+            except Exception as e:
+                self.error = e
+
+    def send(self, requests, count, pid=None):
+        """send count requests of the iterator requests. The packet
+        identifier of the requests is incremented starting with pid (the
+        identifier of the first request if None) - the requests are copied,
+        so an iterator may repeat the same request
+
+        Returns a tuple with the number of sent requests and the elapsed
+        time"""
+        own_sock = self.sock is None
+        sock = radius.create_socket(self.dest_tuple[0]) if own_sock \
+            else self.sock
+        batches = queue.Queue(self.depth)
+        thread = threading.Thread(target=self.sender, args=(sock, batches),
+                                  name="radi-sender", daemon=True)
+        self.sent, self.error = 0, None
+        started = time.perf_counter()
+        thread.start()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="radi-sign") as pool:
+                try:
+                    for start in range(0, count, self.batch):
+                        if self.error:
+                            break
+                        chunk = []
+                        for n in range(min(self.batch, count - start)):
+                            request = copy.copy(next(requests))
+                            if pid is None:
+                                pid = request.pid
+                            request.pid = pid
+                            pid = (pid + 1) & 0xff
+                            chunk.append(request)
+                        # blocks while depth batches are pending
+                        batches.put(pool.submit(sign_batch, chunk))
+                finally:
+                    batches.put(None)
+                    thread.join()
+        finally:
+            if own_sock:
+                sock.close()
+        if self.error:
+            raise self.error
+        return self.sent, time.perf_counter() - started
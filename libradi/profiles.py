@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+#
+# profiles.py
+# Author: Alex Kozadaev (2014)
+#
+
+import fcntl
+import json
+import os
+
+STORE_MAGIC = b"radi-profiles"
+STORE_VERSION = 1
+
+
+class ProfileStore:
+    """Store of named profiles in a single append-only file.
+
+    The file starts with a "radi-profiles <version>" header followed by one
+    "<name>\\t<json record>\\n" line per saved profile. Saving a profile
+    appends a line, so the rest of the file is never rewritten, and the
+    last line of a name wins. An empty record deletes the profile. Loading
+    a profile decodes only the lines of the requested name. The file is
+    compacted once the stale lines outnumber the live ones. The appends
+    and the compaction hold an exclusive lock of the file, so the records
+    of the concurrent processes are never lost."""
+
+    COMPACT_MIN_LINES = 64
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lines = 0  # number of records (as seen by the last scan)
+        self.names = set()  # live profiles (as seen by the last scan)
+
+    def scan(self, name=None):
+        """read the store returning the last raw record of name (if any)"""
+        prefix = name.encode("utf-8") + b"\t" if name is not None else None
+        record, names, lines = None, set(), 0
+        try:
+            with open(self.filename, "rb") as f:
+                self.check_header(f.readline())
+                for line in f:
+                    lines += 1
+                    key, sep, value = line.partition(b"\t")
+                    if value.strip():
+                        names.add(key)
+                    else:
+                        names.discard(key)
+                    if prefix is not None and line.startswith(prefix):
+                        record = value
+        except FileNotFoundError:
+            pass
+        self.lines = lines
+        self.names = {key.decode("utf-8") for key in names}
+        return record
+
+    def check_header(self, header):
+        magic, sep, version = header.strip().partition(b" ")
+        if magic != STORE_MAGIC or not version.isdigit():
+            raise ValueError(f"{self.filename}: not a profile store")
+        if int(version) > STORE_VERSION:
+            raise ValueError(f"{self.filename}: unsupported profile store "
+                             f"version {int(version)}")
+
+    def load(self, name):
+        """load the profile record (a dictionary) or None if not found"""
+        record = self.scan(name)
+        if record is None or not record.strip():
+            return None
+        try:
+            return json.loads(record)
+        except ValueError as e:
+            raise ValueError(f"{self.filename}: corrupted profile "
+                             f"{name}") from e
+
+    def save(self, name, record):
+        """save the profile record (a json serializable dictionary)"""
+        self.append(name, json.dumps(record, sort_keys=True,
+                                     separators=(",", ":")))
+
+    def delete(self, name):
+        """delete the profile"""
+        if self.load(name) is not None:
+            self.append(name, "")
+
+    def get_names(self):
+        """return a sorted list of the stored profile names"""
+        self.scan()
+        return sorted(self.names)
+
+    def append(self, name, value):
+        if not name or "\t" in name or "\n" in name:
+            raise ValueError(f"invalid profile name: {name!r}")
+        line = f"{name}\t{value}\n".encode("utf-8")
+        fd = self.lock(os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            if os.fstat(fd).st_size == 0:
+                line = self.header() + line
+            os.write(fd, line)  # a single write keeps the line in one piece
+        finally:
+            os.close(fd)
+        self.lines += 1
+        if value:
+            self.names.add(name)
+        else:
+            self.names.discard(name)
+        if self.lines > max(self.COMPACT_MIN_LINES, 2 * len(self.names)):
+            self.compact()
+
+    def header(self):
+        return b"%s %d\n" % (STORE_MAGIC, STORE_VERSION)
+
+    def lock(self, flags):
+        """open the store returning the file descriptor locked exclusively
+        (closing it releases the lock). Opened again if the file was
+        replaced (compacted) while waiting for the lock"""
+        while True:
+            fd = os.open(self.filename, flags, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.path.samestat(os.fstat(fd), os.stat(self.filename)):
+                    return fd
+            except FileNotFoundError:
+                pass  # removed meanwhile
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+    def compact(self):
+        """rewrite the store keeping only the last record of each profile"""
+        import tempfile  # deferred - only needed for the compaction
+        records = {}
+        fd = self.lock(os.O_RDONLY)
+        try:
+            with open(fd, "rb", closefd=False) as f:
+                self.check_header(f.readline())
+                for line in f:
+                    key, sep, value = line.partition(b"\t")
+                    records[key] = line
+                    if not value.strip():
+                        del records[key]
+            temp_fd, temp_name = tempfile.mkstemp(
+                ".tmp", os.path.basename(self.filename) + ".",
+                os.path.dirname(os.path.abspath(self.filename)))
+            try:
+                with os.fdopen(temp_fd, "wb") as f:
+                    os.fchmod(f.fileno(), os.fstat(fd).st_mode & 0o777)
+                    f.write(self.header())
+                    f.writelines(records.values())
+                os.replace(temp_name, self.filename)
+            except BaseException:
+                os.unlink(temp_name)
+                raise
+        finally:
+            os.close(fd)
+        self.lines = len(records)
+
+
+class CachedProfileStore(ProfileStore):
+    """Profile store keeping the records in memory - for the long running
+    processes being the only writer of the store (eg. the daemon). The file
+    is read once, the saved records are still appended to it"""
+
+    def __init__(self, filename):
+        super().__init__(filename)
+        self.records = None  # name -> json record
+
+    def read_records(self):
+        records, self.lines = {}, 0
+        try:
+            with open(self.filename, "rb") as f:
+                self.check_header(f.readline())
+                for line in f:
+                    self.lines += 1
+                    key, sep, value = line.partition(b"\t")
+                    records[key.decode("utf-8")] = value.strip()
+        except FileNotFoundError:
+            pass
+        self.records = {name: value.decode("utf-8")
+                        for name, value in records.items() if value}
+        self.names = set(self.records)
+
+    def load(self, name):
+        if self.records is None:
+            self.read_records()
+        record = self.records.get(name)
+        if record is None:
+            return None
+        try:
+            return json.loads(record)
+        except ValueError as e:
+            raise ValueError(f"{self.filename}: corrupted profile "
+                             f"{name}") from e
+
+    def save(self, name, record):
+        value = json.dumps(record, sort_keys=True, separators=(",", ":"))
+        if self.records is None:
+            self.read_records()
+        if self.records.get(name) != value:
+            self.append(name, value)
+            self.records[name] = value
+
+    def delete(self, name):
+        if self.load(name) is not None:
+            self.append(name, "")
+            del self.records[name]
+
+    def get_names(self):
+        if self.records is None:
+            self.read_records()
+        return sorted(self.records)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+#
+# proxy.py
+# Author: Alex Kozadaev (2014)
+#
+
+import asyncio
+import struct
+
+from . import balancer
+from . import client
+from . import decoder
+from . import dictionary
+from . import radius
+from . import replay
+
+ACCOUNTING_REQUEST = 4
+ACCT_SESSION_ID = 44
+USER_NAME = 1
+# the Message-Authenticator AVP header - a quick check before the lookup
+MESSAGE_AUTHENTICATOR_HDR = struct.pack("!BB", radius.MESSAGE_AUTHENTICATOR,
+                                        18)
+
+
+def attribute_key(name):
+    """return the AVP key (see decoder.avp_key) of the attribute - the key
+    of the enclosing attribute for the TLV members"""
+    header = radius.AttributeFormat(dictionary.get_attribute(name)).header
+    return decoder.avp_key(header, 0, len(header))
+
+
+def forward_packet(code, pid, avps, secret):
+    """return the request with the AVPs binary signed with the secret - the
+    Message-Authenticator (if any) is signed as well"""
+    packet = bytearray(decoder.RADIUS_HDR_LEN + len(avps))
+    decoder.RADIUS_HDR.pack_into(packet, 0, code, pid, len(packet))
+    packet[decoder.RADIUS_HDR_LEN:] = avps
+    if MESSAGE_AUTHENTICATOR_HDR in avps and \
+            radius.find_message_authenticator(packet) is not None:
+        radius.sign_message_authenticator(packet, secret)
+    packet[4:20] = radius.request_authenticator(packet, secret)
+    return bytes(packet)
+
+
+def relay_response(response, pid, request_auth, secret):
+    """return the upstream response re-signed for the original request
+    (pid, request_auth) - the AVPs are copied as they are"""
+    avps, signed = response[decoder.RADIUS_HDR_LEN:], False
+    if MESSAGE_AUTHENTICATOR_HDR in avps:
+        offset = radius.find_message_authenticator(response)
+        if offset is not None:  # moved to the end and re-signed
+            avps = response[decoder.RADIUS_HDR_LEN:offset - 2] + \
+                response[offset + 16:]
+            signed = True
+    return radius.create_response(response[0], pid, request_auth, secret,
+                                  avps, signed)
+
+
+class AvpRules:
+    """Rewrite rules of the proxied requests
+
+    avps - the RadiusAvp objects replacing the AVPs of the same type
+           (added if the request does not have them)
+    drop - the names of the attributes removed from the requests
+
+    Only the AVPs the rules apply to are changed - the rest are copied
+    without decoding."""
+
+    def __init__(self, avps=(), drop=()):
+        self.replacements = {}
+        for avp in avps:
+            binary = avp.dump()
+            key = decoder.avp_key(binary, 0, len(binary))
+            self.replacements.setdefault(key, []).append(binary)
+        for name in drop:
+            self.replacements[attribute_key(name)] = []
+
+    def is_active(self):
+        return len(self.replacements) > 0
+
+    def rewrite(self, packet, length):
+        """return the rewritten AVPs binary of the packet"""
+        return replay.replace_avps(packet, length, self.replacements)
+
+
+class ForwardedRequest:
+    """Request forwarded upstream - has the RadiusMessage interface used by
+    the clients: dump() signs the AVPs with the secret under the
+    identifier assigned by the client (pid)"""
+
+    def __init__(self, code, avps, secret=None):
+        self.code = code
+        self.avps = avps
+        self.secret = secret
+        self.pid = 0
+
+    def signed(self, secret):
+        """the request to be signed with the secret"""
+        return ForwardedRequest(self.code, self.avps, secret)
+
+    def dump(self):
+        return forward_packet(self.code, self.pid, self.avps, self.secret)
+
+    def session_key(self):
+        """the Acct-Session-Id (or the User-Name) - see balancer"""
+        avps, offset, values = self.avps, 0, {}
+        while offset + 2 <= len(avps):
+            code, length = avps[offset], avps[offset + 1]
+            if length < 2:
+                break
+            if code in (ACCT_SESSION_ID, USER_NAME) and code not in values:
+                values[code] = bytes(avps[offset + 2:offset + length])
+            offset += length
+        return values.get(ACCT_SESSION_ID, values.get(USER_NAME, b""))
+
+
+class Upstream:
+    """Client of an upstream server re-signing the forwarded requests with
+    its secret (see ForwardedRequest)"""
+
+    def __init__(self, client):
+        self.client = client
+        self.secret = client.secret
+        self.stats = client.stats
+
+    async def request(self, request):
+        return await self.client.request(request.signed(self.secret))
+
+    def close(self):
+        self.client.close()
+
+
+class ProxyServer(asyncio.DatagramProtocol):
+    """Accounting proxy (UDP)
+
+    The Accounting-Requests signed with the secret are forwarded to the
+    upstream (a ServerPool of the Upstream clients - see start_proxy) with
+    the AVPs rewritten by the rules, re-signed with the secret of the
+    upstream server and under the identifier of its client. The responses
+    are relayed back re-signed with the secret. Only the header and the
+    rewritten AVPs are touched - the packets are never fully decoded. The
+    other requests are dropped."""
+
+    def __init__(self, secret, upstream, rules=None):
+        self.secret = secret
+        self.upstream = upstream
+        self.rules = rules if rules and rules.is_active() else None
+        self.transport = None
+        self.tasks = set()
+        self.requests = 0
+        self.responses = 0
+        self.invalid = 0  # malformed, unsupported or badly signed requests
+        self.failed = 0  # not answered by the upstream
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.requests += 1
+        try:
+            code, pid, length, auth = decoder.unpack_header(data)
+            if code != ACCOUNTING_REQUEST or auth != \
+                    radius.request_authenticator(data[:length], self.secret):
+                self.invalid += 1
+                return
+            if self.rules:
+                avps = self.rules.rewrite(data, length)
+            else:
+                avps = data[decoder.RADIUS_HDR_LEN:length]
+        except ValueError:
+            self.invalid += 1
+            return
+        task = asyncio.ensure_future(self.forward(
+            ForwardedRequest(code, avps), pid, auth, addr))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def forward(self, request, pid, auth, addr):
+        response = await self.upstream.request(request)
+        if response is None:
+            self.failed += 1
+            return
+        try:
+            response = relay_response(response, pid, auth, self.secret)
+        except ValueError:
+            self.failed += 1
+            return
+        self.transport.sendto(response, addr)
+        self.responses += 1
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.transport:
+            self.transport.close()
+        self.upstream.close()
+
+
+async def start_proxy(local_tuple, secret, upstreams, rules=None,
+                      strategy="round-robin", open=None, **kwargs):
+    """start the proxy listening on local_tuple (ip, port)
+
+    upstreams - (dest_tuple, secret, weight) of the upstream servers
+    strategy - the balancing strategy of the upstream servers (see
+               balancer.ServerPool - the hash one by the Acct-Session-Id)
+    open - the coroutine function opening the upstream clients (see
+           balancer.open_pool) - the keyword arguments are passed to it
+
+    Returns the ProxyServer object"""
+    open = open or client.open_client
+    loop = asyncio.get_running_loop()
+    stats = client.ClientStats()
+    members = []
+    try:
+        for dest_tuple, upstream_secret, weight in upstreams:
+            member = balancer.Member(dest_tuple, None, weight)
+            member.client = Upstream(await open(dest_tuple, upstream_secret,
+                                                stats=stats, **kwargs))
+            members.append(member)
+        pool = balancer.ServerPool(members, secret, strategy,
+                                   key=ForwardedRequest.session_key,
+                                   stats=stats)
+        transport, proxy = await loop.create_datagram_endpoint(
+            lambda: ProxyServer(secret, pool, rules), local_addr=local_tuple)
+    except BaseException:
+        for member in members:
+            member.client.close()
+        raise
+    return proxy
@@ -5,10 +5,14 @@
 #
 
 import struct
+import collections
 import hashlib
+import hmac
+import os
 import socket
-import radtypes
-import dictionary
+from . import radtypes
+from . import decoder
+from .dictionary import get_dictionary
 
 # Radius-Request
 #    0                   1                   2                   3
@@ -40,28 +44,196 @@ import dictionary
 #   |     Type      |    Length     |  String ...
 #   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
 
+# Extended AVP (RFC 6929 - types 241-244)
+#    0                   1                   2                   3
+#    0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1
+#   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+#   |     Type      |    Length     | Extended-Type |  Value ...
+#   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+
+# Long Extended AVP (RFC 6929 - types 245-246). The values longer than
+# 251 octets are fragmented - M (more) is set in all but the last fragment
+#    0                   1                   2                   3
+#    0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1
+#   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+#   |     Type      |    Length     | Extended-Type |M|  Reserved   |
+#   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+#   |  Value ...
+#   +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+
+# The Extended-Vendor-Specific value (Extended-Type 26) starts with the
+# Vendor-Id (4 octets) and the EVS type (1 octet)
+
+MAX_AVP_LENGTH = 255
+MESSAGE_AUTHENTICATOR = 80
+# the requests with a random request authenticator (RFC 2865)
+RANDOM_AUTHENTICATOR_CODES = (1, 12)  # Access-Request, Status-Server
+AVP_CACHE_SIZE = 4096  # the interned AVPs kept (see AvpCache)
+VENDOR_SPECIFIC = 26
+EXTENDED_VENDOR_SPECIFIC = 26
+MORE_FLAG = 0x80  # long extended M flag and the VSA continuation flag
+# struct formats of the vendor type and length fields by their size
+FIELD_FORMATS = {1: "!B", 2: "!H", 4: "!L"}
+
+
+class AttributeFormat:
+    """Wire format of an attribute
+
+    The attribute value is written after a fixed header (the type,
+    length, vendor and extended type fields) and is fragmented across
+    several attributes if it does not fit into a single one: the long
+    extended attributes and the VSAs of the vendors with the continuation
+    flag set the more flag in all but the last fragment, the values of the
+    attributes with the concat flag (eg. EAP-Message) are split into
+    consecutive attributes of the same type. The other attributes never
+    span several attributes (RFC 2865 - a repeated User-Name is not a
+    longer one). The members of the TLVs are
+    wrapped into their parents.
+
+    bare - the vendor attribute only (without the Vendor-Specific header)
+    dictionary - the dictionary of attr_def (the default one if None)
+    """
+
+    def __init__(self, attr_def, bare=False, dictionary=None):
+        self.tlvs = []  # codes of the enclosing TLVs (innermost first)
+        while attr_def.attr_parent and \
+                attr_def.attr_parent.attr_type == "tlv":
+            self.tlvs.append(attr_def.attr_id)
+            attr_def = attr_def.attr_parent
+        self.lengths = []  # (offset, struct format, length of the header)
+        self.more = None  # offset of the more flag
+        self.split = bool(attr_def.attr_flags.get("concat"))
+        reserved = 0  # room for the Vendor-Specific header (bare VSAs)
+
+        vendor, parent = attr_def.attr_vendor, attr_def.attr_parent
+        if vendor and vendor.parent:  # Extended-Vendor-Specific
+            if dictionary is None:
+                dictionary = get_dictionary()
+            container = dictionary.get_attribute_by_id(vendor.parent)
+            header = self.extended(vendor.parent, EXTENDED_VENDOR_SPECIFIC,
+                                   container.attr_type)
+            header += struct.pack("!LB", vendor.vendor_id, attr_def.attr_id)
+        elif vendor:
+            header = b"" if bare else \
+                struct.pack("!BBL", VENDOR_SPECIFIC, 0, vendor.vendor_id)
+            if bare:
+                reserved = 6
+            else:
+                self.lengths.append((1, "!B", 0))
+            # the vendor attribute length excludes the Vendor-Specific header
+            vendor_header = len(header)
+            header += struct.pack(FIELD_FORMATS[vendor.type_size],
+                                  attr_def.attr_id)
+            if vendor.length_size:
+                self.lengths.append((len(header),
+                                     FIELD_FORMATS[vendor.length_size],
+                                     -vendor_header))
+                header += bytes(vendor.length_size)
+            if vendor.continuation:
+                self.more, self.split = len(header), True
+                header += bytes(1)
+        elif parent:
+            if parent.attr_type not in ("extended", "long-extended"):
+                raise ValueError(f"{attr_def.attr_name} - unsupported "
+                                 f"parent type {parent.attr_type}")
+            header = self.extended(parent.attr_id, attr_def.attr_id,
+                                   parent.attr_type)
+        else:
+            self.lengths.append((1, "!B", 0))
+            header = struct.pack("!BB", attr_def.attr_id, 0)
+        self.header = header
+        # the header length is added to every length field
+        self.lengths = [(offset, fmt, base + len(header))
+                        for offset, fmt, base in self.lengths]
+        self.code = attr_def.attr_id if reserved else header[0]
+        self.limit = MAX_AVP_LENGTH - len(header) - reserved
+
+    def extended(self, code, extended_type, attr_type):
+        """extended attribute header (the M flag for the long ones)"""
+        self.lengths.append((1, "!B", 0))
+        if attr_type == "long-extended":
+            self.more, self.split = 3, True
+            return struct.pack("!BBBB", code, 0, extended_type, 0)
+        return struct.pack("!BBB", code, 0, extended_type)
+
+    def length(self, value_length):
+        """the length of the encoded value of value_length octets"""
+        value_length += 2 * len(self.tlvs)
+        fragments = max(-(-value_length // self.limit), 1)
+        if fragments > 1 and not self.split:
+            raise ValueError(f"value too long ({value_length} octets)")
+        return fragments * len(self.header) + value_length
+
+    def encode(self, value):
+        """encode the binary value - the fragments are copied from a
+        memoryview of the value into the preallocated output"""
+        if not self.tlvs and len(value) <= self.limit:  # a single fragment
+            output = bytearray(self.header)
+            output += value
+            for field, fmt, base in self.lengths:
+                struct.pack_into(fmt, output, field, base + len(value))
+            return bytes(output)
+        for code in self.tlvs:
+            if len(value) > MAX_AVP_LENGTH - 2:
+                raise ValueError(f"TLV value too long ({len(value)} octets)")
+            value = b"".join((struct.pack("!BB", code, len(value) + 2),
+                              value))
+        view = memoryview(value)
+        header, limit = self.header, self.limit
+        output = bytearray(self.length(len(view) - 2 * len(self.tlvs)))
+        header_length, position = len(header), 0
+        for offset in range(0, max(len(view), 1), limit):
+            fragment = view[offset:offset + limit]
+            start = position + header_length
+            position = start + len(fragment)
+            output[start - header_length:start] = header
+            output[start:position] = fragment
+            for field, fmt, base in self.lengths:
+                struct.pack_into(fmt, output, start - header_length + field,
+                                 base + len(fragment))
+            if self.more is not None and offset + limit < len(view):
+                output[start - header_length + self.more] = MORE_FLAG
+        return bytes(output)
+
 
 class RadiusAvp:
-    """Radius avp implementations"""
+    """Radius avp implementations
+
+    The attribute is resolved via the dictionary (see dictionary.load) or
+    the default dictionary if None"""
 
-    def __init__(self, avp_name, avp_value, allow_child=True):
+    def __init__(self, avp_name, avp_value, allow_child=True,
+                 dictionary=None):
+        if dictionary is None:
+            dictionary = get_dictionary()
         self.avp_subavp = []
         self.avp_def = dictionary.get_attribute(avp_name.lower())
 
         vendor = self.avp_def.attr_vendor
-        if (allow_child and vendor):
+        if (allow_child and vendor and not vendor.parent):
+            self.avp_format = AttributeFormat(self.avp_def,
+                                              dictionary=dictionary)
             self.avp_def = dictionary.get_attribute("vendor-specific")
             self.avp_code = radtypes.get_type_instance("byte",
                                                        self.avp_def.attr_id)
             self.avp_value = radtypes.get_type_instance(
                 "integer", vendor.vendor_id)
-            self.avp_subavp.append(RadiusAvp(avp_name, avp_value, False))
+            self.avp_subavp.append(RadiusAvp(avp_name, avp_value, False,
+                                             dictionary))
         else:
+            self.avp_format = AttributeFormat(self.avp_def,
+                                              bare=not allow_child,
+                                              dictionary=dictionary)
             self.avp_code = radtypes.get_type_instance("byte",
-                                                       self.avp_def.attr_id)
+                                                       self.avp_format.code)
+            if self.avp_def.attr_type == "tlv" and \
+                    not isinstance(avp_value, str):
+                avp_value = tlv_members(self.avp_def, avp_value,
+                                        dictionary)
             self.avp_value = radtypes.get_type_instance(
                 self.avp_def.attr_type, avp_value)
         self.validate_values()
+        len(self)  # raises ValueError if the value cannot be encoded
 
     def validate_values(self):
         """check if the values are in the allowed range in case the AVP has
@@ -78,22 +250,20 @@ class RadiusAvp:
     def has_sub_avps(self):
         return len(self.avp_subavp) > 0
 
-    def dump(self):
-        """dump the binary representation of the AVP"""
-        value = [
-            self.avp_code.dump(),
-            radtypes.get_type_instance("byte", len(self)).dump(),
-            self.avp_value.dump()
-        ]
-
+    def encoded_value(self):
+        """the value written by avp_format (the vendor attribute value for
+        the Vendor-Specific AVPs)"""
         if self.has_sub_avps():
-            subavps = [subavp.dump() for subavp in self.avp_subavp]
-            return b"".join(value + subavps)
-        return b"".join(value)
+            return self.avp_subavp[0].avp_value
+        return self.avp_value
+
+    def dump(self):
+        """dump the binary representation of the AVP (several attributes
+        if the value has to be fragmented)"""
+        return self.avp_format.encode(self.encoded_value().dump())
 
     def __len__(self):
-        avp_subavp_len = sum(map(lambda child: len(child), self.avp_subavp))
-        return 2 + len(self.avp_value) + avp_subavp_len
+        return self.avp_format.length(len(self.encoded_value()))
 
     def __str__(self):
         contents = [
@@ -106,23 +276,98 @@ class RadiusAvp:
         return "\n".join(contents)
 
 
+class InternedAvp(RadiusAvp):
+    """RadiusAvp encoded once - shared by the messages, so it must not be
+    changed (see AvpCache)"""
+
+    def __init__(self, avp_name, avp_value, dictionary=None):
+        super().__init__(avp_name, avp_value, dictionary=dictionary)
+        self.binary = super().dump()
+
+    def dump(self):
+        return self.binary
+
+
+class AvpCache:
+    """Bounded LRU cache of the interned AVPs
+
+    The AVPs are keyed by the dictionary, the attribute name and the value
+    (as given - eg. the integer 1 and the string "1" are cached
+    separately) - the repeated ones (Acct-Status-Type, Framed-Protocol,
+    NAS-IP-Address,...) are validated and encoded only once. The least
+    recently used AVPs are evicted above max_size (including those of
+    the dictionaries no longer used). The values which are not hashable
+    (eg. the TLV member lists) are not cached."""
+
+    def __init__(self, max_size=AVP_CACHE_SIZE):
+        if max_size < 1:
+            raise ValueError(f"invalid cache size: {max_size}")
+        self.max_size = max_size
+        self.avps = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, avp_name, avp_value, dictionary=None):
+        """return the (shared) InternedAvp of the attribute value"""
+        if dictionary is None:
+            dictionary = get_dictionary()
+        key = (dictionary, avp_name.lower(), type(avp_value), avp_value)
+        try:
+            avp = self.avps.get(key)
+        except TypeError:  # not hashable
+            self.misses += 1
+            return InternedAvp(avp_name, avp_value, dictionary)
+        if avp is not None:
+            self.hits += 1
+            self.avps.move_to_end(key)
+            return avp
+        self.misses += 1
+        avp = self.avps[key] = InternedAvp(avp_name, avp_value, dictionary)
+        if len(self.avps) > self.max_size:
+            self.avps.popitem(last=False)
+        return avp
+
+    def clear(self):
+        self.avps.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self.avps), "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
 class RadiusMessage:
     # Radius header templates
     RADIUS_HDR_TMPL = "!BBH16s"
     """Radius Message object"""
 
-    def __init__(self, secret, code=4):
+    def __init__(self, secret, code=4, dictionary=None):
         self.code = code
+        self.dictionary = dictionary  # of the AVPs (see create_avp)
         self.pid = 0xf5
         self.length = 20  # length so far
         self.secret = secret
         self.avp_list = []
+        # the request authenticator of the Access-Request (random for every
+        # dump unless set)
+        self.authenticator = None
+        self.signed = False  # has the Message-Authenticator AVP
 
     def add_avp(self, avp):
         """add an AVP class to the list of the packets AVPs"""
         if avp and isinstance(avp, RadiusAvp):
             self.avp_list.append(avp)
             self.length += len(avp)
+            if avp.avp_format.code == MESSAGE_AUTHENTICATOR:
+                self.signed = True
+
+    def create_avp(self, avp_name, avp_value):
+        """add the AVP of the attribute value resolved via the dictionary
+        of the message returning it"""
+        avp = RadiusAvp(avp_name, avp_value, dictionary=self.dictionary)
+        self.add_avp(avp)
+        return avp
 
     def get_all_avps_contents(self):
         """return binary contents of all AVPs in the requests"""
@@ -141,22 +386,36 @@ class RadiusMessage:
 
     def dump(self):
         """dump binary version of the Radius Request packet payload
-        including AVPs"""
+        including AVPs. The Message-Authenticator (if added) is signed"""
         avps = self.get_all_avps_contents()
-        auth = self.compute_authenticator(avps)
+        if self.code in RANDOM_AUTHENTICATOR_CODES:
+            auth = self.authenticator or os.urandom(16)
+        elif self.signed:
+            auth = bytes(16)  # the authenticator covers the signed packet
+        else:
+            auth = self.compute_authenticator(avps)
         header = struct.pack(RadiusMessage.RADIUS_HDR_TMPL, self.code,
                              self.pid, len(self), auth)
-        return b"".join([header, avps])
+        if not self.signed:
+            return b"".join([header, avps])
+
+        packet = bytearray(header + avps)
+        sign_message_authenticator(packet, self.secret)
+        if self.code not in RANDOM_AUTHENTICATOR_CODES:
+            packet[4:20] = request_authenticator(packet, self.secret)
+        return bytes(packet)
 
-    def send(self, destTuple):
+    def send(self, destTuple, sock=None, pacer=None):
         """send the packet to the network
-        dest_tuple should be (dest_ip, dest_port)"""
-        if ":" in destTuple[0]:  # is IPv6
-            sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
-            sock.setsockopt(socket.IPPROTO_IPV6, socket.IP_MULTICAST_TTL, 20)
-        else:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 20)
+        dest_tuple should be (dest_ip, dest_port). The packet is sent
+        through a new socket unless an open socket (sock) is given.
+        The pacer (see libradi.pacing) delays the packet until it is due"""
+        if pacer:
+            pacer.wait()
+        if sock:
+            sock.sendto(self.dump(), destTuple)
+            return
+        sock = create_socket(destTuple[0])
         sock.sendto(self.dump(), destTuple)
         sock.close()
 
@@ -169,3 +428,122 @@ class RadiusMessage:
             self.code, self.pid, len(self), auth.hex())
         avps = "\n".join([f" {str(avp)}" for avp in self.avp_list])
         return "".join((header, avps))
+
+
+AVP_CACHE = AvpCache()
+
+
+def intern_avp(avp_name, avp_value, dictionary=None):
+    """return the shared AVP of the attribute value (see AvpCache)"""
+    return AVP_CACHE.get(avp_name, avp_value, dictionary)
+
+
+def tlv_members(attr_def, members, dictionary=None):
+    """convert the (member name, value) pairs (or a dict) of the TLV
+    attribute into the (code, radtypes value) members of TlvType. The
+    values of the nested TLVs are given the same way"""
+    if dictionary is None:
+        dictionary = get_dictionary()
+    if isinstance(members, dict):
+        members = members.items()
+    result = []
+    for name, value in members:
+        if not isinstance(name, str):
+            result.append((name, value))  # (code, value) member
+            continue
+        member = dictionary.get_attribute(name)
+        parent = member.attr_parent
+        if parent is None or parent.attr_name != attr_def.attr_name:
+            raise ValueError(f"{member.attr_name} is not a member of "
+                             f"{attr_def.attr_name}")
+        if member.attr_type == "tlv" and not isinstance(value, str):
+            value = tlv_members(member, value, dictionary)
+        result.append((member.attr_id, radtypes.get_type_instance(
+            member.attr_type, value)))
+    return result
+
+
+def create_socket(dest_ip):
+    """create a UDP socket suitable for sending packets to dest_ip"""
+    if ":" in dest_ip:  # is IPv6
+        sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IP_MULTICAST_TTL, 20)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 20)
+    return sock
+
+
+def request_authenticator(packet, secret):
+    """compute the authenticator of the accounting (or CoA/Disconnect)
+    request packet - the authenticator field itself is ignored"""
+    return hashlib.md5(b"".join((bytes(packet[:4]), bytes(16),
+                                 bytes(packet[20:]),
+                                 secret.encode("utf-8")))).digest()
+
+
+def response_authenticator(packet, request_auth, secret):
+    """compute the authenticator of the response packet to the request
+    with the request_auth authenticator"""
+    return hashlib.md5(b"".join((bytes(packet[:4]), bytes(request_auth),
+                                 bytes(packet[20:]),
+                                 secret.encode("utf-8")))).digest()
+
+
+def find_message_authenticator(packet):
+    """offset of the Message-Authenticator value in the packet or None"""
+    for code, start, end in decoder.iter_avps(packet):
+        if code == MESSAGE_AUTHENTICATOR:
+            if end - start != 18:
+                raise ValueError("invalid Message-Authenticator length")
+            return start + 2
+    return None
+
+
+def message_authenticator(packet, secret, offset, auth=None):
+    """compute the Message-Authenticator (RFC 3579) - HMAC-MD5 of the
+    packet with the Message-Authenticator value (at offset) zeroed. auth
+    replaces the authenticator field (the request authenticator for the
+    responses)"""
+    digest = hmac.new(secret.encode("utf-8"), digestmod=hashlib.md5)
+    digest.update(packet[:4])
+    digest.update(auth if auth is not None else packet[4:20])
+    digest.update(packet[20:offset])
+    digest.update(bytes(16))
+    digest.update(packet[offset + 16:])
+    return digest.digest()
+
+
+def sign_message_authenticator(packet, secret, auth=None):
+    """set the Message-Authenticator of the packet (bytearray) in place"""
+    offset = find_message_authenticator(packet)
+    if offset is None:
+        raise ValueError("no Message-Authenticator in the packet")
+    packet[offset:offset + 16] = message_authenticator(packet, secret,
+                                                       offset, auth)
+
+
+def check_message_authenticator(packet, secret, auth=None):
+    """verify the Message-Authenticator of the packet (auth - the request
+    authenticator for the responses) - None if there is none"""
+    offset = find_message_authenticator(packet)
+    if offset is None:
+        return None
+    return hmac.compare_digest(
+        bytes(packet[offset:offset + 16]),
+        message_authenticator(packet, secret, offset, auth))
+
+
+def create_response(code, pid, request_auth, secret, avps=b"",
+                    signed=False):
+    """create the response packet to the request (pid, request_auth) -
+    signed with the Message-Authenticator if signed is set"""
+    if signed:
+        avps = b"".join((avps, struct.pack("!BB", MESSAGE_AUTHENTICATOR, 18),
+                         bytes(16)))
+    header = struct.pack("!BBH", code, pid, 20 + len(avps))
+    packet = bytearray(b"".join((header, bytes(16), avps)))
+    if signed:
+        sign_message_authenticator(packet, secret, request_auth)
+    packet[4:20] = response_authenticator(packet, request_auth, secret)
+    return bytes(packet)
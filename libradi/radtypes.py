@@ -4,8 +4,9 @@
 # Author: Alex Kozadaev (2014)
 #
 
-import struct
+import binascii
 import socket
+import struct
 
 
 class AbstractType:
@@ -52,6 +53,11 @@ class AbstractType:
     def dump(self):
         raise NotImplementedError("dump is not implemented")
 
+    @classmethod
+    def load(cls, data):
+        """create the type instance from its binary representation"""
+        raise NotImplementedError("load is not implemented")
+
 
 class AddressType(AbstractType):
     """IP ip_string data type"""
@@ -78,6 +84,14 @@ class AddressType(AbstractType):
     def dump(self):
         return bytes(self.bin_ip_string)
 
+    @classmethod
+    def load(cls, data):
+        family = socket.AF_INET6 if len(data) == 16 else socket.AF_INET
+        try:
+            return cls(socket.inet_ntop(family, bytes(data)))
+        except (socket.error, ValueError) as e:
+            raise ValueError("Invalid IP address length") from e
+
 
 class AddressIPv6PrefixType(AbstractType):
     """IP ip_string data type"""
@@ -116,6 +130,13 @@ class AddressIPv6PrefixType(AbstractType):
     def dump(self):
         return b"".join((ShortType(self.mask).dump(), self.bin_ip_string))
 
+    @classmethod
+    def load(cls, data):
+        if not 2 <= len(data) <= 18:
+            raise ValueError("Invalid IPv6 prefix length")
+        address = bytes(data[2:]).ljust(16, b"\x00")
+        return cls(f"{socket.inet_ntop(socket.AF_INET6, address)}/{data[1]}")
+
 
 class TextType(AbstractType):
     """Text data type"""
@@ -128,6 +149,10 @@ class TextType(AbstractType):
     def dump(self):
         return bytes(self.value, "utf-8")
 
+    @classmethod
+    def load(cls, data):
+        return cls(bytes(data).decode("utf-8", "replace"))
+
 
 class NumericBaseType(AbstractType):
     """Integer data type"""
@@ -176,6 +201,12 @@ class NumericBaseType(AbstractType):
         ]
         return struct.pack(f"!{len(values)}{self.pattern}", *values)
 
+    @classmethod
+    def load(cls, data):
+        value = cls(int.from_bytes(data, "big"))
+        value.length = max(value.length, len(data) // value.byte_length)
+        return value
+
 
 class IntegerType(NumericBaseType):
     """Integer data type (4bytes numeric)"""
@@ -222,6 +253,10 @@ class DateType(NumericBaseType):
         self.byte_length = 4
         self.pattern = "L"
 
+    @classmethod
+    def load(cls, data):
+        return cls(int.from_bytes(data, "big"))
+
 
 class EtherType(AbstractType):
     """Ethernet address data type"""
@@ -241,6 +276,10 @@ class EtherType(AbstractType):
     def dump(self):
         return struct.pack("!6B", *self.ether_bytes)
 
+    @classmethod
+    def load(cls, data):
+        return cls(":".join(f"{byte:02x}" for byte in data))
+
 
 class ContainerType:
     """Container type allowing to join several values together"""
@@ -260,40 +299,135 @@ class ContainerType:
         return bytes(values_binary)
 
 
+class OctetsType(AbstractType):
+    """Octets data type - the value is kept as bytes. It is given as a
+    bytes-like object, an integer or a string: hex (0x...), base64
+    (base64:...), decimal digits (an integer) or text (utf-8)"""
+
+    def __init__(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            data = bytes(value)
+        elif isinstance(value, int) or value.isdigit():
+            value = int(value)
+            data = value.to_bytes(max((value.bit_length() + 7) // 8, 1),
+                                  "big")
+        elif value[:2].lower() == "0x":
+            digits = value[2:]
+            if len(digits) % 2:
+                digits = "0" + digits
+            data = bytes.fromhex(digits)
+        elif value.startswith("base64:"):
+            try:
+                data = binascii.a2b_base64(value[7:], strict_mode=True)
+            except binascii.Error as e:
+                raise ValueError(f"invalid base64 value: {e}") from e
+        else:
+            data = value.encode("utf-8")
+        super().__init__(data, len(data))
+
+    def __len__(self):
+        return len(self.value)
+
+    def __str__(self):
+        return "0x" + self.value.hex()
+
+    def dump(self):
+        return self.value
+
+    @classmethod
+    def load(cls, data):
+        return cls(bytes(data))
+
+
 class TlvType(AbstractType):
+    """TLV data type (RFC 6929) - a list of (type, value) members
+
+    The member values are radtypes values (eg. a nested TlvType) or
+    octets. The string form is type/value[,type/value...] with the values
+    in the octets format and the nested TLVs in braces - eg.
+    1/0x0102,2/{1/0x03,2/base64:BA==}"""
 
     def __init__(self, value):
-        try:
-            tlv_type, tlv_value = value.split("/")
-        except ValueError:
-            raise ValueError("invalid TLV value - "
-                             "must be in type/value format")
-
-        tlv_type_bin = get_type_instance("byte", tlv_type)
-        if (len(tlv_type_bin) != 1):
-            raise ValueError("invalid TLV value - lenght of type != 1")
-
-        tlv_value_bin = get_type_instance("byte", tlv_value)
-        self.values = [
-            tlv_type_bin,
-            get_type_instance("byte", len(tlv_value_bin)), tlv_value_bin
-        ]
+        if isinstance(value, str):
+            value = parse_tlv(value)
+        members = []
+        for tlv_type, tlv_value in value:
+            tlv_type = int(tlv_type, 0) if isinstance(tlv_type, str) \
+                else tlv_type
+            if not 0 <= tlv_type <= 0xff:
+                raise ValueError(f"invalid TLV type {tlv_type}")
+            if not isinstance(tlv_value, (AbstractType, ContainerType)):
+                tlv_value = OctetsType(tlv_value)
+            if len(tlv_value) > 253:
+                raise ValueError(f"TLV {tlv_type} value too long "
+                                 f"({len(tlv_value)} octets)")
+            members.append((tlv_type, tlv_value))
+        super().__init__(members, sum(2 + len(tlv_value)
+                                      for tlv_type, tlv_value in members))
 
     def __len__(self):
-        return sum([len(value) for value in self.values])
+        return self.length
 
     def __str__(self):
-        return b"".join([str(value) for value in self.values])
+        return ",".join(
+            f"{tlv_type}/{{{tlv_value}}}" if isinstance(tlv_value, TlvType)
+            else f"{tlv_type}/{tlv_value}"
+            for tlv_type, tlv_value in self.value)
 
     def dump(self):
-        """dump binary representation of the contained values"""
-        values_binary = b"".join([value.dump() for value in self.values])
-        return bytes(values_binary)
+        """dump binary representation of the members"""
+        parts = []
+        for tlv_type, tlv_value in self.value:
+            parts.append(struct.pack("!BB", tlv_type, len(tlv_value) + 2))
+            parts.append(tlv_value.dump())
+        return b"".join(parts)
+
+    @classmethod
+    def load(cls, data):
+        """load the members as octets (the nested TLVs are not known
+        without the dictionary)"""
+        view, members, offset = memoryview(data), [], 0
+        while offset < len(view):
+            if offset + 2 > len(view) or view[offset + 1] < 2 or \
+                    offset + view[offset + 1] > len(view):
+                raise ValueError(f"invalid TLV length at offset {offset}")
+            end = offset + view[offset + 1]
+            members.append((view[offset], view[offset + 2:end]))
+            offset = end
+        return cls(members)
+
+
+def parse_tlv(value):
+    """parse the TLV string (see TlvType) into (type, value) members"""
+    members, depth, start = [], 0, 0
+    separators = [pos for pos, char in enumerate(value) if char in "{},"]
+    for pos in separators + [len(value)]:
+        char = value[pos:pos + 1]
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth < 0:
+                raise ValueError(f"unbalanced braces in TLV value: {value}")
+        elif depth == 0:
+            tlv_type, sep, tlv_value = value[start:pos].partition("/")
+            if not sep or not tlv_type:
+                raise ValueError("invalid TLV value - "
+                                 "must be in type/value format")
+            tlv_type = tlv_type.strip()
+            tlv_value = tlv_value.strip()
+            if tlv_value.startswith("{") and tlv_value.endswith("}"):
+                tlv_value = TlvType(tlv_value[1:-1])
+            members.append((tlv_type, tlv_value))
+            start = pos + 1
+    if depth:
+        raise ValueError(f"unbalanced braces in TLV value: {value}")
+    return members
 
 
 _types = {
     "string": TextType,
-    "octets": ByteType,
+    "octets": OctetsType,
     "ipaddr": AddressType,
     "ipv6addr": AddressType,
     "ipv6prefix": AddressIPv6PrefixType,
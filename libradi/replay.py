@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# replay.py
+# Author: Alex Kozadaev (2014)
+#
+
+import time
+
+from . import decoder
+from . import radius
+
+# requests which are replayed (responses in the capture are skipped)
+REQUEST_CODES = frozenset((1, 4, 12, 40, 43))
+
+# requests with the authenticator computed over the packet contents
+# (Accounting-Request, Disconnect-Request, CoA-Request)
+SIGNED_CODES = frozenset((4, 40, 43))
+
+
+class PacketRewriter:
+    """Rewrite captured radius requests
+
+    secret - re-sign the requests with the given secret
+    pid - renumber the requests starting with the given identifier
+    avps - a list of RadiusAvp objects replacing the AVPs of the same
+           type in the packet (added if the packet does not have them)
+
+    The Message-Authenticator (if any) of the rewritten requests is signed
+    again and the Accounting (CoA, Disconnect) requests get a new
+    authenticator. The Access-Requests (Status-Server) keep the original
+    one - the User-Password and CHAP-Password are computed from it. The
+    packets are returned untouched (no copy) if there is nothing to
+    rewrite."""
+
+    def __init__(self, secret=None, pid=None, avps=()):
+        self.secret = secret
+        self.pid = pid
+        self.avps = {}
+        for avp in avps:
+            binary = avp.dump()
+            key = decoder.avp_key(binary, 0, len(binary))
+            self.avps.setdefault(key, []).append(binary)
+        if secret is None and (pid is not None or self.avps):
+            raise ValueError("the secret is required to re-sign "
+                             "the rewritten requests")
+
+    def is_active(self):
+        return (self.secret is not None or self.pid is not None
+                or len(self.avps) > 0)
+
+    def rewrite_avps(self, packet, length):
+        """replace the AVPs in the packet returning the AVPs binary"""
+        return replace_avps(packet, length, self.avps)
+
+    def rewrite(self, packet):
+        """return the rewritten packet"""
+        code, pid, length, auth = decoder.unpack_header(packet)
+        if not self.is_active():
+            return packet[:length]
+
+        if self.avps:
+            avps = self.rewrite_avps(packet, length)
+        else:
+            avps = packet[decoder.RADIUS_HDR_LEN:length]
+
+        if self.pid is not None:
+            pid, self.pid = self.pid, (self.pid + 1) & 0xff
+
+        packet = bytearray(decoder.RADIUS_HDR_LEN + len(avps))
+        decoder.RADIUS_HDR.pack_into(packet, 0, code, pid, len(packet))
+        packet[decoder.RADIUS_HDR_LEN:] = avps
+        if code not in SIGNED_CODES:  # the original authenticator
+            packet[4:20] = auth
+        # the Message-Authenticator covers the new header and AVPs
+        if radius.find_message_authenticator(packet) is not None:
+            radius.sign_message_authenticator(packet, self.secret)
+        if code in SIGNED_CODES:
+            packet[4:20] = radius.request_authenticator(packet, self.secret)
+        return bytes(packet)
+
+
+def replace_avps(packet, length, replacements):
+    """return the AVPs binary of the packet with the AVPs replaced -
+    replacements maps the AVP keys (see decoder.avp_key) to the lists of
+    the binary AVPs replacing them (added if the packet does not have
+    them, an empty list removes them). The other AVPs are copied as they
+    are (not decoded)"""
+    result, replaced = [], set()
+    for code, start, end in decoder.iter_avps(packet, length):
+        key = decoder.avp_key(packet, start, end)
+        if key not in replacements:
+            result.append(packet[start:end])
+        elif key not in replaced:
+            result.extend(replacements[key])
+            replaced.add(key)
+    for key, binaries in replacements.items():
+        if key not in replaced:
+            result.extend(binaries)
+    return b"".join(result)
+
+
+def replay(packets, dest_tuple, rewriter=None, speed=1.0, pacer=None):
+    """send the captured requests to dest_tuple (dest_ip, dest_port)
+
+    packets - iterable of (timestamp, payload) tuples (eg. PcapReader)
+    speed - multiplier of the original inter-packet timing
+            (0 - send as fast as possible)
+    pacer - send at the rate of the pacer (see libradi.pacing) instead of
+            the original timing
+
+    Returns a tuple with the number of sent and skipped packets"""
+    sock = radius.create_socket(dest_tuple[0])
+    sent = skipped = 0
+    origin = None
+    try:
+        for timestamp, payload in packets:
+            if len(payload) < decoder.RADIUS_HDR_LEN or \
+                    payload[0] not in REQUEST_CODES:
+                skipped += 1
+                continue
+            try:
+                if rewriter:
+                    payload = rewriter.rewrite(payload)
+            except ValueError:
+                skipped += 1  # malformed packet
+                continue
+
+            if pacer:
+                pacer.wait()
+            elif speed:
+                if origin is None:
+                    origin = (time.perf_counter(), timestamp)
+                delay = (origin[0] + (timestamp - origin[1]) / speed -
+                         time.perf_counter())
+                if delay > 0:
+                    time.sleep(delay)
+
+            sock.sendto(payload, dest_tuple)
+            sent += 1
+    finally:
+        sock.close()
+    return sent, skipped
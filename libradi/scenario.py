@@ -0,0 +1,437 @@
+#!/usr/bin/env python
+#
+# scenario.py
+# Author: Alex Kozadaev (2014)
+#
+# Traffic scenario - the accounting requests described by a json file:
+#
+# {
+#     "seed": 1,
+#     "sessions": {
+#         "count": 10000,
+#         "avps": {
+#             "Acct-Session-Id": {"session-id": "radi-"},
+#             "3GPP-IMSI": {"type": "imsi", "mcc": "262", "mnc": "01"},
+#             "Framed-IP-Address": {"type": "address",
+#                                   "network": "10.0.0.0/16"},
+#             "Called-Station-Id": {"choice": ["web.apn", "ims"],
+#                                   "weights": [9, 1]},
+#             "NAS-IP-Address": "192.168.0.1"
+#         }
+#     },
+#     "messages": {
+#         "start": {"avps": {"Acct-Status-Type": "Start"}},
+#         "interim": {"avps": {"Acct-Status-Type": "Interim-Update",
+#                              "Acct-Input-Octets": {"uniform": [0, 1e6]}}},
+#         "stop": {"avps": {"Acct-Status-Type": "Stop"}}
+#     },
+#     "mix": {"start": 30, "interim": 60, "stop": 10}
+# }
+#
+# The session AVPs are sent in every message of the session (a message AVP
+# of the same attribute replaces the session one). The values are given as:
+#     VALUE                         - a constant (the names of the defined
+#                                     values are accepted, eg. "Start")
+#     {"choice": [VALUE, ...],      - one of the values (weighted)
+#      "weights": [WEIGHT, ...]}
+#     {"uniform": [LOW, HIGH]}      - an integer of LOW..HIGH
+#     {"type": "imsi", ...}         - the identity of the session (see
+#                                     identities.create_range)
+#     {"session-id": PREFIX}        - unique in every session lifecycle
+#
+# The random session values are derived from the seed and the session, so
+# they do not change during the session lifecycle. The messages are either
+# drawn by the weights of "mix" (for random sessions) or the sessions go
+# through the "lifecycle" steps in turn, eg.
+#     "lifecycle": ["start", {"message": "interim", "repeat": [1, 5]}, "stop"]
+#
+# The accounting counters of the sessions (Acct-Input/Output-Octets,
+# -Gigawords, -Packets and Acct-Session-Time - see usage.UsageModel) are
+# added to the messages with "usage": true, eg.
+#     "interim": {"avps": {...}, "usage": true}
+# The traffic model is given by the scenario "usage" (lifecycle only - the
+# lifecycle messages are "interval" seconds apart):
+#     "usage": {"input-rate": "exponential:2000",
+#               "output-rate": "exponential:20000", "input-packet": 200,
+#               "output-packet": 1200, "burstiness": 0.5, "period": 300,
+#               "interval": 300}
+#
+
+import bisect
+import json
+import random
+
+from . import dictionary
+from . import identities
+from . import proxy
+from . import radius
+from . import replay
+from . import usage
+
+ACCOUNTING_REQUEST = 4
+NUMERIC_TYPES = ("integer", "signed", "short", "byte", "date")
+SCALAR_TYPES = (str, int, float)
+
+
+def resolve_value(attr_def, value):
+    """the value of the defined value name (eg. Start) or the value"""
+    if isinstance(value, str):
+        for name, defined_value in attr_def.attr_values:
+            if name.lower() == value.lower():
+                return defined_value
+    return value
+
+
+def create_avp(name, value):
+    """return the interned AVP raising ValueError with the attribute name
+    if the value is invalid"""
+    try:
+        return radius.intern_avp(name, value)
+    except (AssertionError, TypeError, ValueError) as err:
+        raise ValueError(f"{name} - invalid value {value!r}: {err}")
+
+
+class Constant:
+    """the value encoded once"""
+
+    random = False
+
+    def __init__(self, name, value):
+        self.binary = create_avp(name, value).dump()
+
+    def encode(self, session, cycle, rand):
+        return self.binary
+
+
+class Choice:
+    """one of the (pre-encoded) values picked by the weights"""
+
+    random = True
+
+    def __init__(self, name, values, weights=None):
+        if not values:
+            raise ValueError(f"{name} - empty choice")
+        weights = weights or [1] * len(values)
+        if len(weights) != len(values) or min(weights) < 0 or \
+                sum(weights) <= 0:
+            raise ValueError(f"{name} - invalid choice weights")
+        self.binaries = [create_avp(name, value).dump() for value in values]
+        self.cumulative, total = [], 0
+        for weight in weights:
+            total += weight
+            self.cumulative.append(total)
+        self.total = total
+
+    def encode(self, session, cycle, rand):
+        return self.binaries[bisect.bisect(self.cumulative,
+                                           rand * self.total)]
+
+
+class Generated:
+    """value computed for every message - encoded by the attribute format
+    and the value type resolved when the scenario is compiled"""
+
+    random = False
+
+    def __init__(self, name, sample):
+        avp = create_avp(name, sample)
+        if avp.avp_def.has_defined_values() or \
+                (avp.has_sub_avps() and
+                 avp.avp_subavp[0].avp_def.has_defined_values()):
+            raise ValueError(f"{name} - use choice for the defined values")
+        self.format = avp.avp_format
+        self.value_type = type(avp.encoded_value())
+
+    def dump(self, value):
+        return self.format.encode(self.value_type(value).dump())
+
+
+class Uniform(Generated):
+    """an integer of low..high"""
+
+    random = True
+
+    def __init__(self, name, attr_def, low, high):
+        low, high = int(low), int(high)
+        if attr_def.attr_type not in NUMERIC_TYPES or not 0 <= low <= high:
+            raise ValueError(f"{name} - invalid uniform range")
+        create_avp(name, high)
+        super().__init__(name, low)
+        self.low = low
+        self.size = high - low + 1
+
+    def encode(self, session, cycle, rand):
+        return self.dump(self.low + int(rand * self.size))
+
+
+class Identity(Generated):
+    """the identity of the session (see identities.IdentityRange)"""
+
+    def __init__(self, name, spec):
+        self.range = identities.create_range(spec)
+        super().__init__(name, self.range[0])
+
+    def encode(self, session, cycle, rand):
+        return self.dump(self.range[session % len(self.range)])
+
+
+class SessionId(Generated):
+    """the prefix, the session and the lifecycle (unique per lifecycle)"""
+
+    def __init__(self, name, prefix):
+        self.prefix = str(prefix)
+        super().__init__(name, f"{self.prefix}{0:08x}-0")
+
+    def encode(self, session, cycle, rand):
+        return self.dump(f"{self.prefix}{session:08x}-{cycle}")
+
+
+def compile_value(name, spec):
+    """return the encoder of the AVP value spec (see the header)"""
+    attr_def = dictionary.get_attribute(name)
+    if isinstance(spec, SCALAR_TYPES) and not isinstance(spec, bool):
+        return Constant(name, resolve_value(attr_def, spec))
+    if not isinstance(spec, dict):
+        raise ValueError(f"{name} - invalid value {spec!r}")
+    if "choice" in spec:
+        return Choice(name, [resolve_value(attr_def, value)
+                             for value in spec["choice"]],
+                      spec.get("weights"))
+    if "uniform" in spec:
+        try:
+            low, high = spec["uniform"]
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} - uniform requires [LOW, HIGH]")
+        return Uniform(name, attr_def, low, high)
+    if "session-id" in spec:
+        return SessionId(name, spec["session-id"])
+    if "type" in spec:
+        return Identity(name, spec)
+    raise ValueError(f"{name} - unknown value {spec!r}")
+
+
+def compile_avps(avps, where):
+    """return {attribute definition: (attribute name, encoder)}"""
+    if not isinstance(avps, dict):
+        raise ValueError(f"{where}: the avps must be an object")
+    result = {}
+    for name, spec in avps.items():
+        try:
+            encoder = compile_value(name, spec)
+            result[dictionary.get_attribute(name)] = (name, encoder)
+        except ValueError as err:
+            raise ValueError(f"{where}: {err}")
+    return result
+
+
+class Usage:
+    """the accounting counters of the sessions (see usage.UsageModel) -
+    the lifecycle messages are interval seconds apart"""
+
+    def __init__(self, spec, seed):
+        if not isinstance(spec, dict):
+            raise ValueError("scenario: invalid usage")
+        options = {name.replace("-", "_"): value
+                   for name, value in spec.items()}
+        try:
+            self.interval = float(options.pop("interval", 300))
+            self.model = usage.UsageModel(seed=seed, **options)
+        except (TypeError, ValueError) as err:
+            raise ValueError(f"scenario: invalid usage: {err}")
+        if self.interval <= 0:
+            raise ValueError(f"scenario: invalid usage interval "
+                             f"{self.interval}")
+
+    def dump(self, session, cycle, position):
+        """the counters AVPs binary at the lifecycle position"""
+        return self.model.dump(self.model.session(session ^ (cycle << 32)),
+                               position * self.interval)
+
+
+class Template:
+    """Compiled message - the runs of the constant AVPs are joined into
+    single binaries, the others are encoded for every message (and the
+    usage counters added - see Usage)"""
+
+    def __init__(self, name, code, encoders, usage=None):
+        self.name = name
+        self.code = code
+        self.usage = usage
+        self.parts = []  # bytes or (encoder, session AVP index or None)
+        for encoder, key in encoders:
+            if isinstance(encoder, Constant):
+                if self.parts and isinstance(self.parts[-1], bytes):
+                    self.parts[-1] += encoder.binary
+                else:
+                    self.parts.append(encoder.binary)
+            else:
+                self.parts.append((encoder, key))
+
+    def build(self, session, cycle, session_rand, rand, position=0):
+        """return the AVPs binary of the message of the session at the
+        lifecycle position. session_rand(n) is the random value of the nth
+        session AVP and rand() the random value of the message AVPs"""
+        result = []
+        for part in self.parts:
+            if part.__class__ is bytes:
+                result.append(part)
+                continue
+            encoder, key = part
+            value = 0.0
+            if encoder.random:
+                value = rand() if key is None else session_rand(key)
+            result.append(encoder.encode(session, cycle, value))
+        if self.usage:
+            result.append(self.usage.dump(session, cycle, position))
+        return b"".join(result)
+
+
+class Scenario:
+    """Traffic scenario compiled from the spec (see the header)
+
+    All the attribute names and values are validated against the
+    dictionary and encoded (or their encoders resolved) when the scenario
+    is created - generating the messages takes no lookups or parsing."""
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("the scenario must be an object")
+        self.seed = int(spec.get("seed", 0))
+        self.random = random.Random(self.seed)
+        sessions = spec.get("sessions", {})
+        self.count = int(sessions.get("count", 1))
+        if self.count < 1:
+            raise ValueError("scenario: invalid session count")
+        session_avps = compile_avps(sessions.get("avps", {}),
+                                    "scenario sessions")
+        self.usage = None
+        if "usage" in spec:
+            if "lifecycle" not in spec:
+                raise ValueError("scenario: usage requires a lifecycle")
+            self.usage = Usage(spec["usage"], self.seed)
+        counters = {dictionary.get_attribute(name)
+                    for name in usage.COUNTERS}
+
+        self.templates = {}
+        messages = spec.get("messages")
+        if not isinstance(messages, dict) or not messages:
+            raise ValueError("scenario: no messages")
+        for name, message in messages.items():
+            where = f"scenario message {name}"
+            code = int(message.get("code", ACCOUNTING_REQUEST))
+            if code not in replay.SIGNED_CODES:
+                raise ValueError(f"{where}: unsupported code {code}")
+            avps = compile_avps(message.get("avps", {}), where)
+            with_usage = bool(message.get("usage"))
+            if with_usage and self.usage is None:
+                raise ValueError(f"{where}: no usage model")
+            # the usage counters replace the AVPs of the same attributes
+            excluded = set(avps) | (counters if with_usage else set())
+            encoders = [(encoder, n) for n, (attr_def, (avp_name, encoder))
+                        in enumerate(session_avps.items())
+                        if attr_def not in excluded]
+            encoders.extend((encoder, None)
+                            for attr_def, (avp_name, encoder) in avps.items()
+                            if not with_usage or attr_def not in counters)
+            if not encoders and not with_usage:
+                raise ValueError(f"{where}: no avps")
+            self.templates[name] = Template(
+                name, code, encoders, self.usage if with_usage else None)
+
+        if ("mix" in spec) == ("lifecycle" in spec):
+            raise ValueError("scenario: either mix or lifecycle is required")
+        self.mix = self.lifecycle = None
+        if "mix" in spec:
+            self.compile_mix(spec["mix"])
+        else:
+            self.compile_lifecycle(spec["lifecycle"])
+
+    def template(self, name):
+        if name not in self.templates:
+            raise ValueError(f"scenario: unknown message {name}")
+        return self.templates[name]
+
+    def compile_mix(self, mix):
+        if not isinstance(mix, dict) or not mix:
+            raise ValueError("scenario: invalid mix")
+        self.mix = [self.template(name) for name in mix]
+        self.weights = list(mix.values())
+        if min(self.weights) < 0 or sum(self.weights) <= 0:
+            raise ValueError("scenario: invalid mix weights")
+
+    def compile_lifecycle(self, lifecycle):
+        if not isinstance(lifecycle, list):
+            raise ValueError("scenario: invalid lifecycle")
+        self.lifecycle = []  # (template, min repeats, max repeats)
+        for step in lifecycle:
+            if isinstance(step, str):
+                step = {"message": step}
+            low, high = step.get("repeat", (1, 1))
+            if not 0 <= low <= high:
+                raise ValueError(f"scenario: invalid repeat {low}-{high}")
+            self.lifecycle.append((self.template(step.get("message")),
+                                   low, high))
+        if sum(low for template, low, high in self.lifecycle) < 1:
+            raise ValueError("scenario: the lifecycle sends no messages")
+
+    def session_hash(self, session, cycle, n):
+        return identities.mix(identities.mix(
+            identities.mix(self.seed ^ session) ^ cycle) ^ n)
+
+    def step(self, session, cycle, position):
+        """the template of the lifecycle position of the session (None at
+        the end of the lifecycle)"""
+        for n, (template, low, high) in enumerate(self.lifecycle):
+            repeats = low
+            if high > low:
+                repeats += self.session_hash(session, cycle, ~n) % \
+                    (high - low + 1)
+            if position < repeats:
+                return template
+            position -= repeats
+        return None
+
+    def messages(self):
+        """generate the (template, session, cycle, lifecycle position) of
+        the messages"""
+        if self.mix:
+            sessions = range(self.count)
+            while True:
+                for template in self.random.choices(self.mix, self.weights,
+                                                    k=256):
+                    yield template, self.random.choice(sessions), 0, 0
+        cycles = [0] * self.count
+        positions = [0] * self.count
+        while True:
+            for session in range(self.count):
+                template = self.step(session, cycles[session],
+                                     positions[session])
+                if template is None:  # a new lifecycle of the session
+                    cycles[session] += 1
+                    positions[session] = 0
+                    template = self.step(session, cycles[session], 0)
+                positions[session] += 1
+                yield (template, session, cycles[session],
+                       positions[session] - 1)
+
+    def requests(self, secret):
+        """generate the requests (see proxy.ForwardedRequest) signed with
+        the secret"""
+        rand = self.random.random
+        for template, session, cycle, position in self.messages():
+            def session_rand(n):
+                return self.session_hash(session, cycle, n) / 2.0 ** 64
+            yield proxy.ForwardedRequest(
+                template.code,
+                template.build(session, cycle, session_rand, rand, position),
+                secret)
+
+
+def load(path):
+    """load the scenario json file"""
+    with open(path) as f:
+        try:
+            spec = json.load(f)
+        except ValueError as err:
+            raise ValueError(f"{path}: invalid scenario: {err}")
+    return Scenario(spec)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+#
+# server.py
+# Author: Alex Kozadaev (2014)
+#
+
+import asyncio
+import collections
+import os
+import time
+
+from . import decoder
+from . import eap
+from . import radius
+
+ACCOUNTING_REQUEST = 4
+ACCOUNTING_RESPONSE = 5
+STATUS_SERVER = 12
+MAX_CONVERSATIONS = 65536  # the pending EAP conversations kept
+DUPLICATE_CACHE_SIZE = 65536  # the responses kept for the retransmissions
+DUPLICATE_CACHE_LIFETIME = 30.0  # seconds
+
+
+class DuplicateCache:
+    """Responses to the recent requests keyed by (source address,
+    identifier, request authenticator) - the retransmissions are answered
+    with the cached response rather than processed again (RFC 5080)
+
+    The entries expire lifetime seconds after they are added and the
+    oldest ones are evicted above max_size entries. The entries are kept
+    in the insertion order - the oldest ones (the first to expire) are at
+    the front, so every operation is O(1) (amortized)."""
+
+    def __init__(self, max_size=DUPLICATE_CACHE_SIZE,
+                 lifetime=DUPLICATE_CACHE_LIFETIME):
+        if max_size < 1:
+            raise ValueError(f"invalid cache size: {max_size}")
+        self.max_size = max_size
+        self.lifetime = lifetime
+        self.entries = collections.OrderedDict()  # key -> (expiry, response)
+
+    def get(self, key, now=None):
+        """return the cached response to the request or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= (time.monotonic() if now is None else now):
+            del self.entries[key]
+            return None
+        return entry[1]
+
+    def put(self, key, response, now=None):
+        now = time.monotonic() if now is None else now
+        entries = self.entries
+        entries[key] = (now + self.lifetime, response)
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+        while entries:  # expire the oldest entries
+            if next(iter(entries.values()))[0] > now:
+                break
+            entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class AccountingServer(asyncio.DatagramProtocol):
+    """Asynchronous radius accounting server (UDP)
+
+    Answers every Accounting-Request signed with the secret (and every
+    Status-Server) with an empty Accounting-Response - a local collector
+    stand-in for the load tests. The other requests are dropped."""
+
+    def __init__(self, secret, cache_size=DUPLICATE_CACHE_SIZE,
+                 cache_lifetime=DUPLICATE_CACHE_LIFETIME):
+        self.secret = secret
+        self.transport = None
+        self.cache = None  # no duplicate detection if cache_size is 0
+        if cache_size:
+            self.cache = DuplicateCache(cache_size, cache_lifetime)
+        self.requests = 0
+        self.responses = 0
+        self.invalid = 0  # malformed, unsupported or badly signed requests
+        self.duplicates = 0  # retransmissions answered from the cache
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        response = self.process(data, addr)
+        if response is not None:
+            self.transport.sendto(response, addr)
+
+    def process(self, data, addr):
+        """count the request returning the response packet or None - the
+        retransmissions are answered from the duplicate cache"""
+        self.requests += 1
+        cache = self.cache
+        if cache is not None and len(data) >= decoder.RADIUS_HDR_LEN:
+            key = (addr, data[1], bytes(data[4:20]))
+            response = cache.get(key)
+            if response is not None:
+                self.duplicates += 1
+                self.responses += 1
+                return response
+        try:
+            response = self.handle(data, addr)
+        except ValueError:
+            response = None
+        if response is None:
+            self.invalid += 1
+            return None
+        if cache is not None:
+            cache.put(key, response)
+        self.responses += 1
+        return response
+
+    def handle(self, data, addr):
+        """return the response packet to the request or None"""
+        code, pid, length, auth = decoder.unpack_header(data)
+        packet = data[:length]
+        if code == ACCOUNTING_REQUEST:
+            if radius.request_authenticator(packet, self.secret) != auth:
+                return None
+        elif code != STATUS_SERVER:
+            return None
+        return radius.create_response(ACCOUNTING_RESPONSE, pid, auth,
+                                      self.secret)
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+
+class EapServer(AccountingServer):
+    """Accounting server authenticating the EAP-MD5 Access-Requests as well
+
+    A local EAP stand-in for the load tests: any identity is challenged
+    and accepted with the password. The Access-Requests must be signed
+    with the Message-Authenticator and so are the responses. The pending
+    conversations are kept by their State (up to MAX_CONVERSATIONS - the
+    oldest ones are dropped)."""
+
+    def __init__(self, secret, password="password", **kwargs):
+        super().__init__(secret, **kwargs)
+        self.password = password.encode("utf-8")
+        self.conversations = {}  # State -> (EAP identifier, challenge)
+        self.challenges = 0
+        self.accepts = 0
+        self.rejects = 0
+
+    def handle(self, data, addr):
+        code, pid, length, auth = decoder.unpack_header(data)
+        if code != eap.ACCESS_REQUEST:
+            return super().handle(data, addr)
+        packet = data[:length]
+        if not radius.check_message_authenticator(packet, self.secret):
+            return None
+        eap_message, state = eap.get_attributes(packet, length)
+        if eap_message is None:
+            return None
+        eap_code, eap_id, eap_type, eap_data = eap.unpack(eap_message)
+        if eap_code != eap.EAP_RESPONSE:
+            return None
+
+        if eap_type == eap.EAP_IDENTITY:
+            state, challenge = os.urandom(16), os.urandom(16)
+            eap_id = (eap_id + 1) & 0xff
+            if len(self.conversations) >= MAX_CONVERSATIONS:
+                del self.conversations[next(iter(self.conversations))]
+            self.conversations[state] = (eap_id, challenge)
+            self.challenges += 1
+            return self.respond(eap.ACCESS_CHALLENGE, pid, auth, eap.pack(
+                eap.EAP_REQUEST, eap_id, eap.EAP_MD5,
+                eap.md5_value(challenge)), state)
+
+        conversation = self.conversations.pop(state, None)
+        if conversation and eap_type == eap.EAP_MD5 and \
+                eap_id == conversation[0] and \
+                eap.parse_md5_value(eap_data) == eap.md5_response(
+                    eap_id, self.password, conversation[1]):
+            self.accepts += 1
+            return self.respond(eap.ACCESS_ACCEPT, pid, auth,
+                                eap.pack(eap.EAP_SUCCESS, eap_id))
+        self.rejects += 1
+        return self.respond(eap.ACCESS_REJECT, pid, auth,
+                            eap.pack(eap.EAP_FAILURE, eap_id))
+
+    def respond(self, code, pid, auth, eap_packet, state=None):
+        avps = [radius.RadiusAvp("EAP-Message", eap_packet).dump()]
+        if state is not None:
+            avps.append(radius.RadiusAvp("State", state).dump())
+        return radius.create_response(code, pid, auth, self.secret,
+                                      b"".join(avps), signed=True)
+
+
+async def start_server(local_tuple, secret, protocol=AccountingServer):
+    """start the server listening on local_tuple (ip, port) - protocol is
+    called with the secret to create the server protocol object"""
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: protocol(secret), local_addr=local_tuple)
+    return server
+
+
+def serve(local_tuple, secret, protocol=AccountingServer, stream=False,
+          ssl=None):
+    """run the server forever - over TCP (or TLS if the ssl context is
+    given) if stream is set (see stream.py)"""
+
+    async def run():
+        if stream or ssl:
+            from . import stream as streams
+            await streams.start_stream_server(local_tuple, secret, protocol,
+                                              ssl)
+        else:
+            await start_server(local_tuple, secret, protocol)
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+#
+# spool.py
+# Author: Alex Kozadaev (2014)
+#
+# Spool - pre-generated packets in a compact file: the magic followed by
+# the packets, each prefixed by its length (2 octets, network order)
+#
+
+import array
+import errno
+import mmap
+import struct
+import time
+
+from . import radius
+
+SPOOL_MAGIC = b"RADISPL1"
+WRITE_BUFFER_SIZE = 1024 * 1024
+BATCH_SIZE = 64  # packets per sendmmsg() call
+RECORD_HDR = struct.Struct("!H")
+# the send errors of the packets sent again (a refused earlier packet)
+RESEND_ERRNOS = (errno.ECONNREFUSED, errno.ENOBUFS)
+
+
+class SpoolWriter:
+    """Buffered spool writer - the packets are collected in a buffer
+    written to the file in bulk when it fills up (buffer_size bytes)"""
+
+    def __init__(self, filename, buffer_size=WRITE_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.buffer = bytearray(SPOOL_MAGIC)
+        self.count = 0
+        self.file = open(filename, "wb")
+
+    def write(self, packet, timestamp=None):
+        """add the packet (the timestamp is not stored - see PcapWriter)"""
+        self.buffer += RECORD_HDR.pack(len(packet))
+        self.buffer += packet
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Spool:
+    """Memory mapped spool - the packets are memoryview slices of the
+    mapping (nothing is copied). The offsets and the lengths of the
+    packets are read when the spool is opened.
+
+    The mapping is private (copy on write) so that its address can be
+    given to sendmmsg() - the file is never changed."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            try:
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            except ValueError:
+                raise ValueError(f"{filename}: empty spool file")
+        self.data = memoryview(self.mmap)
+        if self.data[:len(SPOOL_MAGIC)] != SPOOL_MAGIC:
+            self.close()
+            raise ValueError(f"{filename}: not a spool file")
+        self.offsets = array.array("Q")
+        self.lengths = array.array("H")
+        offset, end = len(SPOOL_MAGIC), len(self.data)
+        while offset + RECORD_HDR.size <= end:
+            length = RECORD_HDR.unpack_from(self.data, offset)[0]
+            offset += RECORD_HDR.size
+            if offset + length > end:
+                break  # truncated spool
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            offset += length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        offset = self.offsets[index]
+        return self.data[offset:offset + self.lengths[index]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+        self.data.release()
+        try:
+            self.mmap.close()
+        except BufferError:
+            pass  # the packets are still referenced
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MessageVector:
+    """sendmmsg() (Linux) of the spool packets - the message headers
+    pointing at the mapped packets are built once, so sending a batch
+    takes a single call and creates no objects per packet
+
+    Raises OSError if sendmmsg() is not available."""
+
+    def __init__(self, spool):
+        import ctypes  # deferred - only needed for the blast mode
+
+        class iovec(ctypes.Structure):
+            _fields_ = [("iov_base", ctypes.c_void_p),
+                        ("iov_len", ctypes.c_size_t)]
+
+        class msghdr(ctypes.Structure):
+            _fields_ = [("msg_name", ctypes.c_void_p),
+                        ("msg_namelen", ctypes.c_uint32),
+                        ("msg_iov", ctypes.c_void_p),
+                        ("msg_iovlen", ctypes.c_size_t),
+                        ("msg_control", ctypes.c_void_p),
+                        ("msg_controllen", ctypes.c_size_t),
+                        ("msg_flags", ctypes.c_int)]
+
+        class mmsghdr(ctypes.Structure):
+            _fields_ = [("msg_hdr", msghdr), ("msg_len", ctypes.c_uint)]
+
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            self.sendmmsg = libc.sendmmsg
+        except (AttributeError, OSError, TypeError):
+            raise OSError("sendmmsg() is not available")
+        self.ctypes = ctypes
+        self.size = ctypes.sizeof(mmsghdr)
+        count = len(spool)
+        self.base = ctypes.addressof(ctypes.c_char.from_buffer(spool.mmap))
+        self.iovecs = (iovec * count)()
+        self.messages = (mmsghdr * count)()
+        iov_base = ctypes.addressof(self.iovecs)
+        for n in range(count):
+            self.iovecs[n].iov_base = self.base + spool.offsets[n]
+            self.iovecs[n].iov_len = spool.lengths[n]
+            header = self.messages[n].msg_hdr
+            header.msg_iov = iov_base + n * ctypes.sizeof(iovec)
+            header.msg_iovlen = 1
+
+    def send(self, fd, index, count):
+        """send count packets starting with index over the connected
+        socket fd returning the number of the packets sent"""
+        sent = self.sendmmsg(fd, self.ctypes.byref(self.messages,
+                                                   index * self.size),
+                             count, 0)
+        if sent < 0:
+            code = self.ctypes.get_errno()
+            raise OSError(code, f"sendmmsg failed (errno {code})")
+        return sent
+
+    def release(self):
+        """drop the references to the mapping (see Spool.close)"""
+        self.messages = self.iovecs = None
+
+
+def send_packets(sock, spool, index, count):
+    """send() count packets of the spool starting with index over the
+    connected socket returning the number of the packets sent - stops at
+    a refused packet as sendmmsg() does"""
+    for n in range(index, index + count):
+        try:
+            sock.send(spool[n])
+        except OSError as err:
+            if err.errno not in RESEND_ERRNOS:
+                raise
+            return n - index
+    return count
+
+
+def blast(spool, dest_tuple, count=None, rate=None, batch=BATCH_SIZE):
+    """send count packets of the spool (all by default) to dest_tuple
+    (dest_ip, dest_port) as fast as possible or at rate packets per
+    second. The packets are sent in batches by sendmmsg() where available.
+    A refused packet (the ICMP error of an earlier packet) is sent again.
+
+    The spool is never repeated - resent packets have the identifiers and
+    the authenticators the server has already seen, so its duplicate
+    cache (RFC 5080) drops them or replays the responses. Raises
+    ValueError if count is larger than the spool (--write more packets).
+
+    Returns a tuple with the number of sent packets and the elapsed time"""
+    if not len(spool):
+        raise ValueError(f"{spool.filename}: empty spool")
+    count = len(spool) if count is None else count
+    if count > len(spool):
+        raise ValueError(f"{spool.filename}: {count} packets requested, "
+                         f"the spool has {len(spool)}")
+    sock = radius.create_socket(dest_tuple[0])
+    sock.connect(dest_tuple)
+    try:
+        vector = MessageVector(spool)
+    except OSError:
+        vector = None
+    fd, sent = sock.fileno(), 0
+    started = time.perf_counter()
+    try:
+        while sent < count:
+            if rate:
+                delay = started + sent / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            size = min(batch, count - sent)
+            if vector:
+                try:
+                    size = vector.send(fd, sent, size)
+                except OSError as err:
+                    if err.errno not in RESEND_ERRNOS:
+                        raise
+                    size = 0  # the first packet was refused - resend
+            else:
+                size = send_packets(sock, spool, sent, size)
+            sent += size
+    finally:
+        if vector:
+            vector.release()
+        sock.close()
+    return sent, time.perf_counter() - started
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+#
+# storm.py
+# Author: Alex Kozadaev (2014)
+#
+
+import array
+import asyncio
+import heapq
+import random
+import time
+
+from . import histogram
+from . import identities
+from . import proxy
+from . import radius
+from . import scenario
+
+ACCOUNTING_REQUEST = 4
+START, ACCOUNTING_ON, ACCOUNTING_OFF = 1, 7, 8
+# the storm events (the session index of the reboot events)
+OFF, ON = -2, -1
+PHASES = ("Accounting-Off", "Accounting-On", "Start")
+DISTRIBUTIONS = ("constant", "uniform", "exponential")
+
+
+def parse_distribution(spec, what="reconnect"):
+    """parse the reconnect delay distribution (or another one - what):
+        constant:SECS - all the subscribers reconnect after SECS
+        uniform:SECS - spread evenly over SECS (eg. uniform:10)
+        exponential:MEAN - most reconnect at once, a long tail after
+    Returns the function of the random.Random object returning a delay"""
+    name, sep, value = spec.partition(":")
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"invalid {what} distribution: {spec}")
+    if name not in DISTRIBUTIONS or value < 0 or \
+            (name == "exponential" and value == 0):
+        raise ValueError(f"invalid {what} distribution: {spec}")
+    if name == "constant":
+        return lambda rand: value
+    if name == "uniform":
+        return lambda rand: rand.random() * value
+    return lambda rand: rand.expovariate(1.0 / value)
+
+
+class PhaseStats:
+    """requests of a storm phase - the lost ones were not answered (after
+    the retransmissions)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.sent = 0
+        self.acked = 0
+        self.lost = 0
+        self.histogram = histogram.Histogram()
+
+    def to_dict(self):
+        return {"sent": self.sent, "acked": self.acked, "lost": self.lost,
+                "latency": self.histogram.summary()}
+
+
+class Nas:
+    """a rebooting NAS - the AVPs of its requests encoded once"""
+
+    def __init__(self, index, address, identifier, reboot):
+        self.index = index
+        self.identifier = identifier
+        self.reboot = reboot  # seconds since the start of the storm
+        self.avps = b"".join((
+            radius.RadiusAvp("NAS-IP-Address", address).dump(),
+            radius.RadiusAvp("NAS-Identifier", identifier).dump()))
+        self.requests = {}
+        for status, name in ((ACCOUNTING_OFF, OFF), (ACCOUNTING_ON, ON)):
+            self.requests[name] = b"".join((
+                self.avps, radius.intern_avp("Acct-Status-Type",
+                                             status).dump(),
+                radius.RadiusAvp("Acct-Session-Id",
+                                 f"{identifier}-{status}").dump()))
+
+
+class Storm:
+    """NAS reboot storm
+
+    Every NAS (nas_count of them, with the addresses of nas_network and
+    the NAS-Identifiers nas_prefix + N) reboots spread seconds into the
+    storm at the latest: it sends an Accounting-Off, goes down for
+    down_time seconds, sends an Accounting-On and then the Starts of its
+    sessions (sessions per NAS) reconnecting after the delays of the
+    reconnect distribution (see parse_distribution).
+
+    The subscribers of all the NAS are distinct - the IMSIs (also the
+    User-Name) of mcc/mnc and the Framed-IP-Addresses of framed_network
+    are numbered by the NAS and the session. The (name, value) avps are
+    added to every Start."""
+
+    def __init__(self, nas_count, sessions, reconnect="uniform:10",
+                 down_time=1.0, spread=0.0, nas_network="10.255.0.0/16",
+                 nas_prefix="nas", mcc="001", mnc="01",
+                 framed_network="100.64.0.0/10", avps=(), seed=0):
+        if nas_count < 1 or sessions < 0:
+            raise ValueError(f"invalid storm size: {nas_count}x{sessions}")
+        self.nas_count = nas_count
+        self.sessions = sessions
+        self.delay = parse_distribution(reconnect)
+        self.reconnect = reconnect
+        self.down_time = down_time
+        self.random = random.Random(seed)
+        addresses = identities.AddressRange(nas_network, count=nas_count)
+        self.nas = [Nas(n, addresses[n], f"{nas_prefix}{n}",
+                        self.random.random() * spread)
+                    for n in range(nas_count)]
+        imsi = {"type": "imsi", "mcc": mcc, "mnc": mnc,
+                "count": nas_count * sessions}
+        framed = {"type": "address", "network": framed_network,
+                  "count": nas_count * sessions}
+        self.encoders = [
+            scenario.Identity("User-Name", imsi),
+            scenario.SessionId("Acct-Session-Id", ""),
+            scenario.Identity("3GPP-IMSI", imsi),
+            scenario.Identity("Framed-IP-Address", framed),
+        ] if sessions else []
+        self.start_avps = b"".join(
+            [radius.intern_avp("Acct-Status-Type", START).dump()] +
+            [radius.intern_avp(name, value).dump() for name, value in avps])
+
+    def __len__(self):
+        return self.nas_count * (self.sessions + 2)
+
+    def schedule(self, nas):
+        """generate the (time, NAS index, session) events of the NAS in
+        the time order (the session is OFF/ON for the reboot events)"""
+        yield nas.reboot, nas.index, OFF
+        online = nas.reboot + self.down_time
+        yield online, nas.index, ON
+        delays = array.array("d", sorted(self.delay(self.random)
+                                         for n in range(self.sessions)))
+        for session, delay in enumerate(delays):
+            yield online + delay, nas.index, session
+
+    def events(self):
+        """generate the events of all the NAS in the time order"""
+        return heapq.merge(*[self.schedule(nas) for nas in self.nas])
+
+    def request(self, nas_index, session, secret):
+        """the request (see proxy.ForwardedRequest) of the event"""
+        nas = self.nas[nas_index]
+        if session < 0:
+            return proxy.ForwardedRequest(ACCOUNTING_REQUEST,
+                                          nas.requests[session], secret)
+        session += nas_index * self.sessions
+        # the reboot is the second lifecycle of the session
+        avps = [encoder.encode(session, 1, 0.0) for encoder in self.encoders]
+        avps.append(nas.avps)
+        avps.append(self.start_avps)
+        return proxy.ForwardedRequest(ACCOUNTING_REQUEST, b"".join(avps),
+                                      secret)
+
+    async def run(self, client, concurrency=256):
+        """send the storm through the client (see client.RadiusClient)
+        keeping up to concurrency requests outstanding. The requests are
+        sent when they are due unless the collector falls behind
+
+        Returns the PhaseStats of the PHASES and the maximum lag behind
+        the schedule (seconds)"""
+        phases = [PhaseStats(name) for name in PHASES]
+        slots = asyncio.Semaphore(concurrency)
+        tasks = set()
+        lag = 0.0
+
+        async def request(phase, message):
+            started = time.perf_counter()
+            try:
+                response = await client.request(message)
+            finally:
+                slots.release()
+            if response is None:
+                phase.lost += 1
+                return
+            phase.acked += 1
+            phase.histogram.record(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        try:
+            for due, nas_index, session in self.events():
+                delay = started + due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await slots.acquire()
+                lag = max(lag, time.perf_counter() - started - due)
+                phase = phases[min(session, 0) + 2]
+                phase.sent += 1
+                task = asyncio.ensure_future(request(
+                    phase, self.request(nas_index, session, client.secret)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return phases, lag
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+#
+# stream.py
+# Author: Alex Kozadaev (2014)
+#
+
+import asyncio
+import ssl
+import time
+
+from . import client
+from . import decoder
+from . import radius
+from . import server
+
+# RADIUS over TCP (RFC 6613) and over TLS (RadSec, RFC 6614)
+MAX_PACKET_LENGTH = 65535  # RFC 7930
+RECEIVE_BUFFER_SIZE = 2 * MAX_PACKET_LENGTH
+
+
+def client_context(cafile=None, certfile=None, keyfile=None):
+    """return the TLS client context - the server certificate is verified
+    against cafile (not verified if None). The client certificate
+    (certfile) is required by most of the RadSec servers. The RadSec
+    peers are identified by their certificates - the host names are not
+    checked"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    if cafile:
+        context.load_verify_locations(cafile)
+    else:
+        context.verify_mode = ssl.CERT_NONE
+    if certfile:
+        context.load_cert_chain(certfile, keyfile)
+    return context
+
+
+def server_context(certfile, keyfile=None, cafile=None):
+    """return the TLS server context - the client certificates are required
+    and verified against cafile if given"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    if cafile:
+        context.load_verify_locations(cafile)
+        context.verify_mode = ssl.CERT_REQUIRED
+    return context
+
+
+class PacketStream(asyncio.BufferedProtocol):
+    """Radius packets framed by their length field over a stream
+
+    The data are received straight into a preallocated buffer (no copy per
+    read) and the complete packets are passed to packet_received() as
+    memoryviews of the buffer - valid until it returns. The partial packet
+    left is moved to the front of the buffer. A packet with an invalid
+    length closes the connection (the stream cannot be resynchronised)."""
+
+    def __init__(self):
+        self.transport = None
+        self.buffer = bytearray(RECEIVE_BUFFER_SIZE)
+        self.view = memoryview(self.buffer)
+        self.filled = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        return self.view[self.filled:]
+
+    def buffer_updated(self, nbytes):
+        filled = self.filled + nbytes
+        buffer, offset = self.buffer, 0
+        while filled - offset >= decoder.RADIUS_HDR_LEN:
+            length = (buffer[offset + 2] << 8) | buffer[offset + 3]
+            if length < decoder.RADIUS_HDR_LEN:
+                self.filled = 0
+                self.transport.close()
+                return
+            if offset + length > filled:
+                break
+            self.packet_received(self.view[offset:offset + length])
+            offset += length
+        if offset:
+            buffer[:filled - offset] = buffer[offset:filled]
+        self.filled = filled - offset
+
+    def packet_received(self, packet):
+        raise NotImplementedError()
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+
+class StreamClient(PacketStream):
+    """Radius client connection (TCP or TLS)
+
+    Up to 256 requests (the identifier space) are pipelined over the
+    connection - request() waits for a free identifier. The requests are
+    never retransmitted over the same connection (RFC 6613) - the ones
+    not answered within timeout seconds and the ones outstanding when the
+    connection is lost return None. The responses are validated by the
+    response authenticator. The packets sent and received are added to
+    the journal (see libradi.journal) if given.
+
+    Use StreamPool to create the connections."""
+
+    def __init__(self, secret, timeout=3.0, stats=None, journal=None):
+        super().__init__()
+        self.secret = secret
+        self.timeout = timeout
+        self.stats = stats or client.ClientStats()
+        self.journal = journal
+        self.closed = False
+        self.pending = {}  # pid -> (future, request authenticator)
+        self.ids = asyncio.Queue()
+        for pid in range(256):
+            self.ids.put_nowait(pid)
+
+    def connection_lost(self, exc):
+        self.closed = True
+        for future, request_auth in self.pending.values():
+            if not future.done():
+                future.set_result(None)
+
+    def packet_received(self, packet):
+        if self.journal:
+            self.journal.received(packet)
+        pid = packet[1]
+        future, request_auth = self.pending.get(pid, (None, None))
+        if future is None or future.done() or packet[4:20] != \
+                radius.response_authenticator(packet, request_auth,
+                                              self.secret):
+            self.stats.invalid += 1
+            return
+        future.set_result(bytes(packet))
+
+    async def request(self, message):
+        """send the RadiusMessage (the identifier is assigned by the client)
+        returning the response packet or None"""
+        pid = await self.ids.get()
+        try:
+            message.pid = pid
+            return await self.request_packet(message.dump())
+        finally:
+            self.ids.put_nowait(pid)
+
+    async def request_packet(self, packet):
+        """send the request packet (its identifier must not be used by
+        any other outstanding request)"""
+        stats = self.stats
+        stats.sent += 1
+        if self.closed:
+            stats.timeouts += 1
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self.pending[packet[1]] = (future, packet[4:20])
+        started = time.perf_counter()
+        try:
+            if self.journal:
+                self.journal.sent(packet)
+            self.transport.write(packet)
+            response = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            response = None
+        finally:
+            del self.pending[packet[1]]
+        if response is None:
+            stats.timeouts += 1
+            return None
+        stats.acked += 1
+        stats.record_latency(time.perf_counter() - started)
+        return response
+
+
+class StreamPool:
+    """Pool of the persistent radius connections to one server
+
+    The requests are spread over the connections round robin (each one
+    pipelines up to 256 requests). The lost connections are reopened
+    when used next. Has the RadiusClient interface (see client.py) - the
+    stats (and the journal if given) are shared by all the connections.
+
+    Use open_pool() to create the pool."""
+
+    def __init__(self, dest_tuple, secret, ssl=None, connections=1,
+                 timeout=3.0, stats=None, journal=None):
+        if connections < 1:
+            raise ValueError(f"invalid number of connections: {connections}")
+        self.dest_tuple = dest_tuple
+        self.secret = secret
+        self.ssl = ssl
+        self.timeout = timeout
+        self.stats = stats or client.ClientStats()
+        self.journal = journal
+        self.connections = [None] * connections
+        self.index = 0
+
+    async def connect(self, index):
+        """(re)open the connection at index"""
+        loop = asyncio.get_running_loop()
+        transport, connection = await loop.create_connection(
+            lambda: StreamClient(self.secret, self.timeout, self.stats,
+                                 self.journal),
+            self.dest_tuple[0], self.dest_tuple[1], ssl=self.ssl)
+        self.connections[index] = connection
+        return connection
+
+    async def request(self, message):
+        """send the RadiusMessage over the next connection returning the
+        response packet or None (see StreamClient.request)"""
+        index = self.index
+        self.index = (index + 1) % len(self.connections)
+        connection = self.connections[index]
+        if connection is None or connection.closed:
+            try:
+                connection = await self.connect(index)
+            except OSError:
+                self.stats.sent += 1
+                self.stats.timeouts += 1
+                return None
+        return await connection.request(message)
+
+    def close(self):
+        for connection in self.connections:
+            if connection:
+                connection.close()
+
+
+class StreamServer(PacketStream):
+    """Server side of a radius connection - the requests are answered by
+    the server protocol object (see server.py) shared by all the
+    connections"""
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.peer = None
+
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        self.peer = transport.get_extra_info("peername")
+
+    def packet_received(self, packet):
+        response = self.handler.process(packet, self.peer)
+        if response is not None:
+            self.transport.write(response)
+
+
+async def open_pool(dest_tuple, secret, ssl=None, connections=1, **kwargs):
+    """create a StreamPool of the connections to dest_tuple (dest_ip,
+    dest_port) - TLS if the ssl context is given (see client_context).
+    The keyword arguments are passed to StreamPool"""
+    pool = StreamPool(dest_tuple, secret, ssl, connections, **kwargs)
+    try:
+        for index in range(connections):
+            await pool.connect(index)
+    except BaseException:
+        pool.close()
+        raise
+    return pool
+
+
+async def start_stream_server(local_tuple, secret,
+                              protocol=server.AccountingServer, ssl=None):
+    """start the server listening on local_tuple (ip, port) - TLS if the
+    ssl context is given (see server_context). protocol is called with the
+    secret to create the server protocol object answering the requests of
+    all the connections. Returns (listener, server protocol object)"""
+    handler = protocol(secret)
+    listener = await asyncio.get_running_loop().create_server(
+        lambda: StreamServer(handler), local_tuple[0], local_tuple[1],
+        ssl=ssl)
+    return listener, handler
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+#
+# usage.py
+# Author: Alex Kozadaev (2014)
+#
+# Session traffic volume model - the accounting counters of the Interim and
+# the Stop messages (RFC 2866, the Gigawords of RFC 2869) computed in the
+# closed form for any time of the session: nothing is updated as the time
+# goes by, a session is only its start time, its input/output rates
+# (octets per second, drawn from the rate distributions) and the phase of
+# its activity. The traffic comes in waves - the rate of a session
+# changes between (1 - burstiness) and (1 + burstiness) times its mean
+# rate over the period:
+#
+#   octets(t) = rate * (t + burstiness * period / 2pi *
+#                       (cos(phase) - cos(2pi * t / period + phase)))
+#
+# which never decreases. The octets above 32 bits wrap into the Gigawords.
+#
+
+import math
+
+from . import identities
+from . import scenario
+from . import storm
+
+MASK32 = 0xffffffff
+COUNTERS = ("Acct-Input-Octets", "Acct-Output-Octets",
+            "Acct-Input-Gigawords", "Acct-Output-Gigawords",
+            "Acct-Input-Packets", "Acct-Output-Packets",
+            "Acct-Session-Time")
+
+
+def split_octets(octets):
+    """the (octets, gigawords) counters of the octets total"""
+    return octets & MASK32, (octets >> 32) & MASK32
+
+
+class SessionRandom:
+    """the random values of a session - the random.Random methods used by
+    the distributions over the hash of the seed and the session (creating
+    a random.Random for every session is several times slower)"""
+
+    def __init__(self, seed, session):
+        self.state = identities.mix(seed ^ session)
+
+    def random(self):
+        self.state = identities.mix(self.state)
+        return (self.state >> 11) / 2.0 ** 53
+
+    def expovariate(self, lambd):
+        return -math.log(1.0 - self.random()) / lambd
+
+
+class SessionUsage:
+    """the usage state of a session (see UsageModel.session)"""
+
+    __slots__ = ("started", "input_rate", "output_rate", "phase")
+
+    def __init__(self, started, input_rate, output_rate, phase):
+        self.started = started
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.phase = phase
+
+
+class UsageModel:
+    """Traffic volume model (see the module notes)
+
+    input_rate, output_rate - the distributions of the mean rates of the
+        sessions in octets per second (see storm.parse_distribution -
+        eg. exponential:20000 for a mean of 20kB/s)
+    input_packet, output_packet - the average packet sizes (octets)
+    burstiness - 0 (constant rate) .. 1 (idle at the bottom of the wave)
+    period - the length of the traffic wave (seconds)
+
+    The sessions (their rates and phases) are derived from the seed and
+    the session number only, so any session can be created at any time."""
+
+    def __init__(self, input_rate="exponential:2000",
+                 output_rate="exponential:20000", input_packet=200,
+                 output_packet=1200, burstiness=0.5, period=300.0, seed=0):
+        if input_packet < 1 or output_packet < 1:
+            raise ValueError("invalid packet size: "
+                             f"{input_packet}/{output_packet}")
+        if not 0 <= burstiness <= 1 or period <= 0:
+            raise ValueError(f"invalid traffic wave: {burstiness}/{period}")
+        self.input_rate = storm.parse_distribution(input_rate, "rate")
+        self.output_rate = storm.parse_distribution(output_rate, "rate")
+        self.input_packet = input_packet
+        self.output_packet = output_packet
+        self.burstiness = burstiness
+        self.period = period
+        self.seed = seed
+        self.encoders = [scenario.Generated(name, 0) for name in COUNTERS]
+
+    def session(self, session, started=0.0):
+        """the usage of the session started at the time started"""
+        rand = SessionRandom(self.seed, session)
+        return SessionUsage(started, self.input_rate(rand),
+                            self.output_rate(rand),
+                            rand.random() * 2 * math.pi)
+
+    def octets(self, usage, timestamp):
+        """the (input, output) octets of the session until the timestamp
+        (the totals - not wrapped)"""
+        elapsed = timestamp - usage.started
+        if elapsed <= 0:
+            return 0, 0
+        if self.burstiness:
+            omega = 2 * math.pi / self.period
+            elapsed += self.burstiness / omega * (
+                math.cos(usage.phase) - math.cos(omega * elapsed +
+                                                 usage.phase))
+        return int(usage.input_rate * elapsed), \
+            int(usage.output_rate * elapsed)
+
+    def counters(self, usage, timestamp):
+        """the values of the COUNTERS of the session at the timestamp"""
+        input_total, output_total = self.octets(usage, timestamp)
+        input_octets, input_gigawords = split_octets(input_total)
+        output_octets, output_gigawords = split_octets(output_total)
+        return (input_octets, output_octets, input_gigawords,
+                output_gigawords,
+                -(-input_total // self.input_packet) & MASK32,
+                -(-output_total // self.output_packet) & MASK32,
+                max(int(timestamp - usage.started), 0))
+
+    def dump(self, usage, timestamp):
+        """the AVPs binary of the COUNTERS of the session at the
+        timestamp"""
+        return b"".join([encoder.dump(value) for encoder, value in
+                         zip(self.encoders, self.counters(usage, timestamp))])
@@ -5,13 +5,15 @@
 #
 
 import sys
-import getopt
 import os.path
 import struct
-import pickle
 
 import libradi
-from version import __version__
+
+try:
+    from version import __version__
+except ImportError:  # version.py is generated by the git hooks
+    __version__ = "devel"
 
 # Globals
 __verbose__ = False  # enabling verbose logging
@@ -19,7 +21,29 @@ __verbose__ = False  # enabling verbose logging
 # Constants
 RESTART, START, STOP, INTERIM = range(4)  # also ACCT_STATUS_TYPE start/stop
 FRAMED_PROTO_PPP = 1
-PICKLED_FILE_NAME = f"{os.path.curdir}/.{os.path.basename(__file__)}.dat"
+PROFILES_FILE_NAME = \
+    f"{os.path.curdir}/.{os.path.basename(__file__)}.profiles"
+DEFAULT_PROFILE = "default"
+
+# options which are not a part of the cached configuration
+TRANSIENT_OPTIONS = ("help", "replay", "replay_speed", "replay_pid",
+                     "analyze", "analyze_attrs", "jobs", "pool_prefix",
+                     "profile", "list_profiles", "cleancache", "daemon",
+                     "rate", "pacing", "count", "wait", "timeout", "retries",
+                     "concurrency", "report_interval", "results",
+                     "acct_server", "eap", "eap_password", "auth_server",
+                     "transport", "connections", "tls_ca", "tls_cert",
+                     "tls_key", "servers", "balance", "proxy", "proxy_set",
+                     "proxy_drop", "scenario", "storm", "reconnect",
+                     "down_time", "write", "blast", "pipeline", "journal",
+                     "dump_journal")
+# the options running a server until interrupted (not through the daemon)
+SERVER_OPTIONS = ("daemon", "acct_server", "auth_server", "proxy")
+# the attribute types accepted by radtypes (listed here so that the help
+# does not import it - see radtypes.get_supported_types)
+SUPPORTED_TYPES = ("string", "octets", "ipaddr", "ipv6addr", "ipv6prefix",
+                   "ether", "date", "integer", "signed", "short", "byte",
+                   "tlv")
 
 
 class Config:
@@ -52,10 +76,38 @@ class Config:
 
         self.avps = []
 
+    # the configuration fields stored in the profiles
+    PROFILE_VERSION = 1
+    PROFILE_FIELDS = ("dict_path", "dict_fname", "radius_dest", "radius_port",
+                      "radius_secret", "username", "imsi", "imei",
+                      "framed_ip", "framed_mask", "calling_id", "called_id",
+                      "subs_loc_info", "delay", "action", "avps")
+
     def update(self, config):
         """merge the current object with 'config' dictionary"""
         self.__dict__.update(config)
 
+    def to_profile(self):
+        """return the profile record (json serializable dictionary)"""
+        record = {name: getattr(self, name) for name in self.PROFILE_FIELDS}
+        record["subs_loc_info"] = self.subs_loc_info.hex()
+        record["avps"] = [list(avp) for avp in self.avps]
+        record["version"] = self.PROFILE_VERSION
+        return record
+
+    def load_profile(self, record):
+        """merge the current object with the profile record. Fields which
+        are not known (eg. saved by another version) are ignored"""
+        record = {
+            name: value
+            for name, value in record.items() if name in self.PROFILE_FIELDS
+        }
+        if "subs_loc_info" in record:
+            record["subs_loc_info"] = bytes.fromhex(record["subs_loc_info"])
+        if "avps" in record:
+            record["avps"] = [tuple(avp) for avp in record["avps"]]
+        self.update(record)
+
 
 def load_install_path():
     global INSTALL_PREFIX
@@ -73,66 +125,600 @@ def is_ipv6(ipaddr):
 
 
 def create_radius_request(config, action):
-    """generate a binary version of the packet based on the current config"""
+    """generate a binary version of the packet based on the current config.
+    The values shared by the sessions are interned (encoded once), the
+    per-subscriber ones would only churn the AVP cache"""
+    avp = libradi.radius.intern_avp  # the shared values
+    unique = libradi.RadiusAvp  # the per-subscriber values
     rad = libradi.RadiusMessage(config.radius_secret)
-    rad.add_avp(libradi.RadiusAvp("User-Name", config.username))
-    rad.add_avp(libradi.RadiusAvp("Acct-Status-Type", action))
+    rad.add_avp(unique("User-Name", config.username))
+    rad.add_avp(avp("Acct-Status-Type", action))
 
     if is_ipv6(config.radius_dest):
-        rad.add_avp(libradi.RadiusAvp("NAS-IPv6-Address", config.radius_dest))
+        rad.add_avp(avp("NAS-IPv6-Address", config.radius_dest))
     else:
-        rad.add_avp(libradi.RadiusAvp("NAS-IP-Address", config.radius_dest))
+        rad.add_avp(avp("NAS-IP-Address", config.radius_dest))
 
     if is_ipv6(config.framed_ip):
         if not config.framed_mask:
             config.framed_mask = 128
-        rad.add_avp(
-            libradi.RadiusAvp("Framed-IPv6-Prefix",
-                              f"{config.framed_ip}/{config.framed_mask}"))
+        rad.add_avp(unique("Framed-IPv6-Prefix",
+                           f"{config.framed_ip}/{config.framed_mask}"))
     else:
         if not config.framed_mask:
             config.framed_mask = 32
-        rad.add_avp(libradi.RadiusAvp("Framed-IP-Address", config.framed_ip))
-        rad.add_avp(
-            libradi.RadiusAvp(
-                "Framed-IP-Netmask",
-                libradi.radtypes.bits_to_ip4mask(config.framed_mask)))
+        rad.add_avp(unique("Framed-IP-Address", config.framed_ip))
+        rad.add_avp(avp("Framed-IP-Netmask",
+                        libradi.radtypes.bits_to_ip4mask(config.framed_mask)))
 
-    rad.add_avp(libradi.RadiusAvp("Framed-Protocol", FRAMED_PROTO_PPP))
-    rad.add_avp(libradi.RadiusAvp("Calling-Station-Id", config.calling_id))
-    rad.add_avp(libradi.RadiusAvp("Called-Station-Id", config.called_id))
+    rad.add_avp(avp("Framed-Protocol", FRAMED_PROTO_PPP))
+    rad.add_avp(unique("Calling-Station-Id", config.calling_id))
+    rad.add_avp(avp("Called-Station-Id", config.called_id))
 
-    rad.add_avp(
-        libradi.RadiusAvp("3GPP-Location-Info",
-                          "0x" + config.subs_loc_info.hex()))
+    rad.add_avp(unique("3GPP-Location-Info",
+                       "0x" + config.subs_loc_info.hex()))
 
-    rad.add_avp(libradi.RadiusAvp("3GPP-IMSI", config.imsi))
-    rad.add_avp(libradi.RadiusAvp("3GPP-IMEISV", config.imei))
+    rad.add_avp(unique("3GPP-IMSI", config.imsi))
+    rad.add_avp(unique("3GPP-IMEISV", config.imei))
 
     for name, value in config.avps:
-        rad.add_avp(libradi.RadiusAvp(name, value))
+        rad.add_avp(avp(name, value))
 
     # debug(str(rad))
 
     return rad
 
 
-def change_session(conifg, action):
+def change_session(config, action, sock=None):
     """send start/stop session based on action in the config"""
     create_radius_request(config, action).send(
-        (config.radius_dest, config.radius_port))
+        (config.radius_dest, config.radius_port), sock)
+
+
+def create_pacer(options):
+    """create the pacer of the --rate/--pacing options (or None)"""
+    if "rate" not in options:
+        return None
+    return libradi.pacing.create_pacer(options["rate"],
+                                       options.get("pacing", "constant"))
+
+
+def report_pacing(pacer):
+    """print the actual vs the target send rate"""
+    elapsed, sent, actual, target = pacer.report()
+    print(f"Sent {sent} requests in {elapsed:.3f}s: {actual:.1f} pps "
+          f"(target {target:.1f} pps, {pacer.profile})")
+
+
+def create_requests(config, options):
+    """return the iterator of the requests to send - generated by the
+    --scenario or the request of the configured action repeated"""
+    import itertools
+    if "scenario" in options:
+        scenario = libradi.scenario.load(options["scenario"])
+        return scenario.requests(config.radius_secret)
+    if config.action == RESTART:
+        raise ValueError("the restart action cannot be sent in bulk")
+    return itertools.repeat(create_radius_request(config, config.action))
+
+
+def send_bulk(config, options, sock=None):
+    """send count requests of the configured action or the --scenario (the
+    packet identifier is incremented for each request) paced by the --rate
+    option. The requests are signed by the --pipeline threads if given"""
+    count = int(options.get("count", 1))
+    pacer = create_pacer(options)
+    requests = create_requests(config, options)
+    dest = (config.radius_dest, config.radius_port)
+    journal = options.get("journal")
+    if "pipeline" in options:
+        pipeline = libradi.pipeline.Pipeline(
+            dest, sock, int(options["pipeline"]) or None, pacer=pacer,
+            journal=journal)
+        sent, elapsed = pipeline.send(requests, count)
+        if pacer:
+            report_pacing(pacer)
+        else:
+            debug(f"Sent {sent} requests in {elapsed:.3f}s "
+                  f"({sent / elapsed:.1f} pps)")
+        return
+    own_sock = sock is None
+    if own_sock:
+        sock = libradi.create_socket(config.radius_dest)
+    try:
+        pid = None
+        for n in range(count):
+            rad = next(requests)
+            if pid is not None:
+                rad.pid = pid
+            if pacer:
+                pacer.wait()
+            packet = rad.dump()
+            if journal:
+                journal.sent(packet)
+            sock.sendto(packet, dest)
+            pid = (rad.pid + 1) & 0xff
+    finally:
+        if own_sock:
+            sock.close()
+    if pacer:
+        report_pacing(pacer)
+    else:
+        debug(f"Sent {count} requests")
+
+
+def write_requests(config, options):
+    """write --count requests of the configured action or the --scenario
+    to the --write file - a pcap capture (*.pcap) or a spool (see
+    libradi.spool) to be sent by --blast"""
+    import time
+    count = int(options.get("count", 1))
+    requests = create_requests(config, options)
+    path = options["write"]
+    if path.endswith(".pcap"):
+        writer = libradi.pcap.PcapWriter(
+            path, dst_tuple=(config.radius_dest, config.radius_port))
+    else:
+        writer = libradi.spool.SpoolWriter(path)
+    rate = float(options.get("rate", 0))
+    started, now = time.perf_counter(), time.time()
+    with writer:
+        for n in range(count):
+            rad = next(requests)
+            rad.pid = n & 0xff
+            writer.write(rad.dump(), now + n / rate if rate else None)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {count} requests to {path} in {elapsed:.3f}s "
+          f"({count / elapsed:.1f} pps)")
+
+
+def blast_spool(config, options):
+    """send the pre-generated --blast spool (--count packets, the whole
+    spool by default) as fast as possible or at the constant --rate"""
+    with libradi.spool.Spool(options["blast"]) as spool:
+        count = int(options.get("count", len(spool)))
+        sent, elapsed = libradi.spool.blast(
+            spool, (config.radius_dest, config.radius_port), count,
+            float(options.get("rate", 0)))
+    print(f"Sent {sent} requests in {elapsed:.3f}s "
+          f"({sent / elapsed:.1f} pps)")
+
+
+def format_latencies(histogram):
+    return " ".join(f"p{p:g} {histogram.percentile(p) * 1000:.3f}ms"
+                    for p in (50, 99, 99.9))
+
+
+async def report_progress(stats, interval):
+    """print the live stats of the last interval every interval seconds"""
+    import asyncio
+    import time
+    started = last_time = time.perf_counter()
+    last = stats.counters()
+    while True:
+        await asyncio.sleep(interval)
+        now, counters = time.perf_counter(), stats.counters()
+        period = now - last_time
+        latencies = stats.flush()
+        print(f"[{now - started:7.1f}s] "
+              f"sent {(counters['sent'] - last['sent']) / period:.0f} pps, "
+              f"acked {(counters['acked'] - last['acked']) / period:.0f} pps, "
+              f"timeouts {counters['timeouts'] - last['timeouts']}, "
+              f"retransmits {counters['retransmits'] - last['retransmits']}, "
+              f"{format_latencies(latencies)}")
+        last_time, last = now, counters
+
+
+def parse_servers(servers, port, secret):
+    """return the (destination, secret, weight) of the servers of the
+    HOST[:PORT][*WEIGHT][@SECRET] comma separated list (the IPv6 hosts
+    with a port in brackets)"""
+    result = []
+    for server in servers.split(","):
+        server, sep, server_secret = server.strip().partition("@")
+        server, sep, weight = server.partition("*")
+        host, server_port = server, port
+        if server.startswith("["):
+            host, sep, rest = server[1:].partition("]")
+            if rest.startswith(":"):
+                server_port = int(rest[1:])
+        elif server.count(":") == 1:
+            host, server_port = server.split(":")
+            server_port = int(server_port)
+        result.append(((host, server_port), server_secret or secret,
+                       int(weight) if weight else 1))
+    return result
+
+
+def transport_opener(options):
+    """return the coroutine function opening the async client of the
+    --transport (udp, tcp or tls) and its keyword arguments"""
+    transport = options.get("transport", "udp")
+    kwargs = {"timeout": float(options.get("timeout", 3))}
+    if "journal" in options:
+        kwargs["journal"] = options["journal"]
+    if transport == "udp":
+        opener = libradi.client.open_client
+        kwargs["retries"] = int(options.get("retries", 2))
+    elif transport in ("tcp", "tls"):
+        opener = libradi.stream.open_pool
+        kwargs["connections"] = int(options.get("connections", 1))
+        if transport == "tls":
+            if "tls_ca" not in options:
+                print("WARNING: the tls server certificate is not verified "
+                      "(see --tls-ca)", file=sys.stderr)
+            kwargs["ssl"] = libradi.stream.client_context(
+                options.get("tls_ca"), options.get("tls_cert"),
+                options.get("tls_key"))
+    else:
+        raise ValueError(f"unsupported transport: {transport}")
+    return opener, kwargs
+
+
+async def open_transport(config, options):
+    """open the async client of the --transport - the balancing pool of
+    the --servers if given (each with its own secret if any)"""
+    opener, kwargs = transport_opener(options)
+    if "servers" in options:
+        servers = parse_servers(options["servers"], config.radius_port,
+                                config.radius_secret)
+        return await libradi.balancer.open_pool(
+            [dest for dest, secret, weight in servers],
+            config.radius_secret, options.get("balance", "round-robin"),
+            [weight for dest, secret, weight in servers], open=opener,
+            secrets=[secret for dest, secret, weight in servers], **kwargs)
+    return await opener((config.radius_dest, config.radius_port),
+                        config.radius_secret, **kwargs)
+
+
+def report_servers(client):
+    """print the requests sent to each server of the --servers pool"""
+    if not isinstance(client, libradi.balancer.ServerPool):
+        return
+    for member in client.members:
+        print(f"Server {member}: {member.requests} requests, "
+              f"{member.failures} failures in a row")
+    print(f"Failovers {client.failovers}, migrated {client.migrated}")
+
+
+def start_options(options):
+    """return the libradi.server.serve() keyword arguments of the
+    --transport (the tls transport requires --tls-cert)"""
+    transport = options.get("transport", "udp")
+    if transport == "udp":
+        return {}
+    if transport == "tcp":
+        return {"stream": True}
+    if transport != "tls":
+        raise ValueError(f"unsupported transport: {transport}")
+    if "tls_cert" not in options:
+        raise ValueError("the tls server requires --tls-cert")
+    return {"ssl": libradi.stream.server_context(options["tls_cert"],
+                                                 options.get("tls_key"),
+                                                 options.get("tls_ca"))}
+
+
+async def run_requests(config, options):
+    """send the requests waiting for the responses (see send_requests)"""
+    import asyncio
+    import time
+    count = int(options.get("count", 1))
+    pacer = create_pacer(options)
+    requests = create_requests(config, options)
+    client = await open_transport(config, options)
+    reporter = asyncio.ensure_future(
+        report_progress(client.stats,
+                        float(options.get("report_interval", 1))))
+    slots = asyncio.Semaphore(int(options.get("concurrency", 256)))
+    tasks = set()
+
+    async def request(rad):
+        try:
+            await client.request(rad)
+        finally:
+            slots.release()
+
+    started = time.perf_counter()
+    try:
+        for n in range(count):
+            delay = pacer.next() if pacer else 0
+            if delay:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            task = asyncio.ensure_future(request(next(requests)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        reporter.cancel()
+        client.close()
+    report_servers(client)
+    return client.stats, time.perf_counter() - started, pacer
+
+
+def send_requests(config, options):
+    """send count requests of the configured action (or the --scenario)
+    waiting for the responses. The progress is reported every
+    --report-interval seconds and the results are written to the --results
+    json file"""
+    import asyncio
+    stats, elapsed, pacer = asyncio.run(run_requests(config, options))
+    results = stats.to_dict()
+    results["elapsed"] = elapsed
+    results["rate"] = stats.sent / elapsed if elapsed else 0.0
+    results["avp_cache"] = libradi.radius.AVP_CACHE.stats()
+    if pacer:
+        results["target_rate"] = pacer.report()[3]
+        results["rate_profile"] = str(pacer.profile)
+
+    print(f"Sent {stats.sent} requests in {elapsed:.3f}s "
+          f"({results['rate']:.1f} pps): acked {stats.acked}, "
+          f"timeouts {stats.timeouts}, retransmits {stats.retransmits}, "
+          f"invalid {stats.invalid}")
+    print(f"Latency: {format_latencies(stats.histogram)} "
+          f"max {stats.histogram.summary()['max'] * 1000:.3f}ms")
+    if "results" in options:
+        import json
+        with open(options["results"], "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        debug(f"Results written to {options['results']}")
+
+
+async def run_conversations(config, options):
+    """run count EAP-MD5 conversations (see authenticate)"""
+    import asyncio
+    import collections
+    import time
+    count = int(options.get("count", 1))
+    password = options.get("eap_password", "password")
+    if "servers" in options and any(
+            secret != config.radius_secret for dest, secret, weight in
+            parse_servers(options["servers"], config.radius_port,
+                          config.radius_secret)):
+        # the Message-Authenticator of the responses is checked with it
+        raise ValueError("the EAP conversations do not support "
+                         "the per-server secrets")
+    client = await open_transport(config, options)
+    slots = asyncio.Semaphore(int(options.get("concurrency", 256)))
+    results = collections.Counter()
+
+    async def conversation():
+        try:
+            results[await libradi.eap.EapConversation(
+                client, config.username, password).run()] += 1
+        finally:
+            slots.release()
+
+    started = time.perf_counter()
+    tasks = set()
+    try:
+        for n in range(count):
+            await slots.acquire()
+            task = asyncio.ensure_future(conversation())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        client.close()
+    report_servers(client)
+    return client.stats, results, time.perf_counter() - started
+
+
+def authenticate(config, options):
+    """run --count EAP-MD5 conversations of the configured user reporting
+    the accepted and rejected ones and the round trip latencies"""
+    import asyncio
+    stats, results, elapsed = asyncio.run(run_conversations(config, options))
+    stats.flush()
+    accepted = results[libradi.eap.ACCESS_ACCEPT]
+    rejected = results[libradi.eap.ACCESS_REJECT]
+    print(f"Ran {sum(results.values())} EAP conversations in {elapsed:.3f}s: "
+          f"accepted {accepted}, rejected {rejected}, "
+          f"failed {sum(results.values()) - accepted - rejected}, "
+          f"timeouts {stats.timeouts}, retransmits {stats.retransmits}")
+    print(f"Latency: {format_latencies(stats.histogram)} "
+          f"max {stats.histogram.summary()['max'] * 1000:.3f}ms")
+
+
+def parse_storm(storm):
+    """return (NAS, sessions per NAS) of NASxSESSIONS"""
+    nas, sep, sessions = storm.partition("x")
+    try:
+        return int(nas), int(sessions or 0)
+    except ValueError:
+        raise ValueError(f"invalid storm: {storm} (expected NASxSESSIONS)")
 
 
-def restart_session(config):
+async def run_storm(config, options):
+    """send the NAS reboot storm (see storm_nas)"""
+    import asyncio
+    import time
+    nas_count, sessions = parse_storm(options["storm"])
+    nas_storm = libradi.storm.Storm(
+        nas_count, sessions, options.get("reconnect", "uniform:10"),
+        float(options.get("down_time", 1)), mcc=config.imsi[:3],
+        mnc=config.imsi[3:5], avps=config.avps)
+    client = await open_transport(config, options)
+    reporter = asyncio.ensure_future(
+        report_progress(client.stats,
+                        float(options.get("report_interval", 1))))
+    started = time.perf_counter()
+    try:
+        phases, lag = await nas_storm.run(
+            client, int(options.get("concurrency", 256)))
+    finally:
+        reporter.cancel()
+        client.close()
+    report_servers(client)
+    return nas_storm, phases, lag, time.perf_counter() - started
+
+
+def storm_nas(config, options):
+    """simulate --storm NASxSESSIONS rebooting NAS - every NAS sends an
+    Accounting-Off and an Accounting-On (after --down-time) and the Starts
+    of its sessions reconnecting by the --reconnect distribution. The
+    collector latency and loss is reported by the phase"""
+    import asyncio
+    nas_storm, phases, lag, elapsed = asyncio.run(run_storm(config,
+                                                            options))
+    sent = sum(phase.sent for phase in phases)
+    print(f"Storm of {nas_storm.nas_count} NAS x {nas_storm.sessions} "
+          f"sessions ({nas_storm.reconnect}): sent {sent} requests in "
+          f"{elapsed:.3f}s ({sent / elapsed:.1f} pps), "
+          f"max lag {lag:.3f}s")
+    for phase in phases:
+        print(f"{phase.name}: sent {phase.sent}, acked {phase.acked}, "
+              f"lost {phase.lost}, {format_latencies(phase.histogram)}")
+    if "results" in options:
+        import json
+        results = {phase.name: phase.to_dict() for phase in phases}
+        results.update(elapsed=elapsed, lag=lag)
+        with open(options["results"], "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        debug(f"Results written to {options['results']}")
+
+
+def parse_address(address):
+    """return (host, port) of [HOST:]PORT (all interfaces by default)"""
+    host, sep, port = address.rpartition(":")
+    return host.strip("[]") or "0.0.0.0", int(port)
+
+
+def run_authentication_server(config, options):
+    """run the local EAP-MD5 authentication server (--auth-server
+    [HOST:]PORT) accepting any user with the --eap-password"""
+    import functools
+    host, port = parse_address(options["auth_server"])
+    protocol = functools.partial(libradi.server.EapServer,
+                                 password=options.get("eap_password",
+                                                      "password"))
+    kwargs = start_options(options)
+    print(f"Authentication server listening on {host}:{port}")
+    try:
+        libradi.server.serve((host, port), config.radius_secret, protocol,
+                             **kwargs)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_proxy(config, options):
+    """run the accounting proxy (--proxy [HOST:]PORT) forwarding the
+    requests signed with the configured secret to the --servers"""
+    import asyncio
+    if "servers" not in options:
+        raise ValueError("the proxy requires --servers")
+    host, port = parse_address(options["proxy"])
+    servers = parse_servers(options["servers"], config.radius_port,
+                            config.radius_secret)
+    rules = libradi.proxy.AvpRules(
+        [libradi.RadiusAvp(name, value)
+         for name, value in options.get("proxy_set", [])],
+        options.get("proxy_drop", []))
+    opener, kwargs = transport_opener(options)
+
+    async def run():
+        await libradi.proxy.start_proxy(
+            (host, port), config.radius_secret, servers, rules,
+            options.get("balance", "round-robin"), opener, **kwargs)
+        await asyncio.Event().wait()
+
+    print(f"Proxy listening on {host}:{port}")
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_accounting_server(config, options):
+    """run the local accounting server (--acct-server [HOST:]PORT)
+    answering the requests signed with the configured secret"""
+    host, port = parse_address(options["acct_server"])
+    kwargs = start_options(options)
+    print(f"Accounting server listening on {host}:{port}")
+    try:
+        libradi.server.serve((host, port), config.radius_secret,
+                             **kwargs)
+    except KeyboardInterrupt:
+        pass
+
+
+def replay_capture(config, options):
+    """resend the radius requests found in a pcap/pcapng capture"""
+    pid = options.get("replay_pid")
+    if pid is not None:
+        pid = int(pid, 0) & 0xff
+    secret = None
+    if options["resign"] or pid is not None or options["avps"]:
+        secret = config.radius_secret  # re-signing is required
+    avps = [libradi.RadiusAvp(name, value) for name, value in options["avps"]]
+    rewriter = libradi.replay.PacketRewriter(secret, pid, avps)
+    pacer = create_pacer(options)
+
+    with libradi.pcap.PcapReader(options["replay"]) as packets:
+        sent, skipped = libradi.replay.replay(
+            packets, (config.radius_dest, config.radius_port), rewriter,
+            float(options.get("replay_speed", 1)), pacer)
+    debug(f"Replayed {sent} requests ({skipped} packets skipped)")
+    if pacer:
+        report_pacing(pacer)
+
+
+def analyze_capture(options):
+    """print the attribute statistics of a pcap/pcapng capture"""
+    attributes = options.get("analyze_attrs",
+                             libradi.analysis.DEFAULT_ATTRIBUTES)
+    pool_prefix = int(options.get("pool_prefix", 24))
+    stats, attributes = libradi.analysis.analyze(options["analyze"],
+                                                 attributes,
+                                                 int(options.get("jobs", 1)))
+    tables = libradi.analysis.summarize(stats, attributes, pool_prefix)
+    print(libradi.analysis.format_tables(tables))
+
+
+def restart_session(config, sock=None):
     """restart session
     1. stop the current session
     2. wait for <delay>
     3. start the new session with the given config
     """
     import time
-    change_session(config, STOP)
+    change_session(config, STOP, sock)
     time.sleep(float(config.delay))
-    change_session(config, START)
+    change_session(config, START, sock)
+
+
+def serve(config, path):
+    """run the radi daemon - execute the radi.py command lines received
+    over the unix socket keeping the dictionary, the profiles and the
+    sockets warm between the commands"""
+    import copy
+    store = libradi.profiles.CachedProfileStore(PROFILES_FILE_NAME)
+    sockets = {}
+
+    def handle(argv):
+        args = parse_args(argv)
+        for name in SERVER_OPTIONS:  # would block the daemon forever
+            if name in args:
+                option = name.replace("_", "-")
+                raise ValueError(f"--{option} is not supported by the daemon")
+        if "journal" in args:  # a new one would truncate the file
+            raise ValueError("--journal is not supported by the daemon")
+        dest = args.get("radius_dest", config.radius_dest)
+        family = is_ipv6(dest)
+        if family not in sockets:
+            sockets[family] = libradi.create_socket(dest)
+        execute(copy.copy(config), args, store, sockets[family])
+
+    server = libradi.daemon.CommandServer(path, handle)
+    print(f"radi daemon listening on {path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        for sock in sockets.values():
+            sock.close()
 
 
 def usage():
@@ -141,11 +727,13 @@ def usage():
           " [-S | -T | -R]\n"
           "               [-i SUBS_ID] [-t {{imsi,imei}}] [-f FRAMED_IP]"
           " [-c CALLING_ID]\n"
-          "               [-C CALLED_ID] [-D DELAY] [-L] [-v]\n\n"
+          "               [-C CALLED_ID] [-D DELAY] [-L] [-v]"
+          " [--profile NAME]\n\n"
           "optional arguments:\n"
           "  -h, --help            show this help message and exit\n"
           "  -d RADIUS_DEST, --destination RADIUS_DEST\n"
           "                        ip of radius endpoint\n"
+          "  --port RADIUS_PORT    port of radius endpoint (default 1813)\n"
           "  -p RADIUS_SECRET, --secret RADIUS_SECRET\n"
           "                        radius secret\n"
           "  -S, --start           start session\n"
@@ -166,10 +754,104 @@ def usage():
           "  -D, --delay DELAY     the delay between stopping and starting\n"
           "                        the session in the restart mode "
           "(-R/--restart)\n"
-          "  -L, --clean           clean the cached configuration\n"
+          "  -L, --clean           clean the cached configuration of the\n"
+          "                        profile\n"
+          "  --profile NAME        name of the cached configuration profile\n"
+          "                        (default: default)\n"
+          "  --list-profiles       list the cached configuration profiles\n"
           "  -P, --path <path to dictionary>\n"
           "                        path to the dictionary files\n"
-          "  -v, --verbose         enable verbose output\n\n"
+          "  -v, --verbose         enable verbose output\n"
+          "  --daemon SOCKET       run as a daemon executing the commands\n"
+          "                        received over the unix socket\n"
+          "  --client SOCKET ...   send the rest of the arguments to the\n"
+          "                        daemon (MUST be the first argument).\n"
+          "                        With no other arguments the commands\n"
+          "                        are read from stdin (one per line)\n"
+          "  --replay CAPTURE      resend the requests from a pcap/pcapng\n"
+          "                        capture file (-a replaces the AVPs)\n"
+          "  --speed SPEED         replay speed multiplier (0 - as fast\n"
+          "                        as possible, default 1)\n"
+          "  --replay-id ID        renumber the replayed requests starting\n"
+          "                        with ID\n"
+          "  --count COUNT         send COUNT requests of the action\n"
+          "  --rate PROFILE        send rate of --count/--replay in packets\n"
+          "                        per second: RATE, a ramp START-END/SECS\n"
+          "                        or steps RATExSECS,RATExSECS,...\n"
+          "  --pacing MODE         constant, poisson or bucket[:BURST]\n"
+          "                        (default constant)\n"
+          "  --wait                wait for the responses of --count\n"
+          "                        requests reporting the throughput and\n"
+          "                        the latencies\n"
+          "  --timeout SECS        response timeout (default 3)\n"
+          "  --retries N           retransmissions on timeout (default 2)\n"
+          "  --concurrency N       outstanding requests (default 256)\n"
+          "  --report-interval SECS\n"
+          "                        live report interval (default 1)\n"
+          "  --results FILE        write the --wait results as json\n"
+          "  --scenario FILE       send the --count/--wait requests of the\n"
+          "                        json traffic scenario (the message mix,\n"
+          "                        the avp values and the session\n"
+          "                        lifecycles - see libradi/scenario.py)\n"
+          "  --write FILE          write the --count requests to a pcap\n"
+          "                        capture (*.pcap) or a spool file\n"
+          "  --blast SPOOL         send the pre-generated spool as fast as\n"
+          "                        possible (or at the constant --rate)\n"
+          "  --pipeline N          sign the --count requests in N threads\n"
+          "                        while another one sends them (0 - one\n"
+          "                        per CPU on the free-threaded builds)\n"
+          "  --journal FILE        keep the last packets sent and received\n"
+          "                        (16MB ring buffer - see --dump-journal)\n"
+          "  --dump-journal FILE   print the packets of the journal\n"
+          "  --transport TRANSPORT udp, tcp or tls (RadSec) transport of\n"
+          "                        --wait/--eap and of the local servers\n"
+          "                        (default udp)\n"
+          "  --connections N       tcp/tls connections (default 1)\n"
+          "  --tls-ca FILE         CA certificates verifying the peer\n"
+          "                        (not verified by the tls clients\n"
+          "                        without it)\n"
+          "  --tls-cert FILE       certificate (required by the tls\n"
+          "                        servers)\n"
+          "  --tls-key FILE        private key of the certificate\n"
+          "  --servers HOST[:PORT][*WEIGHT][@SECRET],...\n"
+          "                        spread --wait/--eap over the servers\n"
+          "                        failing over the unresponsive ones\n"
+          "  --balance STRATEGY    round-robin, weighted or hash (by the\n"
+          "                        session) (default round-robin)\n"
+          "  --proxy [HOST:]PORT   run an accounting proxy forwarding the\n"
+          "                        requests to the --servers (the server\n"
+          "                        secrets can be given as HOST@SECRET)\n"
+          "  --proxy-set NAME=VALUE\n"
+          "                        replace (or add) the avp in the proxied\n"
+          "                        requests (can be repeated)\n"
+          "  --proxy-drop NAME     remove the avp from the proxied requests\n"
+          "                        (can be repeated)\n"
+          "  --acct-server [HOST:]PORT\n"
+          "                        run a local accounting server\n"
+          "  --auth-server [HOST:]PORT\n"
+          "                        run a local EAP-MD5 authentication\n"
+          "                        server\n"
+          "  --eap                 run --count EAP-MD5 conversations of\n"
+          "                        the user (use --port 1812)\n"
+          "  --eap-password PASSWORD\n"
+          "                        EAP-MD5 password (default password)\n"
+          "  --storm NASxSESSIONS  simulate the NAS rebooting at once:\n"
+          "                        Accounting-Off, Accounting-On and the\n"
+          "                        Starts of the reconnecting sessions\n"
+          "                        reporting the latency and the loss\n"
+          "  --reconnect DIST      reconnect delays of the --storm\n"
+          "                        sessions: constant:SECS, uniform:SECS\n"
+          "                        or exponential:MEAN (default\n"
+          "                        uniform:10)\n"
+          "  --down-time SECS      between the Accounting-Off and On\n"
+          "                        (default 1)\n"
+          "  --analyze CAPTURE     print the attribute statistics of a\n"
+          "                        pcap/pcapng capture\n"
+          "  --analyze-attr NAME   attribute to analyze (can be repeated\n"
+          "                        multiple times)\n"
+          "  --jobs JOBS           number of the analysis processes\n"
+          "  --pool-prefix BITS    prefix length the framed IPs are\n"
+          "                        grouped into pools by (default 24)\n\n"
           "Accepted types: {}\n\n"
           "PLEASE NOTE:\n"
           " - If action is specified multiple times, the last one\n"
@@ -182,7 +864,56 @@ def usage():
           "   <type>/<value>\n"
           "   type - (1 byte - dec or hex)\n"
           "   value - any number of bytes - dec or hex value\n\n".format(
-              __version__, ",".join(libradi.radtypes.get_supported_types())))
+              __version__, ",".join(SUPPORTED_TYPES)))
+
+
+class GetoptError(ValueError):
+    """invalid command line option"""
+
+
+def getopt(args, shortopts, longopts):
+    """getopt.getopt() compatible command line parser. The getopt module
+    is not used since it imports gettext which takes a considerable part
+    of the radi.py start up time"""
+    opts, args = [], list(args)
+    while args and args[0].startswith("-") and args[0] != "-":
+        arg = args.pop(0)
+        if arg == "--":
+            break
+        if arg.startswith("--"):
+            name, has_value, value = arg[2:].partition("=")
+            matches = [opt for opt in longopts if opt.rstrip("=") == name]
+            if not matches:
+                matches = [opt for opt in longopts if opt.startswith(name)]
+            if len(matches) != 1:
+                reason = "not a unique prefix" if matches else "not recognized"
+                raise GetoptError(f"option --{name} {reason}")
+            if matches[0].endswith("="):
+                if not has_value:
+                    if not args:
+                        raise GetoptError(f"option --{name} requires argument")
+                    value = args.pop(0)
+            elif has_value:
+                raise GetoptError(f"option --{name} must not have an argument")
+            opts.append(("--" + matches[0].rstrip("="), value))
+            continue
+
+        shorts = arg[1:]
+        while shorts:
+            opt, shorts = shorts[0], shorts[1:]
+            index = shortopts.find(opt)
+            if opt == ":" or index < 0:
+                raise GetoptError(f"option -{opt} not recognized")
+            if shortopts.startswith(":", index + 1):
+                if not shorts:
+                    if not args:
+                        raise GetoptError(f"option -{opt} requires argument")
+                    shorts = args.pop(0)
+                opts.append(("-" + opt, shorts))
+                shorts = ""
+            else:
+                opts.append(("-" + opt, ""))
+    return opts, args
 
 
 def parse_avp(value):
@@ -195,30 +926,35 @@ def parse_avp(value):
     return (name, value)
 
 
-def parse_args():
-    """parse CLI arguments"""
+def parse_args(argv):
+    """parse CLI arguments (raises GetoptError)"""
     global __verbose__
+    __verbose__ = False
     config = dict()
-    config["name"] = sys.argv.pop(0)
-    try:
-        opt_list, arg_list = getopt.getopt(
-            sys.argv, "hd:u:p:STIRi:t:f:c:C:a:D:LP:v", [
-                "help", "destination=", "user=", "secret=", "start", "stop",
-                "interim", "restart", "imsi=", "imei=", "framed-ip=",
-                "calling-id=", "called_id=", "avp=", "delay=", "clean",
-                "path=", "verbose"
-            ])
-    except getopt.GetoptError as err:
-        usage()
-        print(f"\n{str(err)}")
-        sys.exit(2)
+    opt_list, arg_list = getopt(
+        argv, "hd:u:p:STIRi:t:f:c:C:a:D:LP:v", [
+            "help", "destination=", "port=", "user=", "secret=", "start",
+            "stop", "interim", "restart", "imsi=", "imei=", "framed-ip=",
+            "calling-id=", "called_id=", "avp=", "delay=", "clean", "path=",
+            "verbose", "replay=", "speed=", "replay-id=", "analyze=",
+            "analyze-attr=", "jobs=", "pool-prefix=", "profile=",
+            "list-profiles", "daemon=", "count=", "rate=", "pacing=",
+            "wait", "timeout=", "retries=", "concurrency=",
+            "report-interval=", "results=", "acct-server=",
+            "auth-server=", "eap", "eap-password=", "transport=",
+            "connections=", "tls-ca=", "tls-cert=", "tls-key=",
+            "servers=", "balance=", "proxy=", "proxy-set=", "proxy-drop=",
+            "scenario=", "storm=", "reconnect=", "down-time=", "write=",
+            "blast=", "pipeline=", "journal=", "dump-journal="
+        ])
 
     for opt, value in opt_list:
         if opt in ("-h", "--help"):
-            usage()
-            sys.exit(0)
+            config["help"] = True
         elif opt in ("-d", "--destination"):
             config["radius_dest"] = value
+        elif opt == "--port":
+            config["radius_port"] = int(value)
         elif opt in ("-u", "--username"):
             config["username"] = value
         elif opt in ("-p", "--secret"):
@@ -255,6 +991,90 @@ def parse_args():
             config["dict_path"] = value
         elif opt in ("-v", "--verbose"):
             __verbose__ = True
+        elif opt == "--replay":
+            config["replay"] = value
+        elif opt == "--speed":
+            config["replay_speed"] = value
+        elif opt == "--replay-id":
+            config["replay_pid"] = value
+        elif opt == "--analyze":
+            config["analyze"] = value
+        elif opt == "--analyze-attr":
+            config.setdefault("analyze_attrs", []).append(value)
+        elif opt == "--jobs":
+            config["jobs"] = value
+        elif opt == "--pool-prefix":
+            config["pool_prefix"] = value
+        elif opt == "--profile":
+            config["profile"] = value
+        elif opt == "--list-profiles":
+            config["list_profiles"] = True
+        elif opt == "--daemon":
+            config["daemon"] = value
+        elif opt == "--count":
+            config["count"] = value
+        elif opt == "--rate":
+            config["rate"] = value
+        elif opt == "--pacing":
+            config["pacing"] = value
+        elif opt == "--wait":
+            config["wait"] = True
+        elif opt == "--timeout":
+            config["timeout"] = value
+        elif opt == "--retries":
+            config["retries"] = value
+        elif opt == "--concurrency":
+            config["concurrency"] = value
+        elif opt == "--report-interval":
+            config["report_interval"] = value
+        elif opt == "--results":
+            config["results"] = value
+        elif opt == "--acct-server":
+            config["acct_server"] = value
+        elif opt == "--auth-server":
+            config["auth_server"] = value
+        elif opt == "--eap":
+            config["eap"] = True
+        elif opt == "--eap-password":
+            config["eap_password"] = value
+        elif opt == "--transport":
+            config["transport"] = value
+        elif opt == "--connections":
+            config["connections"] = value
+        elif opt == "--tls-ca":
+            config["tls_ca"] = value
+        elif opt == "--tls-cert":
+            config["tls_cert"] = value
+        elif opt == "--tls-key":
+            config["tls_key"] = value
+        elif opt == "--servers":
+            config["servers"] = value
+        elif opt == "--balance":
+            config["balance"] = value
+        elif opt == "--proxy":
+            config["proxy"] = value
+        elif opt == "--proxy-set":
+            config.setdefault("proxy_set", []).append(parse_avp(value))
+        elif opt == "--proxy-drop":
+            config.setdefault("proxy_drop", []).append(value)
+        elif opt == "--scenario":
+            config["scenario"] = value
+        elif opt == "--storm":
+            config["storm"] = value
+        elif opt == "--reconnect":
+            config["reconnect"] = value
+        elif opt == "--down-time":
+            config["down_time"] = value
+        elif opt == "--write":
+            config["write"] = value
+        elif opt == "--blast":
+            config["blast"] = value
+        elif opt == "--pipeline":
+            config["pipeline"] = value
+        elif opt == "--journal":
+            config["journal"] = value
+        elif opt == "--dump-journal":
+            config["dump_journal"] = value
 
     return config
 
@@ -266,39 +1086,119 @@ def debug(message, force=False):
         print(message)
 
 
-def main(config):
-    # reading the event arguments
-    args = parse_args()
+def execute(config, args, store, sock=None):
+    """execute the command - config is updated with the cached profile and
+    the parsed CLI arguments (args)"""
+    options = {
+        name: args.pop(name)
+        for name in TRANSIENT_OPTIONS if name in args
+    }
+    if "help" in options:
+        usage()
+        return
+    if "replay" in options:  # the AVPs replace the ones in the capture
+        options["avps"] = args.pop("avps", [])
+        options["resign"] = "radius_secret" in args
 
-    # try loading the pickled configuration
-    if "cleancache" not in args:
-        try:
-            with open(PICKLED_FILE_NAME, "rb") as f:
-                cache = pickle.load(f)
-            if "verbose" in args:
-                debug("Cache found. Loading...", force=True)
-            config.update(cache.__dict__)
-        except IOError:
-            cache = None
+    # loading the cached configuration profile
+    if "list_profiles" in options:
+        print("\n".join(store.get_names()))
+        return
 
-    config.update(args)  # merging configuration
-    action_strings = ["Restarting", "Starting", "Stoping", "Updating"]
+    profile = options.get("profile", DEFAULT_PROFILE)
+    cache = None
+    if "cleancache" in options:
+        store.delete(profile)
+    else:
+        cache = store.load(profile)
+        if cache:
+            debug(f"Cached profile {profile} found. Loading...")
+            config.load_profile(cache)
 
-    debug("%s the session" % action_strings[config.action])
+    config.update(args)  # merging configuration
     libradi.dictionary.initialize(config.dict_path, config.dict_fname)
 
-    if config.action == RESTART:
-        restart_session(config)
-    else:
-        change_session(config, config.action)
+    if "dump_journal" in options:
+        libradi.journal.dump(options["dump_journal"],
+                             libradi.dictionary.get_dictionary())
+        return
+    if "journal" in options:  # the packets of the run (see libradi.journal)
+        options["journal"] = libradi.journal.Journal(options["journal"])
+    try:
+        if "daemon" in options:
+            serve(config, options["daemon"])
+            return
+        if "replay" in options:
+            replay_capture(config, options)
+            return
+        if "analyze" in options:
+            analyze_capture(options)
+            return
+        if "acct_server" in options:
+            run_accounting_server(config, options)
+            return
+        if "proxy" in options:
+            run_proxy(config, options)
+            return
+        if "auth_server" in options:
+            run_authentication_server(config, options)
+            return
+        if "eap" in options:
+            authenticate(config, options)
+            return
+        if "storm" in options:
+            storm_nas(config, options)
+            return
+        if "write" in options:
+            write_requests(config, options)
+            return
+        if "blast" in options:
+            blast_spool(config, options)
+            return
+
+        action_strings = ["Restarting", "Starting", "Stoping", "Updating"]
+        debug("%s the session" % action_strings[config.action])
+
+        if "wait" in options:
+            send_requests(config, options)
+        elif "count" in options or "rate" in options or "scenario" in options:
+            send_bulk(config, options, sock)
+        elif config.action == RESTART:
+            restart_session(config, sock)
+        else:
+            change_session(config, config.action, sock)
 
-    # pickling the current configuration for future reuse
-    debug("Caching the current config for future use")
-    with open(PICKLED_FILE_NAME, "wb") as f:
-        pickle.dump(config, f)
+        # caching the current configuration for future reuse
+        record = config.to_profile()
+        if record != cache:
+            debug(f"Caching the current config as profile {profile}")
+            store.save(profile, record)
+    finally:
+        if "journal" in options:
+            options["journal"].close()
+
+
+def main(config):
+    # reading the event arguments
+    try:
+        args = parse_args(sys.argv[1:])
+    except GetoptError as err:
+        usage()
+        print(f"\n{str(err)}")
+        sys.exit(2)
+
+    if "help" in args:  # before the profiles (json) are imported
+        usage()
+        return
+    store = libradi.profiles.ProfileStore(PROFILES_FILE_NAME)
+    execute(config, args, store)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--client":
+        # the thin client does not need anything but the socket
+        sys.exit(libradi.daemon.run_client(sys.argv[2], sys.argv[3:]))
+
     config = Config()
 
     try:
@@ -307,6 +1207,6 @@ if __name__ == "__main__":
         print("Interrupted... Exiting")
         sys.exit(1)
     except (ValueError, IOError) as e:
-        print(f"ERROR: {e.message}")
+        print(f"ERROR: {e}")
     except (NotImplementedError) as e:
-        print(f"Not Implemented: {e.message}")
+        print(f"Not Implemented: {e}")
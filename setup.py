@@ -32,6 +32,15 @@ def main():
           scripts=["radi.py"],
           py_modules=[
               "libradi.dictionary", "libradi.radius", "libradi.radtypes",
+              "libradi.decoder", "libradi.pcap", "libradi.replay",
+              "libradi.analysis", "libradi.profiles", "libradi.daemon",
+              "libradi.pacing", "libradi.histogram", "libradi.client",
+              "libradi.server", "libradi.flatdict", "libradi.eap",
+              "libradi.stream", "libradi.balancer",
+              "libradi.proxy", "libradi.identities",
+              "libradi.scenario", "libradi.storm",
+              "libradi.spool", "libradi.pipeline",
+              "libradi.usage", "libradi.journal",
               "libradi.config"
           ],
           data_files=[("share/libradi/dict", glob.glob("dict/dictionary*"))])
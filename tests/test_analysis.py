@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#
+# test_analysis.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import os
+import tempfile
+import unittest
+
+from test_pcap import udp_frame, write_pcap
+
+
+def make_request(status, framed_ip):
+    rad = libradi.RadiusMessage("secret")
+    rad.add_avp(libradi.RadiusAvp("user-name", "johndoe"))
+    rad.add_avp(libradi.RadiusAvp("acct-status-type", status))
+    rad.add_avp(libradi.RadiusAvp("framed-ip-address", framed_ip))
+    rad.add_avp(libradi.RadiusAvp("3gpp-location-info", "0x0162021000010002"))
+    return rad.dump()
+
+
+class DecoderTest(unittest.TestCase):
+
+    def test_iter_attributes(self):
+        packet = make_request(1, "10.0.0.1")
+        attributes = [(vendor_id, attr_id, bytes(value))
+                      for vendor_id, attr_id, value in
+                      libradi.decoder.iter_attributes(memoryview(packet))]
+        self.assertEqual([(0, 1, b"johndoe"), (0, 40, b"\x00\x00\x00\x01"),
+                          (0, 8, b"\x0a\x00\x00\x01"),
+                          (10415, 22, bytes.fromhex("0162021000010002"))],
+                         attributes)
+
+    def test_decode_value(self):
+        attr = libradi.dictionary.get_attribute_by_id(40)
+        self.assertEqual("Acct-Status-Type", attr.attr_name)
+        value = libradi.decoder.decode_value(attr, b"\x00\x00\x00\x03")
+        self.assertEqual(3, value.value)
+        self.assertEqual("Alive", attr.get_value_name(value))
+
+        attr = libradi.dictionary.get_attribute_by_id(1, 10415)
+        self.assertEqual("3GPP-IMSI", attr.attr_name)
+
+    def test_decode_value_fallback(self):
+        # a wrong length and a type radtypes does not implement (ifid)
+        for attr_id, data in ((5, b"\x01\x02\x03"), (4, b"\x01\x02\x03"),
+                              (96, b"\x00\x00\x00\x00\x00\x00\x00\x01")):
+            attr = libradi.dictionary.get_attribute_by_id(attr_id)
+            value = libradi.decoder.decode_value(attr, data)
+            self.assertIsInstance(value, libradi.radtypes.OctetsType)
+            self.assertEqual(f"0x{data.hex()}", str(value))
+
+    def test_malformed(self):
+        packet = bytearray(make_request(1, "10.0.0.1"))
+        packet[21] = 0xff  # User-Name length is past the end of the packet
+        with self.assertRaises(ValueError):
+            list(libradi.decoder.iter_attributes(packet))
+
+
+class AnalysisTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix=".pcap")
+        os.close(fd)
+        frames = []
+        for n in range(40):
+            status = (1, 3, 3, 2)[n % 4]
+            packet = make_request(status, f"10.0.{n % 2}.{n}")
+            frames.append((n, udp_frame(packet)))
+        frames.append((41, udp_frame(b"\x04\x01\x00\x14")))  # malformed
+        write_pcap(self.filename, frames)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def check_stats(self, stats, attributes):
+        self.assertEqual(40, stats.packets)
+        self.assertEqual(1, stats.malformed)
+        tables = dict(
+            (title, dict(rows)) for title, total, rows in
+            libradi.analysis.summarize(stats, attributes))
+        self.assertEqual({"Accounting-Request": 40, "Malformed": 1},
+                         tables["Packets"])
+        self.assertEqual({"Start": 10, "Stop": 10, "Alive": 20},
+                         tables["Acct-Status-Type"])
+        self.assertEqual({"10.0.0.0/24": 20, "10.0.1.0/24": 20},
+                         tables["Framed-IP-Address"])
+        self.assertEqual({"SAI 262-010": 40}, tables["3GPP-Location-Info"])
+
+    def test_analyze(self):
+        self.check_stats(*libradi.analysis.analyze(self.filename))
+
+    def test_analyze_multiprocess(self):
+        self.check_stats(*libradi.analysis.analyze(self.filename, jobs=3))
+
+    def test_format_tables(self):
+        stats, attributes = libradi.analysis.analyze(self.filename)
+        text = libradi.analysis.format_tables(
+            libradi.analysis.summarize(stats, attributes))
+        self.assertIn("Acct-Status-Type (40)", text)
+        self.assertIn("Alive", text)
@@ -5,6 +5,8 @@
 #
 
 import libradi
+import os
+import tempfile
 import unittest
 
 
@@ -108,3 +110,209 @@ class AVPTest(unittest.TestCase):
                    "Value:10415\n `- AVP: Type:3GPP-IMSI(string) "
                    "Length:11 Value:123456789")
         self.assertEqual(exp_str, str(avp))
+
+    def test_tlv_members(self):
+        avp = libradi.RadiusAvp("DHCP-Relay-Agent-Information", [
+            ("DHCP-Agent-Circuit-Id", "0x0102"),
+            ("DHCP-Agent-Remote-Id", b"remote"),
+            ("DHCP-Relay-Agent-Flags", 1)])
+        self.assertEqual(bytes.fromhex("1a18000000360052") +
+                         bytes.fromhex("1201040102020872656d6f74650a0301"),
+                         avp.dump())
+        self.assertEqual(len(avp.dump()), len(avp))
+        self.assertEqual("1/0x0102,2/0x72656d6f7465,10/1",
+                         str(avp.avp_subavp[0].avp_value))
+        with self.assertRaises(ValueError):
+            libradi.RadiusAvp("DHCP-Relay-Agent-Information",
+                              {"User-Name": "johndoe"})
+
+    def test_tlv_member(self):
+        avp = libradi.RadiusAvp("DHCP-Agent-Circuit-Id", "0x0102")
+        self.assertEqual(bytes.fromhex("1a0d000000360052070104") + b"\x01\x02",
+                         avp.dump())
+
+    def test_large_octets(self):
+        data = bytes(range(256)) * 16
+        avp = libradi.RadiusAvp("EAP-Message", data)
+        binary = avp.dump()
+        self.assertEqual(len(avp), len(binary))
+        self.assertEqual(17, binary.count(b"\x4f\xff") + 1)
+        self.assertEqual(data, b"".join(
+            bytes(value) for vendor_id, attr_id, value in
+            libradi.decoder.iter_attributes(bytes(20) + binary,
+                                            20 + len(binary))))
+
+
+class ExtendedAvpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmpdir.name, "dictionary"), "w") as f:
+            f.write(f"$INCLUDE {os.path.abspath('dict/dictionary')}\n"
+                    "ATTRIBUTE Test-Long 245.1 octets\n"
+                    "VENDOR Acme 9999\n"
+                    "BEGIN-VENDOR Acme format=Extended-Vendor-Specific-5\n"
+                    "ATTRIBUTE Acme-Data 1 octets\n"
+                    "END-VENDOR Acme\n"
+                    "VENDOR Cont 9998 format=1,1,c\n"
+                    "BEGIN-VENDOR Cont\n"
+                    "ATTRIBUTE Cont-Data 1 string\n"
+                    "END-VENDOR Cont\n"
+                    "VENDOR Plain 9997\n"
+                    "BEGIN-VENDOR Plain\n"
+                    "ATTRIBUTE Plain-Data 1 string concat\n"
+                    "END-VENDOR Plain\n")
+        self.previous = libradi.dictionary.get_dictionary()
+        libradi.dictionary.set_dictionary(libradi.dictionary.Dictionary(
+            self.tmpdir.name, "dictionary"))
+
+    def tearDown(self):
+        libradi.dictionary.set_dictionary(self.previous)
+        self.tmpdir.cleanup()
+
+    def fragments(self, binary):
+        """split the binary into the attributes"""
+        result = []
+        while binary:
+            result.append(binary[:binary[1]])
+            binary = binary[binary[1]:]
+        return result
+
+    def assertRoundTrip(self, avp, key, value):
+        rad = libradi.RadiusMessage("secret")
+        rad.add_avp(avp)
+        rad.add_avp(libradi.RadiusAvp("User-Name", "johndoe"))
+        packet = rad.dump()
+        self.assertEqual(len(rad), len(packet))
+        self.assertEqual([key + (value, ), (0, 1, b"johndoe")],
+                         [(vendor_id, attr_id, bytes(value))
+                          for vendor_id, attr_id, value in
+                          libradi.decoder.iter_attributes(packet)])
+
+    def test_long_string(self):
+        value = b"1" * 600
+        avp = libradi.RadiusAvp("PKM-SS-Cert", value)  # concat
+        binary = avp.dump()
+        self.assertEqual(len(avp), len(binary))
+        self.assertEqual([(137, 255), (137, 255), (137, 96)],
+                         [(attr[0], attr[1])
+                          for attr in self.fragments(binary)])
+        self.assertRoundTrip(avp, (0, 137), value)
+        with self.assertRaises(ValueError):
+            libradi.RadiusAvp("Calling-Station-Id", "1" * 600).dump()
+
+    def test_long_vsa(self):
+        avp = libradi.RadiusAvp("Plain-Data", "1" * 600)
+        binary = avp.dump()
+        self.assertEqual(len(avp), len(binary))
+        fragments = self.fragments(binary)
+        self.assertEqual([255, 255, 114], [attr[1] for attr in fragments])
+        for attr in fragments:
+            self.assertEqual(bytes((26, attr[1], 0, 0, 0x27, 0x0d, 1,
+                                    attr[1] - 6)), attr[:8])
+        self.assertRoundTrip(avp, (9997, 1), b"1" * 600)
+        with self.assertRaises(ValueError):
+            libradi.RadiusAvp("3GPP-IMSI", "1" * 600).dump()
+
+    def test_vendor_format(self):
+        avp = libradi.RadiusAvp("DHCP-Boot-File-Name", "boot")
+        self.assertEqual(bytes.fromhex("1a0d00000036004307") + b"boot",
+                         avp.dump())
+        self.assertEqual(len(avp), len(avp.dump()))
+        self.assertRoundTrip(avp, (54, 67), b"boot")
+
+    def test_continuation(self):
+        avp = libradi.RadiusAvp("Cont-Data", "x" * 300)
+        fragments = self.fragments(avp.dump())
+        self.assertEqual([(255, 249, 0x80), (63, 57, 0)],
+                         [(attr[1], attr[7], attr[8]) for attr in fragments])
+        self.assertRoundTrip(avp, (9998, 1), b"x" * 300)
+
+    def test_extended(self):
+        avp = libradi.RadiusAvp("Allowed-Called-Station-Id", "abc")
+        self.assertEqual(241, avp.avp_code.value)
+        self.assertEqual(b"\xf1\x06\x05abc", avp.dump())
+        self.assertEqual(6, len(avp))
+        self.assertRoundTrip(avp, (0, (241, 5)), b"abc")
+
+    def test_long_extended(self):
+        value = bytes(range(1, 201)) * 3
+        avp = libradi.RadiusAvp("Test-Long", "0x" + value.hex())
+        binary = avp.dump()
+        self.assertEqual(len(avp), len(binary))
+        self.assertEqual([(245, 255, 1, 0x80), (245, 255, 1, 0x80),
+                          (245, 102, 1, 0)],
+                         [tuple(attr[:4]) for attr in self.fragments(binary)])
+        self.assertRoundTrip(avp, (0, (245, 1)), value)
+
+    def test_extended_vendor_specific(self):
+        value = b"\x55" * 300
+        avp = libradi.RadiusAvp("Acme-Data", "0x" + value.hex())
+        fragments = self.fragments(avp.dump())
+        self.assertEqual([bytes.fromhex("f5ff1a800000270f01"),
+                          bytes.fromhex("f53f1a000000270f01")],
+                         [attr[:9] for attr in fragments])
+        self.assertRoundTrip(avp, (9999, 1), value)
+
+    def test_truncated_fragments(self):
+        avp = libradi.RadiusAvp("Test-Long", "0x" + "01" * 300)
+        rad = libradi.RadiusMessage("secret")
+        rad.add_avp(avp)
+        packet = bytearray(rad.dump())
+        packet[20 + 255 + 3] = 0x80  # the last fragment has M set
+        with self.assertRaises(ValueError):
+            list(libradi.decoder.iter_attributes(packet))
+
+
+class AvpCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = libradi.radius.AvpCache(max_size=2)
+
+    def test_interning(self):
+        avp = self.cache.get("Acct-Status-Type", 1)
+        self.assertIs(avp, self.cache.get("acct-status-type", 1))
+        self.assertEqual(libradi.RadiusAvp("Acct-Status-Type", 1).dump(),
+                         avp.dump())
+        self.assertIsNot(avp, self.cache.get("Acct-Status-Type", "1"))
+        self.assertEqual({"size": 2, "hits": 1, "misses": 2,
+                          "hit_rate": 1 / 3}, self.cache.stats())
+
+        rad = libradi.RadiusMessage("secret")
+        rad.add_avp(avp)
+        rad.add_avp(libradi.radius.intern_avp("User-Name", "alice"))
+        expected = libradi.RadiusMessage("secret")
+        expected.add_avp(libradi.RadiusAvp("Acct-Status-Type", 1))
+        expected.add_avp(libradi.RadiusAvp("User-Name", "alice"))
+        self.assertEqual(expected.dump(), rad.dump())
+
+    def test_lru(self):
+        first = self.cache.get("User-Name", "alice")
+        self.cache.get("User-Name", "bob")
+        self.cache.get("User-Name", "alice")  # bob is the least recent now
+        self.cache.get("User-Name", "carol")
+        self.assertIs(first, self.cache.get("User-Name", "alice"))
+        self.assertEqual(2, self.cache.stats()["size"])
+        self.cache.get("User-Name", "bob")
+        self.assertEqual(4, self.cache.misses)
+
+    def test_uncached(self):
+        value = bytearray(b"abc")  # not hashable
+        avp = self.cache.get("Class", value)
+        self.assertIsNot(avp, self.cache.get("Class", value))
+        self.assertEqual(libradi.RadiusAvp("Class", b"abc").dump(),
+                         avp.dump())
+        self.assertEqual((0, 2), (self.cache.stats()["size"],
+                                  self.cache.misses))
+        with self.assertRaises(ValueError):
+            libradi.radius.AvpCache(0)
+
+    def test_dictionary_change(self):
+        avp = self.cache.get("User-Name", "alice")
+        current = libradi.dictionary.get_dictionary()
+        libradi.dictionary.set_dictionary(
+            libradi.dictionary.Dictionary("dict", "dictionary"))
+        try:
+            self.assertIsNot(avp, self.cache.get("User-Name", "alice"))
+        finally:
+            libradi.dictionary.set_dictionary(current)
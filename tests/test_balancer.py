@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+#
+# test_balancer.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import asyncio
+import collections
+import unittest
+
+from libradi import balancer
+
+
+class FakeClient:
+    """answers after delay seconds (None - a timeout - if dead)"""
+
+    def __init__(self, name, delays=(0, ), dead=False):
+        self.name = name
+        self.delays = list(delays)
+        self.dead = dead
+        self.closed = False
+
+    async def request(self, message):
+        delay = self.delays.pop(0) if len(self.delays) > 1 else self.delays[0]
+        await asyncio.sleep(delay)
+        return None if self.dead else self.name
+
+    def close(self):
+        self.closed = True
+
+
+class BalancerTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+
+    def create_message(self, username="alice", secret="secret"):
+        message = libradi.RadiusMessage(secret)
+        message.add_avp(libradi.RadiusAvp("User-Name", username))
+        message.add_avp(libradi.RadiusAvp("Acct-Status-Type", 1))
+        return message
+
+    def create_pool(self, names, strategy="round-robin", weights=None,
+                    **kwargs):
+        weights = weights or [1] * len(names)
+        members = [balancer.Member((name, 1813), FakeClient(name), weight)
+                   for name, weight in zip(names, weights)]
+        return balancer.ServerPool(members, "secret", strategy, **kwargs)
+
+    def run_requests(self, pool, messages):
+        async def run():
+            return await asyncio.gather(
+                *[pool.request(message) for message in messages])
+        return asyncio.run(run())
+
+    def test_round_robin(self):
+        pool = self.create_pool(["a", "b", "c"])
+        responses = self.run_requests(pool, [self.create_message()] * 6)
+        self.assertEqual(["a", "b", "c"] * 2, responses)
+
+    def test_weighted(self):
+        pool = self.create_pool(["a", "b", "c"], "weighted", [5, 1, 1])
+        responses = self.run_requests(pool, [self.create_message()] * 7)
+        self.assertEqual(["a", "a", "b", "a", "c", "a", "a"], responses)
+        self.assertEqual({"a": 500, "b": 100, "c": 100}, collections.Counter(
+            self.run_requests(pool, [self.create_message()] * 700)))
+
+    def test_session_key(self):
+        self.assertEqual(b"alice", balancer.session_key(
+            self.create_message()))
+        message = self.create_message()
+        message.add_avp(libradi.RadiusAvp("Acct-Session-Id", "42"))
+        self.assertEqual(b"42", balancer.session_key(message))
+        self.assertEqual(b"", balancer.session_key(
+            libradi.RadiusMessage("secret")))
+
+    def test_consistent_hash(self):
+        messages = [self.create_message(f"user{n}") for n in range(1000)]
+        pool = self.create_pool(["a", "b", "c", "d"], "hash")
+        responses = self.run_requests(pool, messages)
+        self.assertEqual(responses, self.run_requests(pool, messages))
+        counts = collections.Counter(responses)
+        self.assertTrue(all(150 < counts[name] < 350 for name in "abcd"))
+
+        # only the sessions of the removed server move
+        pool = self.create_pool(["a", "b", "c"], "hash")
+        for before, after in zip(responses,
+                                 self.run_requests(pool, messages)):
+            if before != "d":
+                self.assertEqual(before, after)
+
+    def test_failover(self):
+        pool = self.create_pool(["a", "b"], max_failures=2)
+        pool.members[0].client.dead = True
+        responses = self.run_requests(pool, [self.create_message()] * 6)
+        self.assertEqual(["b"] * 6, responses)
+        self.assertFalse(pool.members[0].is_up(
+            balancer.time.monotonic()))
+        self.assertEqual(0, pool.members[1].failures)
+
+        # the down server is skipped - no more failovers
+        failovers = pool.failovers
+        self.assertEqual(["b"] * 4, self.run_requests(
+            pool, [self.create_message()] * 4))
+        self.assertEqual(failovers, pool.failovers)
+
+        pool.members[1].client.dead = True
+        self.assertEqual([None], self.run_requests(
+            pool, [self.create_message()]))
+
+    def test_migration(self):
+        pool = self.create_pool(["a", "b"], max_failures=1)
+        pool.members[0].client = FakeClient("a", (0.01, 30), dead=True)
+        responses = self.run_requests(pool, [self.create_message()] * 5)
+        self.assertEqual(["b"] * 5, responses)
+        self.assertEqual((3, 2), (pool.failovers, pool.migrated))
+        self.assertEqual(set(), pool.migrating)
+
+    def test_udp_servers(self):
+        async def run():
+            servers = [await libradi.server.start_server(("127.0.0.1", 0),
+                                                         secret)
+                       for secret in ("secret", "secret", "other")]
+            dests = [("127.0.0.1",
+                      server.transport.get_extra_info("sockname")[1])
+                     for server in servers]
+            pool = await balancer.open_pool(dests, "secret", timeout=0.1,
+                                            retries=0)
+            try:
+                responses = await asyncio.gather(
+                    *[pool.request(self.create_message())
+                      for n in range(60)])
+            finally:
+                pool.close()
+                for server in servers:
+                    server.close()
+            return responses, pool, servers
+
+        responses, pool, servers = asyncio.run(run())
+        self.assertNotIn(None, responses)
+        self.assertEqual(60, servers[0].responses + servers[1].responses)
+        self.assertEqual(20, servers[2].invalid)
+        self.assertEqual(60, pool.stats.acked)
+        self.assertEqual(20, pool.stats.timeouts + pool.migrated)
+        self.assertEqual(20, pool.failovers)
+
+    def test_server_secrets(self):
+        async def run():
+            servers = [await libradi.server.start_server(("127.0.0.1", 0),
+                                                         secret)
+                       for secret in ("s1", "s2")]
+            dests = [("127.0.0.1",
+                      server.transport.get_extra_info("sockname")[1])
+                     for server in servers]
+            pool = await balancer.open_pool(dests, "secret", timeout=0.1,
+                                            retries=0, secrets=["s1", "s2"])
+            message = self.create_message()
+            try:
+                responses = await asyncio.gather(
+                    *[pool.request(message) for n in range(10)])
+            finally:
+                pool.close()
+                for server in servers:
+                    server.close()
+            return responses, message, servers
+
+        responses, message, servers = asyncio.run(run())
+        self.assertNotIn(None, responses)
+        self.assertEqual([5, 5], [server.responses for server in servers])
+        self.assertEqual("secret", message.secret)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.create_pool(["a"], "random")
+        with self.assertRaises(ValueError):
+            self.create_pool(["a"], weights=[0])
+        with self.assertRaises(ValueError):
+            balancer.ServerPool([], "secret")
+
+
+if __name__ == "__main__":
+    unittest.main()
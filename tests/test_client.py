@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#
+# test_client.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import asyncio
+import unittest
+
+
+class ClientTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+
+    def create_message(self, secret="secret"):
+        message = libradi.RadiusMessage(secret)
+        message.add_avp(libradi.RadiusAvp("User-Name", "alice"))
+        message.add_avp(libradi.RadiusAvp("Acct-Status-Type", 1))
+        return message
+
+    def run_client(self, secret, count, **kwargs):
+        async def run():
+            server = await libradi.server.start_server(("127.0.0.1", 0),
+                                                       "secret")
+            port = server.transport.get_extra_info("sockname")[1]
+            client = await libradi.client.open_client(
+                ("127.0.0.1", port), "secret", **kwargs)
+            message = self.create_message(secret)
+            try:
+                responses = await asyncio.gather(
+                    *[client.request(message) for n in range(count)])
+            finally:
+                client.close()
+                server.close()
+            return responses, client.stats, server
+
+        return asyncio.run(run())
+
+    def test_request_response(self):
+        responses, stats, server = self.run_client("secret", 300,
+                                                   timeout=0.5)
+        self.assertEqual(300, stats.acked)
+        # the burst may overflow the server socket buffer
+        self.assertTrue(300 <= server.responses <= 300 + stats.retransmits)
+        for response in responses:
+            self.assertEqual(libradi.server.ACCOUNTING_RESPONSE, response[0])
+        self.assertEqual(300, stats.to_dict()["latency"]["count"])
+
+    def test_timeout(self):
+        responses, stats, server = self.run_client("wrong", 3, timeout=0.05,
+                                                   retries=2)
+        self.assertEqual([None] * 3, responses)
+        self.assertEqual(3, stats.timeouts)
+        self.assertEqual(6, stats.retransmits)
+        self.assertEqual(9, server.invalid)
+
+    def test_server_response(self):
+        server = libradi.server.AccountingServer("secret")
+        request = self.create_message().dump()
+        response = server.handle(request, None)
+        self.assertEqual(libradi.radius.response_authenticator(
+            response, request[4:20], "secret"), response[4:20])
+        self.assertIsNone(libradi.server.AccountingServer("other").handle(
+            request, None))
+
+
+class DuplicateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+
+    def test_cache(self):
+        cache = libradi.server.DuplicateCache(3, lifetime=10)
+        for n in range(4):
+            cache.put(n, b"response %d" % n, now=n)
+        self.assertEqual(3, len(cache))
+        self.assertIsNone(cache.get(0, now=4))  # evicted by size
+        self.assertEqual(b"response 1", cache.get(1, now=4))
+        self.assertIsNone(cache.get(1, now=11))  # expired
+        cache.put(4, b"response 4", now=12.5)  # expires the old ones
+        self.assertEqual([3, 4], list(cache.entries))
+        with self.assertRaises(ValueError):
+            libradi.server.DuplicateCache(0)
+
+    def test_retransmission(self):
+        server = libradi.server.AccountingServer("secret")
+        message = libradi.RadiusMessage("secret")
+        message.add_avp(libradi.RadiusAvp("User-Name", "alice"))
+        request = message.dump()
+        response = server.process(request, ("10.0.0.1", 1813))
+        self.assertIs(response, server.process(request,
+                                               ("10.0.0.1", 1813)))
+        self.assertEqual((2, 1), (server.responses, server.duplicates))
+        # another NAS or identifier is not a duplicate
+        server.process(request, ("10.0.0.2", 1813))
+        message.pid += 1
+        server.process(message.dump(), ("10.0.0.1", 1813))
+        self.assertEqual((4, 1), (server.responses, server.duplicates))
+        self.assertIsNone(libradi.server.AccountingServer(
+            "secret", cache_size=0).cache)
+
+    def test_eap_retransmission(self):
+        server = libradi.server.EapServer("secret")
+        conversation = libradi.eap.EapConversation(None, "alice",
+                                                   "password")
+        addr = ("10.0.0.1", 1812)
+        message = libradi.eap.create_request("secret", libradi.eap.pack(
+            libradi.eap.EAP_RESPONSE, 0, libradi.eap.EAP_IDENTITY, b"alice"))
+        challenge = server.process(message.dump(), addr)
+        eap_message, state = libradi.eap.get_attributes(challenge)
+        message = libradi.eap.create_request(
+            "secret", conversation.respond(eap_message), state)
+        request = message.dump()
+        responses = [server.process(request, addr) for n in range(3)]
+        self.assertEqual([libradi.eap.ACCESS_ACCEPT] * 3,
+                         [response[0] for response in responses])
+        self.assertEqual((1, 0, 2), (server.accepts, server.rejects,
+                                     server.duplicates))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#
+# test_daemon.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+
+class DaemonTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "radi.sock")
+        self.commands = []
+        self.server = libradi.daemon.CommandServer(self.path, self.handle)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmpdir.cleanup()
+
+    def handle(self, args):
+        self.commands.append(args)
+        if args[0] == "fail":
+            raise ValueError("failed")
+        if args[0] == "exit":
+            raise SystemExit(2)
+        print("\n".join(args))
+
+    def send(self, *commands):
+        output = io.StringIO()
+        failed = libradi.daemon.send_commands(self.path, commands, output)
+        return failed, output.getvalue()
+
+    def test_command(self):
+        line = " ".join(libradi.daemon.quote(arg)
+                        for arg in ["-i", "it's", ".dot", ""])
+        self.assertEqual((0, "-i\nit's\n.dot\n\n"), self.send(line))
+        self.assertEqual([["-i", "it's", ".dot", ""]], self.commands)
+
+    def test_persistent_connection(self):
+        failed, output = self.send("a b", "fail", "c", "exit")
+        self.assertEqual(2, failed)
+        self.assertEqual("a\nb\nc\n", output)
+        self.assertEqual([["a", "b"], ["fail"], ["c"], ["exit"]],
+                         self.commands)
+
+    def test_stale_socket(self):
+        self.server.shutdown()
+        self.server.socket.close()  # the socket file is left behind
+        self.thread.join()
+        self.server = libradi.daemon.CommandServer(self.path, self.handle)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.assertEqual((0, "ok\n"), self.send("ok"))
+
+    def test_running_daemon(self):
+        with self.assertRaises(IOError):
+            libradi.daemon.CommandServer(self.path, self.handle)
+        self.assertEqual((0, "ok\n"), self.send("ok"))  # still served
+        other = os.path.join(self.tmpdir.name, "file")
+        open(other, "w").close()
+        with self.assertRaises(IOError):
+            libradi.daemon.CommandServer(other, self.handle)
+        self.assertTrue(os.path.exists(other))
+
+
+if __name__ == "__main__":
+    unittest.main()
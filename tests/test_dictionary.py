@@ -5,6 +5,9 @@
 #
 
 import libradi
+import concurrent.futures
+import os
+import tempfile
 import unittest
 
 
@@ -17,7 +20,7 @@ class DictionaryTest(unittest.TestCase):
         pass
 
     def test_attributes(self):
-        self.assertEqual(454,
+        self.assertEqual(483,
                          len(libradi.dictionary.get_dictionary().attributes))
 
     def test_values(self):
@@ -66,3 +69,215 @@ class DictionaryTest(unittest.TestCase):
         exp_str = ("ATTRIBUTE:\tid: 7, name: 3GPP-GGSN-Address, type: "
                    "ipaddr\n\tVENDOR:\tname: 3GPP, id: 10415")
         self.assertEqual(exp_str, str(attr))
+
+    def test_tlv(self):
+        tlv = libradi.dictionary.get_attribute("DHCP-Relay-Agent-Information")
+        attr = libradi.dictionary.get_attribute("DHCP-Agent-Circuit-Id")
+        self.assertIs(tlv, attr.attr_parent)
+        self.assertEqual((82, 1), attr.get_oid())
+        self.assertIs(tlv, libradi.dictionary.get_attribute_by_id(82, 54))
+        self.assertEqual("DHCP-Opcode", libradi.dictionary.get_attribute_by_id(
+            256, 54).attr_name)
+
+    def test_flags(self):
+        attr = libradi.dictionary.get_attribute("Tunnel-Password")
+        self.assertEqual({"has_tag": True, "encrypt": 2}, attr.attr_flags)
+        vendor = libradi.dictionary.get_dictionary().vendors["dhcp"]
+        self.assertEqual((2, 1), (vendor.type_size, vendor.length_size))
+
+
+class DictionaryParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, filename, contents):
+        filename = os.path.join(self.tmpdir.name, filename)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(contents)
+
+    def load(self, contents):
+        self.write("dictionary", contents)
+        return libradi.dictionary.Dictionary(self.tmpdir.name, "dictionary")
+
+    def assertError(self, message, contents):
+        with self.assertRaises(libradi.dictionary.DictionaryError) as e:
+            self.load(contents)
+        self.assertEqual(message, str(e.exception).replace(
+            self.tmpdir.name + os.sep, ""))
+
+    def test_include(self):
+        self.write("vendors/dictionary.acme",
+                   "VENDOR Acme 9999\n"
+                   "$INCLUDE dictionary.acme.attrs\n")
+        self.write("vendors/dictionary.acme.attrs",
+                   "BEGIN-VENDOR Acme\n"
+                   "ATTRIBUTE Acme-Id 1 integer  # comment\n"
+                   "END-VENDOR Acme\n")
+        dictionary = self.load("$INCLUDE vendors/dictionary.acme\n"
+                               "$INCLUDE- dictionary.missing\n"
+                               "VALUE Acme-Id One 1\n")
+        attr = dictionary.get_attribute("acme-id")
+        self.assertEqual(9999, attr.attr_vendor.vendor_id)
+        self.assertEqual(1, attr.attr_defined_values[0][1].value)
+
+    def test_vendor_defined_later(self):
+        dictionary = self.load("BEGIN-VENDOR Acme\n"
+                               "ATTRIBUTE Acme-Id 1 integer\n"
+                               "END-VENDOR Acme\n"
+                               "VENDOR Acme 9999 format=2,2\n")
+        vendor = dictionary.get_attribute("acme-id").attr_vendor
+        self.assertEqual((9999, 2, 2), (vendor.vendor_id, vendor.type_size,
+                                        vendor.length_size))
+        self.assertError("dictionary:1: unknown vendor Acme",
+                         "BEGIN-VENDOR Acme\nEND-VENDOR Acme\n")
+        # the attribute number is checked in the format of the vendor
+        dictionary = self.load("BEGIN-VENDOR Acme\n"
+                               "ATTRIBUTE Acme-Long 300 integer\n"
+                               "END-VENDOR Acme\n"
+                               "VENDOR Acme 9999 format=2,1\n")
+        self.assertEqual(300, dictionary.get_attribute_by_id(
+            300, 9999).attr_id)
+        self.assertError("dictionary:2: invalid attribute number 300 of "
+                         "Acme-Long", "BEGIN-VENDOR Acme\n"
+                         "ATTRIBUTE Acme-Long 300 integer\n"
+                         "END-VENDOR Acme\n"
+                         "VENDOR Acme 9999\n")
+
+    def test_extended_vendor(self):
+        dictionary = self.load(
+            "$INCLUDE " + os.path.abspath("dict/dictionary.rfc6929") + "\n"
+            "BEGIN-VENDOR Acme format=Extended-Vendor-Specific-5\n"
+            "ATTRIBUTE Acme-Data 1 octets\n"
+            "END-VENDOR Acme\n"
+            "VENDOR Acme 9999 format=2,1\n"
+            "BEGIN-VENDOR Acme\n"
+            "ATTRIBUTE Acme-Id 300 integer\n"
+            "END-VENDOR Acme\n")
+        evs_vendor = dictionary.get_attribute("acme-data").attr_vendor
+        vendor = dictionary.get_attribute("acme-id").attr_vendor
+        self.assertEqual((9999, 245), (evs_vendor.vendor_id,
+                                       evs_vendor.parent))
+        self.assertEqual((9999, None, 2), (vendor.vendor_id, vendor.parent,
+                                           vendor.type_size))
+        self.assertIs(vendor, dictionary.get_vendor_by_id(9999))
+
+    def test_extended(self):
+        dictionary = self.load("ATTRIBUTE Extended-Attribute-1 241 extended\n"
+                               "ATTRIBUTE Frag-Status 241.1 integer\n")
+        attr = dictionary.get_attribute("frag-status")
+        self.assertEqual((241, 1), attr.get_oid())
+        self.assertError("dictionary:1: unknown parent of Frag-Status (241.1)",
+                         "ATTRIBUTE Frag-Status 241.1 integer\n")
+
+    def test_errors(self):
+        self.assertError("dictionary:2: unknown directive ATRIBUTE",
+                         "\nATRIBUTE User-Name 1 string\n")
+        self.assertError("dictionary:1: VALUE Bar of an unknown attribute Foo",
+                         "VALUE Foo Bar 1\n")
+        self.assertError("dictionary:2: VALUE Big of Foo out of range: 256",
+                         "ATTRIBUTE Foo 1 byte\nVALUE Foo Big 256\n")
+        self.assertError("dictionary:1: unknown type integr of Foo",
+                         "ATTRIBUTE Foo 1 integr\n")
+        self.assertError("dictionary:1: invalid attribute flag has-tag",
+                         "ATTRIBUTE Foo 1 integer has-tag\n")
+        self.assertError("dictionary:1: invalid attribute number 256 of Foo",
+                         "ATTRIBUTE Foo 256 integer\n")
+        self.assertError("dictionary:2: attribute Foo redefined",
+                         "ATTRIBUTE Foo 1 integer\nATTRIBUTE Foo 2 integer\n")
+        self.assertError("dictionary:2: END-VENDOR Acme without BEGIN-VENDOR",
+                         "VENDOR Acme 1\nEND-VENDOR Acme\n")
+        self.assertError("dictionary:1: invalid vendor format: format=3,1",
+                         "VENDOR Acme 1 format=3,1\n")
+        self.assertError("dictionary:2: BEGIN-TLV Foo without END-TLV",
+                         "ATTRIBUTE Foo 1 tlv\nBEGIN-TLV Foo\n")
+        with self.assertRaises(libradi.dictionary.DictionaryError) as e:
+            self.load("$INCLUDE dictionary.missing\n")
+        self.assertIn("dictionary:1: cannot read", str(e.exception))
+
+
+class DictionaryContextTest(unittest.TestCase):
+    """two NAS vendors defining the same vendor attribute differently"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for name, attr_type in (("alpha", "integer"), ("beta", "string")):
+            path = os.path.join(self.tmpdir.name, name)
+            os.makedirs(path)
+            with open(os.path.join(path, "dictionary"), "w") as f:
+                f.write(f"$INCLUDE {os.path.abspath('dict/dictionary')}\n"
+                        "VENDOR Acme 9999\n"
+                        "BEGIN-VENDOR Acme\n"
+                        f"ATTRIBUTE Acme-{name} 1 {attr_type}\n"
+                        "END-VENDOR Acme\n")
+            self.paths.append(path)
+        self.alpha, self.beta = [libradi.dictionary.load(path, "dictionary")
+                                 for path in self.paths]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_load(self):
+        self.assertIsNot(self.alpha, self.beta)
+        self.assertIs(self.alpha, libradi.dictionary.load(
+            self.paths[0] + os.sep, "dictionary"))
+        self.assertIs(libradi.dictionary.load("dict", "dictionary"),
+                      libradi.dictionary.load(os.path.abspath("dict")))
+
+    def test_initialize(self):
+        previous = libradi.dictionary.get_dictionary()
+        try:
+            libradi.dictionary.initialize(self.paths[1], "dictionary")
+            self.assertIs(self.beta, libradi.dictionary.get_dictionary())
+            self.assertEqual(b"\x1a\x0b\x00\x00\x27\x0f\x01\x05abc",
+                             libradi.RadiusAvp("Acme-beta", "abc").dump())
+        finally:
+            libradi.dictionary.initialize("dict", "dictionary")
+            libradi.dictionary.set_dictionary(previous)
+
+    def test_contexts(self):
+        self.assertEqual(
+            b"\x1a\x0c\x00\x00\x27\x0f\x01\x06\x00\x00\x00\x05",
+            libradi.RadiusAvp("Acme-alpha", 5, dictionary=self.alpha).dump())
+        with self.assertRaises(ValueError):
+            libradi.RadiusAvp("Acme-alpha", 5, dictionary=self.beta)
+        with self.assertRaises(ValueError):
+            libradi.RadiusAvp("Acme-alpha", 5)  # the default dictionary
+        self.assertIsNot(
+            libradi.radius.intern_avp("User-Name", "x", self.alpha),
+            libradi.radius.intern_avp("User-Name", "x", self.beta))
+
+        message = libradi.RadiusMessage("secret", dictionary=self.beta)
+        message.create_avp("User-Name", "johndoe")
+        message.create_avp("Acme-beta", "abc")
+        packet = message.dump()
+        decoded = [(attr and attr.attr_name, str(value)) for attr, value in
+                   libradi.decoder.decode_attributes(packet, self.beta)]
+        self.assertEqual([("User-Name", "johndoe"), ("Acme-beta", "abc")],
+                         decoded)
+        self.assertEqual(["User-Name", "Acme-alpha"], [
+            attr.attr_name for attr, value in
+            libradi.decoder.decode_attributes(packet, self.alpha)])
+
+    def test_threads(self):
+        path = self.paths[0]
+
+        def encode(n):
+            context = libradi.dictionary.load(path, "dictionary")
+            return context, libradi.RadiusAvp("Acme-alpha", n,
+                                              dictionary=context).dump()
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(encode, range(64)))
+        self.assertTrue(all(context is self.alpha
+                            for context, binary in results))
+        self.assertEqual([libradi.RadiusAvp("Acme-alpha", n,
+                                            dictionary=self.alpha).dump()
+                          for n in range(64)],
+                         [binary for context, binary in results])
+
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# test_eap.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import asyncio
+import functools
+import unittest
+
+from libradi import eap
+
+
+class EapTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+
+    def test_pack_unpack(self):
+        packet = eap.pack(eap.EAP_RESPONSE, 7, eap.EAP_IDENTITY, b"alice")
+        self.assertEqual(b"\x02\x07\x00\x0a\x01alice", packet)
+        code, eap_id, eap_type, data = eap.unpack(memoryview(packet))
+        self.assertEqual((2, 7, 1, b"alice"),
+                         (code, eap_id, eap_type, bytes(data)))
+        self.assertEqual((3, 8, None), eap.unpack(
+            eap.pack(eap.EAP_SUCCESS, 8))[:3])
+        for packet in (b"\x01\x01\x00", b"\x01\x01\x00\x09\x04"):
+            with self.assertRaises(ValueError):
+                eap.unpack(packet)
+
+    def test_eap_message_fragments(self):
+        packet = eap.pack(eap.EAP_RESPONSE, 1, 13, bytes(range(256)) * 12)
+        message = eap.create_request("secret", packet, b"state")
+        binary = message.dump()
+        self.assertEqual(len(message), len(binary))
+        self.assertEqual((packet, b"state"), eap.get_attributes(binary))
+        self.assertEqual([253] * 12 + [len(packet) - 253 * 12],
+                         [end - start - 2 for code, start, end in
+                          libradi.decoder.iter_avps(binary)
+                          if code == eap.EAP_MESSAGE])
+        self.assertEqual([(0, eap.EAP_MESSAGE, packet)], [
+            (vendor_id, attr_id, bytes(value))
+            for vendor_id, attr_id, value in
+            libradi.decoder.iter_attributes(binary)
+            if attr_id == eap.EAP_MESSAGE])
+
+    def test_message_authenticator(self):
+        message = eap.create_request("secret", eap.pack(
+            eap.EAP_RESPONSE, 1, eap.EAP_IDENTITY, b"alice"))
+        message.authenticator = bytes(range(16))
+        packet = message.dump()
+        self.assertEqual(bytes(range(16)), packet[4:20])
+        self.assertTrue(libradi.radius.check_message_authenticator(
+            packet, "secret"))
+        self.assertFalse(libradi.radius.check_message_authenticator(
+            packet, "wrong"))
+        tampered = bytearray(packet)
+        tampered[-20] ^= 1
+        self.assertFalse(libradi.radius.check_message_authenticator(
+            tampered, "secret"))
+        message = libradi.RadiusMessage("secret")
+        message.add_avp(libradi.RadiusAvp("User-Name", "alice"))
+        self.assertIsNone(libradi.radius.check_message_authenticator(
+            message.dump(), "secret"))
+
+    def test_signed_accounting_request(self):
+        message = libradi.RadiusMessage("secret")
+        message.add_avp(libradi.RadiusAvp("User-Name", "alice"))
+        message.add_avp(libradi.RadiusAvp("Message-Authenticator",
+                                          bytes(16)))
+        packet = message.dump()
+        self.assertEqual(libradi.radius.request_authenticator(
+            packet, "secret"), packet[4:20])
+        self.assertTrue(libradi.radius.check_message_authenticator(
+            packet, "secret", bytes(16)))
+
+    def test_signed_response(self):
+        request_auth = bytes(range(16))
+        response = libradi.radius.create_response(2, 5, request_auth,
+                                                  "secret", signed=True)
+        self.assertEqual(38, len(response))
+        self.assertEqual(libradi.radius.response_authenticator(
+            response, request_auth, "secret"), response[4:20])
+        self.assertTrue(libradi.radius.check_message_authenticator(
+            response, "secret", request_auth))
+
+    def run_conversations(self, count, password="password"):
+        async def run():
+            server = await libradi.server.start_server(
+                ("127.0.0.1", 0), "secret",
+                functools.partial(libradi.server.EapServer,
+                                  password="password"))
+            port = server.transport.get_extra_info("sockname")[1]
+            client = await libradi.client.open_client(
+                ("127.0.0.1", port), "secret", timeout=0.5)
+            conversations = [
+                eap.EapConversation(client, f"user{n}", password)
+                for n in range(count)
+            ]
+            try:
+                results = await asyncio.gather(
+                    *[conversation.run() for conversation in conversations])
+            finally:
+                client.close()
+                server.close()
+            return results, conversations, server
+
+        return asyncio.run(run())
+
+    def test_conversations(self):
+        results, conversations, server = self.run_conversations(50)
+        self.assertEqual([eap.ACCESS_ACCEPT] * 50, results)
+        self.assertEqual([2] * 50, [conversation.rounds
+                                    for conversation in conversations])
+        self.assertEqual((50, 50, 0), (server.challenges, server.accepts,
+                                       server.rejects))
+        self.assertEqual({}, server.conversations)
+
+    def test_wrong_password(self):
+        results, conversations, server = self.run_conversations(2, "wrong")
+        self.assertEqual([eap.ACCESS_REJECT] * 2, results)
+        self.assertEqual(2, server.rejects)
+
+    def test_unsigned_request(self):
+        server = libradi.server.EapServer("secret")
+        message = libradi.RadiusMessage("secret", eap.ACCESS_REQUEST)
+        message.add_avp(libradi.RadiusAvp("EAP-Message", eap.pack(
+            eap.EAP_RESPONSE, 1, eap.EAP_IDENTITY, b"alice")))
+        self.assertIsNone(server.handle(message.dump(), None))
+
+    def test_nak(self):
+        conversation = eap.EapConversation(None, "alice", "password")
+        response = conversation.respond(eap.pack(eap.EAP_REQUEST, 3, 13))
+        self.assertEqual(eap.pack(eap.EAP_RESPONSE, 3, eap.EAP_NAK, b"\x04"),
+                         response)
+        with self.assertRaises(ValueError):
+            conversation.respond(eap.pack(eap.EAP_SUCCESS, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#
+# test_flatdict.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import multiprocessing
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+
+def resolve(name):
+    """worker process - resolve the attribute with the shared dictionary"""
+    attr = libradi.dictionary.get_attribute(name)
+    return attr.attr_name, attr.get_oid(), libradi.RadiusAvp(
+        "Calling-Station-Id", "1234").dump()
+
+
+class FlatDictionaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "dictionary.flat")
+        self.dictionary = libradi.dictionary.Dictionary()
+        self.flat = libradi.flatdict.load(filename=self.filename)
+
+    def tearDown(self):
+        self.flat.close()
+        self.tmpdir.cleanup()
+
+    def assertSameAttribute(self, expected, attr):
+        self.assertEqual((expected.attr_name, expected.attr_id,
+                          expected.attr_type, expected.attr_flags,
+                          expected.attr_values, expected.get_oid()),
+                         (attr.attr_name, attr.attr_id, attr.attr_type,
+                          attr.attr_flags, attr.attr_values, attr.get_oid()))
+        self.assertEqual({code: member.attr_name
+                          for code, member in expected.children.items()},
+                         {code: member.attr_name
+                          for code, member in attr.children.items()})
+        if expected.attr_vendor is None:
+            self.assertIsNone(attr.attr_vendor)
+        else:
+            self.assertEqual(
+                (expected.attr_vendor.vendor_name,
+                 expected.attr_vendor.vendor_id,
+                 expected.attr_vendor.type_size,
+                 expected.attr_vendor.length_size),
+                (attr.attr_vendor.vendor_name, attr.attr_vendor.vendor_id,
+                 attr.attr_vendor.type_size, attr.attr_vendor.length_size))
+
+    def test_attributes(self):
+        self.assertEqual(len(self.dictionary.attributes), len(self.flat))
+        self.assertEqual(sorted(self.dictionary.get_attribute_names()),
+                         sorted(self.flat.get_attribute_names()))
+        for name, attr in self.dictionary.attributes.items():
+            self.assertSameAttribute(attr, self.flat.get_attribute(name))
+
+    def test_get_attribute(self):
+        attr = self.flat.get_attribute("F5-LTM-USER-ROLE")
+        self.assertEqual("F5", attr.attr_vendor.vendor_name)
+        self.assertEqual(37, len(self.flat.get_attribute(
+            "nas-port-type").attr_defined_values))
+        with self.assertRaises(ValueError):
+            self.flat.get_attribute("no-such-attribute")
+
+    def test_get_attribute_by_id(self):
+        for key in ((1, 0), (82, 54), (256, 54), (4, 3375)):
+            self.assertSameAttribute(self.dictionary.get_attribute_by_id(*key),
+                                     self.flat.get_attribute_by_id(*key))
+        with self.assertRaises(ValueError):
+            self.flat.get_attribute_by_id(1, 12345)
+
+    def test_tlv(self):
+        attr = self.flat.get_attribute("DHCP-Agent-Circuit-Id")
+        self.assertEqual("DHCP-Relay-Agent-Information",
+                         attr.attr_parent.attr_name)
+        self.assertEqual((82, 1), attr.get_oid())
+
+    def test_extended_vendor_specific(self):
+        with open(os.path.join(self.tmpdir.name, "dictionary"), "w") as f:
+            f.write(f"$INCLUDE {os.path.abspath('dict/dictionary')}\n"
+                    "VENDOR Acme 9999\n"
+                    "BEGIN-VENDOR Acme format=Extended-Vendor-Specific-5\n"
+                    "ATTRIBUTE Acme-Data 1 octets\n"
+                    "END-VENDOR Acme\n")
+        source = libradi.dictionary.Dictionary(self.tmpdir.name)
+        filename = os.path.join(self.tmpdir.name, "evs.flat")
+        libradi.flatdict.build(source, filename)
+        flat = libradi.flatdict.FlatDictionary(filename)
+        try:
+            self.assertEqual(245, flat.get_attribute(
+                "Acme-Data").attr_vendor.parent)
+            self.assertEqual(
+                libradi.RadiusAvp("Acme-Data", b"\x55" * 300,
+                                  dictionary=source).dump(),
+                libradi.RadiusAvp("Acme-Data", b"\x55" * 300,
+                                  dictionary=flat).dump())
+        finally:
+            flat.close()
+
+    def test_cached(self):
+        attr = self.flat.get_attribute("Allowed-Called-Station-Id")
+        self.assertIs(attr, self.flat.get_attribute(
+            "allowed-called-station-id"))
+        self.assertIs(attr.attr_parent, self.flat.get_attribute_by_id(241))
+        self.assertIs(attr, attr.attr_parent.children[5])
+        rad = libradi.RadiusMessage("secret", dictionary=self.flat)
+        rad.add_avp(libradi.RadiusAvp("Allowed-Called-Station-Id", "abc",
+                                      dictionary=self.flat))
+        self.assertEqual([("Allowed-Called-Station-Id", "abc")],
+                         [(attr.attr_name, str(value)) for attr, value in
+                          libradi.decoder.decode_attributes(rad.dump(),
+                                                            self.flat)])
+
+    def test_reuse(self):
+        mtime = os.stat(self.filename).st_mtime_ns
+        flat = libradi.flatdict.load(filename=self.filename)
+        flat.close()
+        self.assertEqual(mtime, os.stat(self.filename).st_mtime_ns)
+
+    def test_stale(self):
+        self.assertTrue(self.flat.is_current())
+        with open(self.filename, "r+b") as f:
+            f.seek(32)
+            f.write(b"\0\0\0\0")  # corrupt the signature
+        flat = libradi.flatdict.FlatDictionary(self.filename)
+        self.assertFalse(flat.is_current())
+        flat.close()
+        flat = libradi.flatdict.load(filename=self.filename)
+        self.assertTrue(flat.is_current())
+        flat.close()
+
+    def test_unsafe_file(self):
+        os.chmod(self.filename, 0o666)
+        with self.assertRaises(ValueError):
+            libradi.flatdict.FlatDictionary(self.filename)
+        flat = libradi.flatdict.load(filename=self.filename)  # rebuilt
+        flat.close()
+        self.assertEqual(0o600, os.stat(self.filename).st_mode & 0o777)
+
+    def test_default_filename(self):
+        cache = os.path.join(self.tmpdir.name, "cache")
+        with unittest.mock.patch.dict(os.environ, XDG_CACHE_HOME=cache):
+            filename = libradi.flatdict.default_filename("dict",
+                                                         "dictionary")
+        self.assertEqual(os.path.join(cache, "radi"),
+                         os.path.dirname(filename))
+        self.assertEqual(0o700, os.stat(os.path.dirname(filename)).st_mode &
+                         0o777)
+
+    def test_invalid_file(self):
+        with open(self.filename, "wb") as f:
+            f.write(b"garbage")
+        with self.assertRaises(ValueError):
+            libradi.flatdict.FlatDictionary(self.filename)
+
+    def test_workers(self):
+        avp = libradi.RadiusAvp("Calling-Station-Id", "1234").dump()
+        previous = libradi.dictionary.get_dictionary()
+        libradi.dictionary.set_dictionary(self.flat)
+        try:
+            context = multiprocessing.get_context("fork")
+            with context.Pool(2) as pool:
+                results = pool.map(resolve, ["DHCP-Agent-Circuit-Id"] * 4)
+        finally:
+            libradi.dictionary.set_dictionary(previous)
+        self.assertEqual([("DHCP-Agent-Circuit-Id", (82, 1), avp)] * 4,
+                         results)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#
+# test_histogram.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import json
+import random
+import unittest
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_buckets(self):
+        histogram = libradi.histogram.Histogram(precision=7)
+        for value in range(1 << 20):
+            index = histogram.index(value)
+            self.assertTrue(histogram.value(index) <= value <
+                            histogram.value(index + 1))
+        self.assertEqual(127, histogram.index(127))
+
+    def test_percentiles(self):
+        histogram = libradi.histogram.Histogram()
+        values = list(range(1, 100001))
+        random.shuffle(values)
+        for value in values:
+            histogram.record_units(value)
+        self.assertEqual(100000, len(histogram))
+        for percentile in (50, 99, 99.9):
+            expected = percentile * 1000 * 1e-6
+            self.assertAlmostEqual(expected,
+                                   histogram.percentile(percentile),
+                                   delta=expected * 0.016)
+        self.assertAlmostEqual(0.1, histogram.percentile(100))
+        self.assertAlmostEqual(50000.5e-6, histogram.mean())
+
+    def test_empty(self):
+        histogram = libradi.histogram.Histogram()
+        self.assertEqual(0.0, histogram.percentile(99))
+        self.assertEqual(0, histogram.summary()["count"])
+
+    def test_merge(self):
+        first = libradi.histogram.Histogram()
+        second = libradi.histogram.Histogram()
+        for n in range(1000):
+            first.record(0.001)
+            second.record(0.1)
+        first.merge(second)
+        self.assertEqual(2000, len(first))
+        self.assertAlmostEqual(0.001, first.percentile(50), delta=0.00002)
+        self.assertAlmostEqual(0.1, first.percentile(51), delta=0.002)
+        self.assertEqual(100000, first.max)
+        with self.assertRaises(ValueError):
+            first.merge(libradi.histogram.Histogram(precision=5))
+
+    def test_json(self):
+        histogram = libradi.histogram.Histogram()
+        for n in range(1, 5000):
+            histogram.record(n * 1e-4)
+        data = json.loads(json.dumps(histogram.to_dict()))
+        copy = libradi.histogram.Histogram.from_dict(data)
+        self.assertEqual(histogram.summary(), copy.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# test_identities.py
+# Author: Alex Kozadaev (2014)
+#
+
+import unittest
+
+from libradi import identities
+
+
+class IdentitiesTest(unittest.TestCase):
+
+    def test_imsi(self):
+        imsis = identities.ImsiRange("262", "01", start=5, count=10)
+        self.assertEqual(10, len(imsis))
+        self.assertEqual("262010000000005", imsis[0])
+        self.assertEqual("262010000000014", imsis[-1])
+        self.assertEqual(imsis[3], list(imsis)[3])
+        with self.assertRaises(IndexError):
+            imsis[10]
+        self.assertEqual(10 ** 9, len(identities.ImsiRange("310", "410")))
+        for mcc, mnc in (("26", "01"), ("262", "1"), ("262", "0a")):
+            with self.assertRaises(ValueError):
+                identities.ImsiRange(mcc, mnc)
+
+    def test_seek(self):
+        imsis = identities.ImsiRange("262", "01")
+        self.assertEqual("262019999999999", imsis[10 ** 10 - 1])
+        self.assertEqual("262010123456789", imsis[123456789])
+
+    def test_shuffle(self):
+        msisdns = identities.MsisdnRange("4477", count=1000, shuffle=True)
+        values = list(msisdns)
+        self.assertEqual(1000, len(set(values)))
+        self.assertNotEqual(sorted(values), values)
+        self.assertEqual({f"4477{n:08d}" for n in range(1000)}, set(values))
+
+    def test_partition(self):
+        imsis = identities.ImsiRange("262", "01", count=1001, shuffle=True)
+        parts = [imsis.partition(part, 4) for part in range(4)]
+        self.assertEqual([250, 250, 250, 251], [len(part) for part in parts])
+        values = [imsi for part in parts for imsi in part]
+        self.assertEqual(list(imsis), values)
+        self.assertEqual(imsis[750], parts[3][0])
+        with self.assertRaises(ValueError):
+            imsis.partition(4, 4)
+
+    def test_imeisv(self):
+        imeisvs = identities.ImeisvRange("35123456", svn="01")
+        self.assertEqual(10 ** 6, len(imeisvs))
+        self.assertEqual("3512345600004201", imeisvs[42])
+        with self.assertRaises(ValueError):
+            identities.ImeisvRange("3512345")
+
+    def test_addresses(self):
+        addresses = identities.AddressRange("10.0.0.0/24")
+        self.assertEqual(254, len(addresses))
+        self.assertEqual(["10.0.0.1", "10.0.0.254"],
+                         [addresses[0], addresses[-1]])
+        addresses = identities.AddressRange("2001:db8::/64", start=16)
+        self.assertEqual("2001:db8::10", addresses[0])
+        with self.assertRaises(ValueError):
+            identities.AddressRange("10.0.0.0/30", count=3)
+
+    def test_prefixes(self):
+        prefixes = identities.PrefixRange("2001:db8::/32", 56)
+        self.assertEqual(1 << 24, len(prefixes))
+        self.assertEqual("2001:db8:0:100::/56", prefixes[1])
+        self.assertEqual("2001:db8:ffff:ff00::/56", prefixes[-1])
+        with self.assertRaises(ValueError):
+            identities.PrefixRange("2001:db8::/32", 16)
+
+    def test_location(self):
+        locations = identities.LocationRange("262", "10", seed=7)
+        location = locations[12345]
+        self.assertEqual(8, len(location))
+        self.assertEqual(bytes.fromhex("0162f201"), location[:4])
+        lac = int.from_bytes(location[4:6], "big")
+        self.assertTrue(0 < lac < 0xffff)
+        self.assertEqual(location, identities.LocationRange(
+            "262", "10", seed=7)[12345])
+        self.assertNotEqual(location, identities.LocationRange(
+            "262", "10", seed=8)[12345])
+        ecgi = identities.LocationRange("262", "100", identities.ECGI)[0]
+        self.assertEqual(bytes.fromhex("81620201"), ecgi[:4])
+        self.assertEqual(0, ecgi[4] & 0xf0)
+
+    def test_create_range(self):
+        imsis = identities.create_range({"type": "imsi", "mcc": "262",
+                                         "mnc": "01", "count": 10})
+        self.assertEqual("262010000000009", imsis[9])
+        for spec in ({"type": "unknown"}, {"type": "imsi", "mcc": "262"}):
+            with self.assertRaises(ValueError):
+                identities.create_range(spec)
+
+
+if __name__ == "__main__":
+    unittest.main()
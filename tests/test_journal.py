@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#
+# test_journal.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import asyncio
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from libradi import journal
+
+
+def make_request(pid=1):
+    rad = libradi.RadiusMessage("secret")
+    rad.pid = pid
+    rad.add_avp(libradi.RadiusAvp("User-Name", "johndoe"))
+    rad.add_avp(libradi.RadiusAvp("Acct-Status-Type", 1))
+    rad.add_avp(libradi.RadiusAvp("NAS-IP-Address", "127.0.0.1"))
+    return rad.dump()
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+        fd, self.filename = tempfile.mkstemp(suffix=".journal")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_journal(self):
+        with journal.Journal(self.filename, 4096) as packets:
+            packets.sent(b"\x04\x01\x00\x14" + bytes(16))
+            packets.write(journal.RECEIVED, memoryview(b"\x05\x01\x00\x14" +
+                                                       bytes(16)), 100.5)
+            # readable before the journal is closed (eg. after a crash)
+            self.assertEqual(2, len(journal.read(self.filename)[1]))
+        dropped, records = journal.read(self.filename)
+        self.assertEqual(0, dropped)
+        self.assertEqual([journal.SENT, journal.RECEIVED],
+                         [direction for ts, direction, packet in records])
+        self.assertEqual(100.5, records[1][0])
+        self.assertEqual(b"\x05\x01\x00\x14" + bytes(16), records[1][2])
+
+    def test_ring(self):
+        rand = random.Random(1)
+        written = []
+        with journal.Journal(self.filename, 1000) as packets:
+            for n in range(500):
+                packet = bytes([n & 0xff]) * rand.randint(20, 150)
+                packets.write(n % 2, packet, float(n))
+                written.append((float(n), n % 2, packet))
+                dropped, records = journal.read(self.filename)
+                self.assertEqual(written[len(written) - len(records):],
+                                 records)
+                self.assertEqual(len(written), dropped + len(records))
+                self.assertTrue(sum(len(packet) + journal.RECORD_HDR.size
+                                    for ts, d, packet in records) <= 1000)
+            packets.write(journal.SENT, bytes(2000))  # does not fit
+        dropped, records = journal.read(self.filename)
+        self.assertEqual(501, dropped + len(records))
+
+    def test_dump(self):
+        with journal.Journal(self.filename, 4096) as packets:
+            packets.sent(make_request())
+            packets.received(b"\x04\x00")
+        output = io.StringIO()
+        journal.dump(self.filename, libradi.dictionary.load("dict"), output)
+        lines = output.getvalue().splitlines()
+        self.assertIn("2 packets (0 dropped)", lines[0])
+        self.assertTrue(lines[1].endswith(" sent"))
+        self.assertIn("  Accounting-Request id 1 length", lines[2])
+        self.assertEqual(["    User-Name = johndoe",
+                          "    Acct-Status-Type = Start",
+                          "    NAS-IP-Address = 127.0.0.1"], lines[3:6])
+        self.assertTrue(lines[6].endswith(" received"))
+        self.assertIn("malformed packet", lines[7])
+
+    def test_format_packet(self):
+        # Framed-Interface-Id is of the ifid type radtypes does not implement
+        avp = b"\x60\x0a" + bytes.fromhex("0000000000000001")
+        packet = bytearray(make_request() + avp)
+        packet[2:4] = len(packet).to_bytes(2, "big")
+        lines = journal.format_packet(packet, libradi.dictionary.load("dict"))
+        self.assertEqual(["    NAS-IP-Address = 127.0.0.1",
+                          "    Framed-Interface-Id = 0x0000000000000001"],
+                         lines[-2:])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            journal.read(self.filename)  # empty
+        with self.assertRaises(ValueError):
+            journal.Journal(self.filename, 10)
+
+    def test_client(self):
+        async def run():
+            server = await libradi.server.start_server(("127.0.0.1", 0),
+                                                       "secret")
+            port = server.transport.get_extra_info("sockname")[1]
+            with journal.Journal(self.filename, 4096) as packets:
+                client = await libradi.client.open_client(
+                    ("127.0.0.1", port), "secret", journal=packets)
+                try:
+                    return await client.request_packet(make_request(7))
+                finally:
+                    client.close()
+                    server.close()
+
+        response = asyncio.run(run())
+        dropped, records = journal.read(self.filename)
+        self.assertEqual([(journal.SENT, make_request(7)),
+                          (journal.RECEIVED, bytes(response))],
+                         [(direction, packet)
+                          for ts, direction, packet in records])
+
+
+if __name__ == "__main__":
+    unittest.main()
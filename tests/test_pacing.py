@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+#
+# test_pacing.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import unittest
+
+
+class FakeClock:
+    """clock advanced only by sleep() and the cost of sending a packet"""
+
+    def __init__(self, send_cost=0.0):
+        self.now = 0.0
+        self.sleeps = 0
+        self.send_cost = send_cost
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.now += seconds
+
+    def send(self, pacer, count):
+        for n in range(count):
+            pacer.wait()
+            self.now += self.send_cost
+
+
+class RateProfileTest(unittest.TestCase):
+
+    def test_constant(self):
+        profile = libradi.pacing.parse_profile("1000")
+        self.assertEqual(1000, profile.rate(5))
+        self.assertEqual(5000, profile.count(5))
+
+    def test_ramp(self):
+        profile = libradi.pacing.parse_profile("1000-50000/600")
+        self.assertEqual(1000, profile.rate(0))
+        self.assertEqual(25500, profile.rate(300))
+        self.assertEqual(50000, profile.rate(700))
+        self.assertEqual((1000 + 50000) / 2 * 600, profile.count(600))
+        self.assertEqual((1000 + 50000) / 2 * 600 + 50000,
+                         profile.count(601))
+
+    def test_steps(self):
+        profile = libradi.pacing.parse_profile("100x10,200x10")
+        self.assertEqual(100, profile.rate(9.9))
+        self.assertEqual(200, profile.rate(10))
+        self.assertEqual(200, profile.rate(100))
+        self.assertEqual(2000, profile.count(15))
+        self.assertEqual(5000, profile.count(30))
+
+    def test_invalid(self):
+        for spec in ("0", "-5", "abc", "100-200/0", "100x0", "x10"):
+            with self.assertRaises(ValueError):
+                libradi.pacing.parse_profile(spec)
+        with self.assertRaises(ValueError):
+            libradi.pacing.create_pacer("100", "burst")
+
+
+class PacerTest(unittest.TestCase):
+
+    def create(self, cls, profile, clock, **kwargs):
+        return cls(profile, clock=clock.clock, sleep=clock.sleep, **kwargs)
+
+    def test_constant_rate(self):
+        clock = FakeClock()
+        pacer = self.create(libradi.pacing.Pacer, 100, clock)
+        clock.send(pacer, 101)
+        elapsed, sent, actual, target = pacer.report()
+        self.assertEqual(101, sent)
+        self.assertAlmostEqual(1.0, elapsed)
+        self.assertAlmostEqual(100, target)
+
+    def test_sleeps_are_batched(self):
+        clock = FakeClock()
+        pacer = self.create(libradi.pacing.Pacer, 100000, clock,
+                            resolution=0.001)
+        clock.send(pacer, 100001)
+        self.assertAlmostEqual(1.0, pacer.elapsed(), delta=0.001)
+        self.assertTrue(clock.sleeps <= 1000)
+
+    def test_lagging_sender(self):
+        clock = FakeClock(send_cost=0.002)  # 500 pps at most
+        pacer = self.create(libradi.pacing.Pacer, 1000, clock)
+        clock.send(pacer, 1000)
+        clock.send_cost = 0.0  # no burst to catch up with the schedule
+        sent = 0
+        while not clock.sleeps:
+            clock.send(pacer, 1)
+            sent += 1
+        self.assertTrue(sent <= 4)  # max_lag + resolution worth
+
+    def test_poisson(self):
+        clock = FakeClock()
+        pacer = self.create(libradi.pacing.PoissonPacer, 1000, clock,
+                            seed=1)
+        clock.send(pacer, 10000)
+        self.assertAlmostEqual(10.0, pacer.elapsed(), delta=0.5)
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        pacer = self.create(libradi.pacing.TokenBucketPacer, 100, clock,
+                            burst=10)
+        clock.send(pacer, 1)
+        clock.now += 5  # idle - the bucket is full
+        sleeps = clock.sleeps
+        clock.send(pacer, 10)
+        self.assertEqual(sleeps, clock.sleeps)
+        clock.send(pacer, 1)
+        self.assertEqual(sleeps + 1, clock.sleeps)
+
+    def test_ramp(self):
+        clock = FakeClock()
+        profile = libradi.pacing.RampProfile(1000, 5000, 10)
+        pacer = self.create(libradi.pacing.Pacer, profile, clock)
+        clock.send(pacer, int(profile.count(10)) + 1)
+        self.assertAlmostEqual(10.0, pacer.elapsed(), delta=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
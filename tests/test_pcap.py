@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+#
+# test_pcap.py
+# Author: Alex Kozadaev (2014)
+#
+
+import hashlib
+import libradi
+import os
+import socket
+import struct
+import tempfile
+import unittest
+
+
+def udp_frame(payload, sport=50000, dport=1813):
+    """ethernet/ipv4/udp frame carrying the payload"""
+    udp = struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), 0, 0, 64, 17,
+                     0, socket.inet_aton("10.0.0.1"),
+                     socket.inet_aton("10.0.0.2"))
+    return b"\x00" * 12 + b"\x08\x00" + ip + udp
+
+
+def write_pcap(filename, frames):
+    with open(filename, "wb") as f:
+        f.write(struct.pack("<LHHlLLL", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for timestamp, frame in frames:
+            f.write(struct.pack("<LLLL", int(timestamp),
+                                int(timestamp % 1 * 1e6), len(frame),
+                                len(frame)))
+            f.write(frame)
+
+
+def write_pcapng(filename, frames):
+    def block(block_type, body):
+        body += b"\x00" * (-len(body) % 4)
+        return struct.pack("<LL", block_type, len(body) + 12) + body + \
+            struct.pack("<L", len(body) + 12)
+
+    with open(filename, "wb") as f:
+        f.write(block(0x0a0d0d0a, struct.pack("<LHHq", 0x1a2b3c4d, 1, 0, -1)))
+        f.write(block(1, struct.pack("<HHL", 1, 0, 65535)))
+        for timestamp, frame in frames:
+            ts = int(timestamp * 1e6)
+            f.write(block(6, struct.pack("<LLLLL", 0, ts >> 32,
+                                         ts & 0xffffffff, len(frame),
+                                         len(frame)) + frame))
+
+
+def make_request(secret="secret", pid=1):
+    rad = libradi.RadiusMessage(secret)
+    rad.pid = pid
+    rad.add_avp(libradi.RadiusAvp("user-name", "johndoe"))
+    rad.add_avp(libradi.RadiusAvp("acct-status-type", 1))
+    rad.add_avp(libradi.RadiusAvp("nas-ip-address", "127.0.0.1"))
+    return rad
+
+
+class PcapTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix=".pcap")
+        os.close(fd)
+        self.request = make_request().dump()
+        self.frames = [
+            (100.5, udp_frame(self.request)),
+            (101.0, udp_frame(b"not radius", dport=53)),
+            (101.25, udp_frame(self.request, sport=1813, dport=50000)),
+        ]
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_pcap_reader(self):
+        write_pcap(self.filename, self.frames)
+        with libradi.pcap.PcapReader(self.filename) as reader:
+            packets = [(ts, bytes(payload)) for ts, payload in reader]
+        self.assertEqual("pcap", reader.format)
+        self.assertEqual(2, len(packets))
+        self.assertAlmostEqual(100.5, packets[0][0])
+        self.assertAlmostEqual(101.25, packets[1][0])
+        self.assertEqual(self.request, packets[0][1])
+
+    def test_pcapng_reader(self):
+        write_pcapng(self.filename, self.frames)
+        with libradi.pcap.PcapReader(self.filename) as reader:
+            packets = [(ts, bytes(payload)) for ts, payload in reader]
+        self.assertEqual("pcapng", reader.format)
+        self.assertEqual(2, len(packets))
+        self.assertAlmostEqual(100.5, packets[0][0])
+        self.assertEqual(self.request, packets[1][1])
+
+    def test_payload_is_not_copied(self):
+        write_pcap(self.filename, self.frames)
+        with libradi.pcap.PcapReader(self.filename) as reader:
+            timestamp, payload = next(iter(reader))
+            self.assertIsInstance(payload, memoryview)
+            payload.release()
+
+    def test_unknown_format(self):
+        with open(self.filename, "wb") as f:
+            f.write(b"\x00" * 64)
+        with self.assertRaises(ValueError):
+            libradi.pcap.PcapReader(self.filename)
+
+    def test_pcap_writer(self):
+        for dest in ("10.0.0.2", "fd00::2"):
+            with libradi.pcap.PcapWriter(self.filename, dst_tuple=(dest, 1813),
+                                         buffer_size=100) as writer:
+                for n in range(10):
+                    writer.write(self.request, 100.0 + n * 0.25)
+            with libradi.pcap.PcapReader(self.filename) as reader:
+                frames = [(ts, bytes(frame))
+                          for ts, linktype, frame in reader.frames()]
+                packets = [(ts, bytes(payload)) for ts, payload in reader]
+            self.assertEqual([(100.0 + n * 0.25, self.request)
+                              for n in range(10)], packets)
+            ip = frames[0][1][14:]
+            if dest == "10.0.0.2":  # the checksums of the headers are valid
+                self.assertEqual(0, libradi.pcap.checksum(ip[:20]))
+            else:
+                udp = ip[40:]
+                pseudo = ip[8:40] + struct.pack("!LL", len(udp), 17)
+                self.assertEqual(0, libradi.pcap.checksum(pseudo + udp))
+
+
+class ReplayTest(unittest.TestCase):
+
+    def test_rewriter_passthrough(self):
+        request = make_request().dump()
+        rewriter = libradi.replay.PacketRewriter()
+        self.assertEqual(request, bytes(rewriter.rewrite(request)))
+
+    def test_rewriter_resign(self):
+        request = make_request().dump()
+        rewriter = libradi.replay.PacketRewriter("newsecret", pid=7)
+        self.assertEqual(make_request("newsecret", 7).dump(),
+                         rewriter.rewrite(memoryview(request)))
+
+    def test_rewriter_message_authenticator(self):
+        rewriter = libradi.replay.PacketRewriter("newsecret", pid=7)
+        access = libradi.eap.create_request("secret", libradi.eap.pack(
+            libradi.eap.EAP_RESPONSE, 1, libradi.eap.EAP_IDENTITY, b"alice"))
+        accounting = make_request()
+        accounting.add_avp(libradi.RadiusAvp("Message-Authenticator",
+                                             bytes(16)))
+        for request in (access.dump(), accounting.dump()):
+            packet = rewriter.rewrite(request)
+            self.assertEqual(7 + (packet[0] == 4), packet[1])
+            self.assertTrue(libradi.radius.check_message_authenticator(
+                packet, "newsecret",
+                bytes(16) if packet[0] == 4 else None))
+        self.assertEqual(libradi.radius.request_authenticator(
+            packet, "newsecret"), packet[4:20])
+
+    def test_rewriter_password(self):
+        # User-Password is hidden with the request authenticator (RFC 2865)
+        def hide(password, auth):
+            digest = hashlib.md5(b"secret" + auth).digest()
+            return bytes(a ^ b for a, b in zip(password, digest))
+
+        auth = os.urandom(16)
+        avps = (b"\x01\x07alice" + b"\x02\x12" +
+                hide(b"password".ljust(16, b"\x00"), auth) +
+                b"\x50\x12" + bytes(16))
+        request = bytearray(struct.pack("!BBH", 1, 1, 20 + len(avps)) +
+                            auth + avps)
+        libradi.radius.sign_message_authenticator(request, "secret")
+        packet = libradi.replay.PacketRewriter("secret", pid=7).rewrite(
+            request)
+        self.assertEqual(7, packet[1])
+        self.assertTrue(libradi.radius.check_message_authenticator(
+            packet, "secret"))
+        hidden = [value for vendor_id, attr_id, value in
+                  libradi.decoder.iter_attributes(packet) if attr_id == 2]
+        self.assertEqual(b"password".ljust(16, b"\x00"),
+                         hide(bytes(hidden[0]), bytes(packet[4:20])))
+
+    def test_rewriter_avps(self):
+        request = make_request().dump()
+        avps = [
+            libradi.RadiusAvp("nas-ip-address", "10.1.1.1"),
+            libradi.RadiusAvp("called-station-id", "web.apn")
+        ]
+        rewriter = libradi.replay.PacketRewriter("secret", avps=avps)
+
+        expected = libradi.RadiusMessage("secret")
+        expected.pid = 1
+        expected.add_avp(libradi.RadiusAvp("user-name", "johndoe"))
+        expected.add_avp(libradi.RadiusAvp("acct-status-type", 1))
+        for avp in avps:
+            expected.add_avp(avp)
+        self.assertEqual(expected.dump(), rewriter.rewrite(request))
+
+    def test_rewriter_requires_secret(self):
+        with self.assertRaises(ValueError):
+            libradi.replay.PacketRewriter(pid=1)
+
+    def test_replay(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(1)
+        request = make_request().dump()
+        packets = [(1.0, request), (1.01, b"\x05" + request[1:]),
+                   (1.02, request)]
+        try:
+            sent, skipped = libradi.replay.replay(packets,
+                                                  server.getsockname(),
+                                                  speed=0)
+            self.assertEqual((2, 1), (sent, skipped))
+            self.assertEqual(request, server.recv(4096))
+            self.assertEqual(request, server.recv(4096))
+        finally:
+            server.close()
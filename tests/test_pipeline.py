@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#
+# test_pipeline.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import itertools
+import socket
+import threading
+import unittest
+
+from libradi import pipeline
+
+
+def make_request(pid=0, signed=False):
+    rad = libradi.RadiusMessage("secret")
+    rad.pid = pid
+    rad.add_avp(libradi.radius.intern_avp("User-Name", "johndoe"))
+    rad.add_avp(libradi.radius.intern_avp("Acct-Status-Type", 1))
+    if signed:
+        rad.add_avp(libradi.RadiusAvp("Message-Authenticator", bytes(16)))
+    return rad
+
+
+class PipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.settimeout(0.5)
+
+    def tearDown(self):
+        self.server.close()
+
+    def receive(self, requests, count, **kwargs):
+        """send the requests through the pipeline returning the received"""
+        received = []
+
+        def receiver():
+            try:
+                while True:
+                    received.append(self.server.recv(4096))
+            except socket.timeout:
+                pass
+
+        thread = threading.Thread(target=receiver)
+        thread.start()
+        try:
+            sender = pipeline.Pipeline(self.server.getsockname(), **kwargs)
+            sent, elapsed = sender.send(requests, count)
+        finally:
+            thread.join()
+        self.assertEqual(count, sent)
+        return received
+
+    def test_repeated_request(self):
+        received = self.receive(itertools.repeat(make_request(7)), 600,
+                                workers=3, batch=16, depth=2)
+        self.assertEqual([make_request((7 + n) & 0xff).dump()
+                          for n in range(600)], received)
+
+    def test_signed_requests(self):
+        requests = (make_request(signed=True) for n in range(100))
+        received = self.receive(requests, 100, workers=2, batch=7)
+        self.assertEqual([make_request(n, True).dump() for n in range(100)],
+                         received)
+
+    def test_error(self):
+        class Broken:
+            pid = 0
+
+            def dump(self):
+                raise ValueError("cannot encode")
+
+        requests = itertools.chain([make_request()] * 10,
+                                   itertools.repeat(Broken()))
+        sender = pipeline.Pipeline(self.server.getsockname(), batch=5)
+        with self.assertRaises(ValueError):
+            sender.send(requests, 1000)
+        self.assertEqual(10, sender.sent)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            pipeline.Pipeline(("127.0.0.1", 1813), batch=0)
+        with self.assertRaises(ValueError):
+            pipeline.Pipeline(("127.0.0.1", 1813), workers=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
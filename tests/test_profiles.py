@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+#
+# test_profiles.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+
+class ProfileStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "profiles")
+        self.store = libradi.profiles.ProfileStore(self.filename)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_missing_store(self):
+        self.assertIsNone(self.store.load("default"))
+        self.assertEqual([], self.store.get_names())
+
+    def test_save_load(self):
+        self.store.save("alice", {"imsi": "1234", "avps": [["a", "b"]]})
+        self.store.save("bob", {"imsi": "5678"})
+        self.assertEqual({"imsi": "1234", "avps": [["a", "b"]]},
+                         self.store.load("alice"))
+        self.assertEqual({"imsi": "5678"}, self.store.load("bob"))
+        self.assertIsNone(self.store.load("ali"))
+        self.assertEqual(["alice", "bob"], self.store.get_names())
+
+    def test_save_appends(self):
+        self.store.save("alice", {"imsi": "1234"})
+        size = os.path.getsize(self.filename)
+        self.store.save("alice", {"imsi": "4321"})
+        with open(self.filename, "rb") as f:
+            lines = f.readlines()
+        self.assertTrue(os.path.getsize(self.filename) > size)
+        self.assertEqual(b"radi-profiles 1\n", lines[0])
+        self.assertEqual(3, len(lines))
+        self.assertEqual({"imsi": "4321"}, self.store.load("alice"))
+
+    def test_delete(self):
+        self.store.save("alice", {"imsi": "1234"})
+        self.store.save("bob", {"imsi": "5678"})
+        self.store.delete("alice")
+        self.assertIsNone(self.store.load("alice"))
+        self.assertEqual(["bob"], self.store.get_names())
+
+    def test_compact(self):
+        for n in range(100):
+            self.store.save("alice", {"n": n})
+        self.store.save("bob", {"n": 0})
+        with open(self.filename, "rb") as f:
+            lines = f.readlines()
+        self.assertTrue(len(lines) < 100)
+        self.assertEqual({"n": 99}, self.store.load("alice"))
+        self.assertEqual({"n": 0}, self.store.load("bob"))
+
+    def test_concurrent(self):
+        def save(name):
+            store = libradi.profiles.ProfileStore(self.filename)
+            for n in range(200):
+                store.save(name, {"n": n})
+
+        names = [f"user{n}" for n in range(4)]
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=save, args=(name, ))
+                     for name in names]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(names, self.store.get_names())
+        for name in names:
+            self.assertEqual({"n": 199}, self.store.load(name))
+        self.assertEqual(["profiles"], os.listdir(self.tmpdir.name))
+
+    def test_invalid_store(self):
+        with open(self.filename, "wb") as f:
+            f.write(b"\x80\x03some pickle")
+        with self.assertRaises(ValueError):
+            self.store.load("default")
+
+        with open(self.filename, "wb") as f:
+            f.write(b"radi-profiles 99\n")
+        with self.assertRaises(ValueError):
+            self.store.load("default")
+
+    def test_invalid_name(self):
+        with self.assertRaises(ValueError):
+            self.store.save("ali\tce", {})
+
+
+class CachedProfileStoreTest(ProfileStoreTest):
+
+    def setUp(self):
+        super().setUp()
+        self.store = libradi.profiles.CachedProfileStore(self.filename)
+
+    def test_read_once(self):
+        self.store.save("alice", {"imsi": "1234"})
+        other = libradi.profiles.CachedProfileStore(self.filename)
+        self.assertEqual({"imsi": "1234"}, other.load("alice"))
+        self.store.save("alice", {"imsi": "4321"})
+        self.assertEqual({"imsi": "1234"}, other.load("alice"))
+        self.assertEqual({"imsi": "4321"},
+                         libradi.profiles.ProfileStore(
+                             self.filename).load("alice"))
+
+    def test_unchanged_not_saved(self):
+        self.store.save("alice", {"imsi": "1234"})
+        size = os.path.getsize(self.filename)
+        self.store.save("alice", {"imsi": "1234"})
+        self.assertEqual(size, os.path.getsize(self.filename))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+#
+# test_proxy.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import asyncio
+import unittest
+
+from libradi import proxy
+
+
+def make_request(secret="secret", pid=1, session="1"):
+    message = libradi.RadiusMessage(secret)
+    message.pid = pid
+    message.add_avp(libradi.RadiusAvp("User-Name", "johndoe"))
+    message.add_avp(libradi.RadiusAvp("Acct-Status-Type", 1))
+    message.add_avp(libradi.RadiusAvp("Acct-Session-Id", session))
+    message.add_avp(libradi.RadiusAvp("3GPP-IMSI", "12345"))
+    return message
+
+
+class ProxyTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+
+    def test_forward_packet(self):
+        request = make_request().dump()
+        self.assertEqual(make_request("upstream", 9).dump(),
+                         proxy.forward_packet(4, 9, request[20:], "upstream"))
+
+        message = make_request()
+        message.add_avp(libradi.RadiusAvp("Message-Authenticator",
+                                          bytes(16)))
+        request = proxy.forward_packet(4, 9, message.dump()[20:], "other")
+        self.assertEqual(libradi.radius.request_authenticator(
+            request, "other"), request[4:20])
+        self.assertTrue(libradi.radius.check_message_authenticator(
+            request, "other", bytes(16)))
+
+    def test_relay_response(self):
+        auth = bytes(range(16))
+        avp = libradi.RadiusAvp("Reply-Message", "ok").dump()
+        for signed in (False, True):
+            response = libradi.radius.create_response(
+                5, 9, b"upstream auth 16", "upstream", avp, signed)
+            relayed = proxy.relay_response(response, 3, auth, "secret")
+            self.assertEqual(libradi.radius.create_response(
+                5, 3, auth, "secret", avp, signed), relayed)
+
+    def test_rules(self):
+        rules = proxy.AvpRules(
+            [libradi.RadiusAvp("NAS-IP-Address", "10.1.1.1")],
+            ["3GPP-IMSI", "Acct-Session-Id"])
+        request = make_request().dump()
+        expected = libradi.RadiusMessage("secret")
+        expected.add_avp(libradi.RadiusAvp("User-Name", "johndoe"))
+        expected.add_avp(libradi.RadiusAvp("Acct-Status-Type", 1))
+        expected.add_avp(libradi.RadiusAvp("NAS-IP-Address", "10.1.1.1"))
+        self.assertEqual(expected.dump()[20:],
+                         rules.rewrite(request, len(request)))
+        self.assertFalse(proxy.AvpRules().is_active())
+
+    def test_extended_rules(self):
+        message = libradi.RadiusMessage("secret")
+        message.add_avp(libradi.RadiusAvp("EAP-Peer-Id", b"peer"))
+        message.add_avp(libradi.RadiusAvp("Mobility-Domain-Id", 7))
+        message.add_avp(libradi.RadiusAvp("DHCP-Relay-To-IP-Address",
+                                          "10.0.0.1"))  # type 270
+        message.add_avp(libradi.RadiusAvp("DHCP-Server-Host-Name",
+                                          "host"))  # type 268
+        request = message.dump()
+        rules = proxy.AvpRules(
+            [libradi.RadiusAvp("Mobility-Domain-Id", 9)],
+            ["DHCP-Server-Host-Name"])
+        rewritten = request[:20] + rules.rewrite(request, len(request))
+        self.assertEqual([("EAP-Peer-Id", "0x70656572"),
+                          ("Mobility-Domain-Id", "9"),
+                          ("DHCP-Relay-To-IP-Address", "10.0.0.1")],
+                         [(attr.attr_name, str(value))
+                          for attr, value in
+                          libradi.decoder.decode_attributes(
+                              rewritten, length=len(rewritten))])
+
+    def test_session_key(self):
+        request = proxy.ForwardedRequest(4, make_request(
+            session="abc").dump()[20:])
+        self.assertEqual(b"abc", request.session_key())
+        self.assertEqual(b"", proxy.ForwardedRequest(4, b"").session_key())
+
+    def run_proxy(self, messages, strategy="round-robin", rules=None,
+                  upstream_secrets=("up1", "up2")):
+        async def run():
+            servers = [await libradi.server.start_server(("127.0.0.1", 0),
+                                                         secret)
+                       for secret in ("up1", "up2")]
+            upstreams = [(("127.0.0.1",
+                           server.transport.get_extra_info("sockname")[1]),
+                          secret, 1)
+                         for server, secret in zip(servers,
+                                                   upstream_secrets)]
+            relay = await proxy.start_proxy(("127.0.0.1", 0), "secret",
+                                            upstreams, rules, strategy,
+                                            timeout=0.2, retries=0)
+            port = relay.transport.get_extra_info("sockname")[1]
+            nas = await libradi.client.open_client(("127.0.0.1", port),
+                                                   "secret", timeout=0.6,
+                                                   retries=0)
+            try:
+                responses = await asyncio.gather(
+                    *[nas.request(message) for message in messages])
+            finally:
+                nas.close()
+                relay.close()
+                for server in servers:
+                    server.close()
+            return responses, relay, servers
+
+        return asyncio.run(run())
+
+    def test_proxy(self):
+        responses, relay, servers = self.run_proxy([make_request()] * 200)
+        self.assertNotIn(None, responses)
+        self.assertEqual((200, 200, 0), (relay.requests, relay.responses,
+                                         relay.invalid))
+        self.assertEqual([100, 100], [server.responses
+                                      for server in servers])
+
+    def test_hash(self):
+        messages = [make_request(session=str(n % 10)) for n in range(100)]
+        responses, relay, servers = self.run_proxy(messages, "hash")
+        self.assertNotIn(None, responses)
+        counts = [server.responses for server in servers]
+        self.assertEqual(100, sum(counts))
+        self.assertEqual(0, counts[0] % 10)  # sessions are not split
+
+    def test_failover(self):
+        responses, relay, servers = self.run_proxy(
+            [make_request()] * 10, upstream_secrets=("wrong", "up2"))
+        self.assertNotIn(None, responses)
+        self.assertEqual([0, 10], [server.responses for server in servers])
+
+        responses, relay, servers = self.run_proxy(
+            [make_request()], upstream_secrets=("wrong", "wrong"))
+        self.assertEqual([None], responses)
+        self.assertEqual(1, relay.failed)
+
+    def test_invalid_request(self):
+        responses, relay, servers = self.run_proxy([make_request("other")])
+        self.assertEqual([None], responses)
+        self.assertEqual(relay.requests, relay.invalid)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@
 # Author: Alex Kozadaev (2014)
 #
 
+import base64
 import libradi
 import unittest
 import struct
@@ -185,8 +186,8 @@ class RadTypesTest(unittest.TestCase):
             "tlv", "0xf5/0x{}".format(bytes("hello world", "utf-8").hex()))
         self.assertIsNotNone(tlv)
         self.assertEqual(len("hello world") + 2, len(tlv))
-        self.assertEqual(0xb, len(tlv.values[2]))
-        self.assertEqual("f5" + "0b" + "68656c6c6f20776f726c64",
+        self.assertEqual(0xb, len(tlv.value[0][1]))
+        self.assertEqual("f5" + "0d" + "68656c6c6f20776f726c64",
                          tlv.dump().hex())
 
         with self.assertRaises(ValueError):
@@ -194,3 +195,47 @@ class RadTypesTest(unittest.TestCase):
             tlv = libradi.radtypes.get_type_instance(
                 "tlv", "0x{}/0x{}".format(tlv_type,
                                           bytes("hello world", "utf-8").hex()))
+
+    def test_octets_type(self):
+        data = bytes(range(256)) * 16
+        for value in (data, bytearray(data), memoryview(data),
+                      "0x" + data.hex(),
+                      "base64:" + base64.b64encode(data).decode()):
+            octets = libradi.radtypes.get_type_instance("octets", value)
+            self.assertEqual(data, octets.dump())
+            self.assertEqual(4096, len(octets))
+
+        octets = libradi.radtypes.get_type_instance("octets", "0x162")
+        self.assertEqual(b"\x01\x62", octets.dump())
+        self.assertEqual("0x0162", str(octets))
+        self.assertEqual(b"\x04\xd2", libradi.radtypes.get_type_instance(
+            "octets", "1234").dump())
+        self.assertEqual(b"abc", libradi.radtypes.get_type_instance(
+            "octets", "abc").dump())
+        self.assertEqual(b"\x00\x01", libradi.radtypes.OctetsType.load(
+            memoryview(b"\x00\x01")).dump())
+        with self.assertRaises(ValueError):
+            libradi.radtypes.get_type_instance("octets", "0xzz")
+        with self.assertRaises(ValueError):
+            libradi.radtypes.get_type_instance("octets", "base64:a")
+
+    def test_nested_tlv_type(self):
+        tlv = libradi.radtypes.get_type_instance(
+            "tlv", "1/0x0102, 2/{1/0x03,2/base64:BA==}, 3/abc")
+        self.assertEqual("01040102" "0208" "010303" "020304" "0305616263",
+                         tlv.dump().hex())
+        self.assertEqual(len(tlv.dump()), len(tlv))
+        self.assertEqual("1/0x0102,2/{1/0x03,2/0x04},3/0x616263", str(tlv))
+        self.assertEqual(tlv.dump(), libradi.radtypes.get_type_instance(
+            "tlv", str(tlv)).dump())
+
+        loaded = libradi.radtypes.TlvType.load(tlv.dump())
+        self.assertEqual([1, 2, 3], [code for code, value in loaded.value])
+        self.assertEqual(b"\x01\x03\x03\x02\x03\x04",
+                         loaded.value[1][1].dump())
+
+        for value in ("1/{2/0x01", "1/0x01}", "0x01", "1/0x" + "00" * 254):
+            with self.assertRaises(ValueError):
+                libradi.radtypes.get_type_instance("tlv", value)
+        with self.assertRaises(ValueError):
+            libradi.radtypes.TlvType.load(b"\x01\x05\x00")
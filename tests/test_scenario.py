@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+#
+# test_scenario.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import collections
+import itertools
+import json
+import os
+import tempfile
+import unittest
+
+from libradi import decoder
+from libradi import scenario
+
+
+def create_spec(**kwargs):
+    spec = {
+        "seed": 7,
+        "sessions": {
+            "count": 100,
+            "avps": {
+                "Acct-Session-Id": {"session-id": "radi-"},
+                "3GPP-IMSI": {"type": "imsi", "mcc": "262", "mnc": "01"},
+                "Framed-IP-Address": {"type": "address",
+                                      "network": "10.0.0.0/24"},
+                "Called-Station-Id": {"choice": ["web.apn", "ims"]},
+                "NAS-IP-Address": "192.168.0.1",
+            }
+        },
+        "messages": {
+            "start": {"avps": {"Acct-Status-Type": "Start"}},
+            "interim": {"avps": {"Acct-Status-Type": "Interim-Update",
+                                 "Acct-Input-Octets": {"uniform": [10, 20]}}},
+            "stop": {"avps": {"Acct-Status-Type": "Stop",
+                              "NAS-IP-Address": "192.168.0.2"}},
+        },
+        "mix": {"start": 30, "interim": 60, "stop": 10},
+    }
+    spec.update(kwargs)
+    return spec
+
+
+class ScenarioTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+
+    def decode(self, request, secret="secret"):
+        packet = request.dump()
+        self.assertEqual(bytes(packet[4:20]),
+                         libradi.radius.request_authenticator(packet, secret))
+        values = {}
+        for vendor_id, attr_id, value in decoder.iter_attributes(packet):
+            attr_def = libradi.dictionary.get_attribute_by_id(attr_id,
+                                                              vendor_id)
+            values[attr_def.attr_name] = str(decoder.decode_value(attr_def,
+                                                                  value))
+        return values
+
+    def test_mix(self):
+        requests = scenario.Scenario(create_spec()).requests("secret")
+        statuses = collections.Counter()
+        for request in itertools.islice(requests, 2000):
+            values = self.decode(request)
+            statuses[values["Acct-Status-Type"]] += 1
+            session = int(values["Acct-Session-Id"][5:13], 16)
+            self.assertEqual(f"26201{session:010d}", values["3GPP-IMSI"])
+            self.assertEqual(f"10.0.0.{session + 1}",
+                             values["Framed-IP-Address"])
+            self.assertIn(values["Called-Station-Id"], ("web.apn", "ims"))
+            if values["Acct-Status-Type"] == "3":
+                self.assertTrue(10 <= int(values["Acct-Input-Octets"]) <= 20)
+            self.assertEqual("192.168.0.2" if values["Acct-Status-Type"] ==
+                             "2" else "192.168.0.1", values["NAS-IP-Address"])
+        self.assertTrue(500 < statuses["1"] < 700)
+        self.assertTrue(1100 < statuses["3"] < 1300)
+        self.assertTrue(150 < statuses["2"] < 250)
+
+    def test_lifecycle(self):
+        spec = create_spec(lifecycle=[
+            "start", {"message": "interim", "repeat": [0, 3]}, "stop"])
+        del spec["mix"]
+        spec["sessions"]["count"] = 10
+        requests = scenario.Scenario(spec).requests("secret")
+        sessions = collections.defaultdict(list)
+        called = {}
+        for request in itertools.islice(requests, 500):
+            values = self.decode(request)
+            session_id = values["Acct-Session-Id"]
+            sessions[session_id].append(values["Acct-Status-Type"])
+            # the session values do not change during the lifecycle
+            called.setdefault(session_id, values["Called-Station-Id"])
+            self.assertEqual(called[session_id], values["Called-Station-Id"])
+        complete = 0
+        for statuses in sessions.values():
+            self.assertEqual("1", statuses[0])
+            if statuses[-1] == "2":
+                complete += 1
+                self.assertTrue(len(statuses) <= 5)
+                self.assertEqual(["3"] * (len(statuses) - 2),
+                                 statuses[1:-1])
+        self.assertTrue(complete >= len(sessions) - 10)
+        self.assertEqual(len(set(called.values())), 2)
+
+    def test_usage(self):
+        spec = create_spec(lifecycle=[
+            "start", {"message": "interim", "repeat": [4, 4]}, "stop"],
+            usage={"input-rate": "constant:1e7",
+                   "output-rate": "exponential:2e7", "interval": 600})
+        del spec["mix"]
+        spec["sessions"]["count"] = 2
+        spec["messages"]["interim"]["usage"] = True
+        spec["messages"]["stop"]["usage"] = True
+        requests = scenario.Scenario(spec).requests("secret")
+        sessions = collections.defaultdict(list)
+        for request in itertools.islice(requests, 12):
+            values = self.decode(request)
+            sessions[values["Acct-Session-Id"]].append(values)
+        for messages in sessions.values():
+            self.assertNotIn("Acct-Input-Octets", messages[0])  # start
+            totals = [(int(values["Acct-Input-Gigawords"]) << 32) +
+                      int(values["Acct-Input-Octets"])
+                      for values in messages[1:]]
+            self.assertEqual(sorted(set(totals)), totals)  # growing
+            self.assertEqual(6, int(messages[-1]["Acct-Input-Gigawords"]))
+            self.assertEqual([str(600 * n) for n in range(1, 6)],
+                             [values["Acct-Session-Time"]
+                              for values in messages[1:]])
+        spec["mix"] = {"start": 1}
+        del spec["lifecycle"]
+        with self.assertRaises(ValueError):
+            scenario.Scenario(spec)
+
+    def test_reproducible(self):
+        first = scenario.Scenario(create_spec()).requests("secret")
+        second = scenario.Scenario(create_spec()).requests("secret")
+        for n in range(100):
+            self.assertEqual(next(first).dump(), next(second).dump())
+
+    def test_templates(self):
+        compiled = scenario.Scenario(create_spec())
+        # the session-less constants are joined into a single binary
+        parts = compiled.templates["start"].parts
+        self.assertEqual(5, len(parts))
+        self.assertIsInstance(parts[-1], bytes)
+
+    def test_invalid(self):
+        invalid = [
+            create_spec(mix={"start": 1, "restart": 1}),
+            create_spec(messages={"start": {"avps": {"No-Such-Attr": 1}}}),
+            create_spec(messages={"start": {"avps": {
+                "Acct-Status-Type": "No-Such-Value"}}}),
+            create_spec(messages={"start": {"avps": {
+                "Acct-Status-Type": {"uniform": [1, 3]}}}}),
+            create_spec(messages={"start": {"avps": {
+                "User-Name": {"uniform": [1, 3]}}}}),
+            create_spec(messages={"start": {"code": 1, "avps": {
+                "User-Name": "alice"}}}),
+            create_spec(lifecycle=["start"]),
+            create_spec(mix=None, lifecycle=[
+                {"message": "start", "repeat": [0, 1]}]),
+        ]
+        invalid[-1].pop("mix")
+        for spec in invalid:
+            with self.assertRaises(ValueError):
+                scenario.Scenario(spec)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "scenario.json")
+            with open(path, "w") as f:
+                json.dump(create_spec(), f)
+            self.assertEqual(3, len(scenario.load(path).templates))
+            with open(path, "w") as f:
+                f.write("{")
+            with self.assertRaises(ValueError):
+                scenario.load(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+#
+# test_spool.py
+# Author: Alex Kozadaev (2014)
+#
+
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from libradi import spool
+
+
+def make_packets(count):
+    return [bytes((4, n & 0xff)) + (20 + n % 50).to_bytes(2, "big") +
+            bytes(16 + n % 50) for n in range(count)]
+
+
+class SpoolTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix=".spool")
+        os.close(fd)
+        self.packets = make_packets(300)
+        with spool.SpoolWriter(self.filename, buffer_size=1000) as writer:
+            for packet in self.packets:
+                writer.write(packet)
+        self.assertEqual(300, writer.count)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def receive(self, count, **kwargs):
+        """blast the spool to a local socket returning the received"""
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(0.5)
+        received = []
+
+        def receiver():
+            try:
+                while True:
+                    received.append(server.recv(4096))
+            except socket.timeout:
+                pass
+
+        thread = threading.Thread(target=receiver)
+        thread.start()
+        try:
+            with spool.Spool(self.filename) as packets:
+                sent, elapsed = spool.blast(packets, server.getsockname(),
+                                            count, **kwargs)
+        finally:
+            thread.join()
+            server.close()
+        self.assertEqual(count, sent)
+        return received
+
+    def test_spool(self):
+        with spool.Spool(self.filename) as packets:
+            self.assertEqual(300, len(packets))
+            self.assertEqual(self.packets, [bytes(packet)
+                                            for packet in packets])
+            self.assertIsInstance(packets[5], memoryview)
+
+    def test_truncated(self):
+        with open(self.filename, "ab") as f:
+            f.write(b"\x00\x30" + bytes(10))
+        with spool.Spool(self.filename) as packets:
+            self.assertEqual(300, len(packets))
+
+    def test_not_a_spool(self):
+        with open(self.filename, "wb") as f:
+            f.write(b"\xd4\xc3\xb2\xa1" + bytes(20))
+        with self.assertRaises(ValueError):
+            spool.Spool(self.filename)
+
+    def test_blast(self):
+        received = self.receive(300)
+        self.assertEqual(self.packets, received)
+        with spool.Spool(self.filename) as packets:
+            with self.assertRaises(ValueError):  # never repeated
+                spool.blast(packets, ("127.0.0.1", 9), 301)
+
+    def test_blast_refused(self):
+        closed = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        closed.bind(("127.0.0.1", 0))
+        dest = closed.getsockname()
+        closed.close()  # nothing listens - the packets are refused
+        vector = spool.MessageVector
+        with spool.Spool(self.filename) as packets:
+            self.assertEqual(300, spool.blast(packets, dest)[0])
+
+            def unavailable(packets):
+                raise OSError("sendmmsg() is not available")
+
+            spool.MessageVector = unavailable
+            try:
+                self.assertEqual(300, spool.blast(packets, dest,
+                                                  batch=7)[0])
+            finally:
+                spool.MessageVector = vector
+
+    def test_blast_fallback(self):
+        vector = spool.MessageVector
+
+        def unavailable(packets):
+            raise OSError("sendmmsg() is not available")
+
+        spool.MessageVector = unavailable
+        try:
+            received = self.receive(300, batch=7)
+        finally:
+            spool.MessageVector = vector
+        self.assertEqual(self.packets, received)
+
+    def test_blast_rate(self):
+        received = self.receive(100, rate=1000)
+        self.assertEqual(self.packets[:100], received)
+
+
+if __name__ == "__main__":
+    unittest.main()
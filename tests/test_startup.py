@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#
+# test_startup.py
+# Author: Alex Kozadaev (2014)
+#
+
+import getopt
+import radi
+import subprocess
+import sys
+import unittest
+
+SHORTOPTS = "hd:u:p:STIRi:t:f:c:C:a:D:LP:v"
+LONGOPTS = ["help", "destination=", "user=", "secret=", "start", "replay=",
+            "replay-id=", "profile=", "list-profiles"]
+
+
+class StartupTest(unittest.TestCase):
+
+    def test_lazy_submodules(self):
+        code = ("import sys, libradi; "
+                "print(sorted(m for m in sys.modules if '.' in m and "
+                "m.startswith('libradi')))")
+        output = subprocess.run([sys.executable, "-c", code],
+                                stdout=subprocess.PIPE, check=True).stdout
+        self.assertEqual(b"[]\n", output)
+
+    def test_help(self):
+        imports = subprocess.run(
+            [sys.executable, "-X", "importtime", "radi.py", "-h"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            check=True).stderr.decode("utf-8")
+        modules = {line.rpartition("|")[2].strip()
+                   for line in imports.splitlines()}
+        self.assertIn("libradi.config", modules)
+        self.assertFalse({"json", "re", "gettext", "socket",
+                          "libradi.radtypes"} & modules)
+
+    def test_supported_types(self):
+        import libradi
+        self.assertEqual(list(radi.SUPPORTED_TYPES),
+                         libradi.radtypes.get_supported_types())
+
+    def test_lazy_attributes(self):
+        import libradi
+        self.assertIsNotNone(libradi.radtypes.get_supported_types())
+        self.assertIs(libradi.RadiusAvp, libradi.radius.RadiusAvp)
+        with self.assertRaises(AttributeError):
+            libradi.no_such_module
+
+    def test_getopt(self):
+        for args in (["-S", "-d", "10.0.0.1", "-a", "x=1", "-ay=2"],
+                     ["-vSp", "secret", "--dest=::1", "--start", "rest"],
+                     ["--replay", "file.pcap", "--replay-id=7", "--"],
+                     ["--prof", "name", "-L", "-", "-S"],
+                     ["--list-profiles", "--help"]):
+            self.assertEqual(getopt.getopt(args, SHORTOPTS, LONGOPTS),
+                             radi.getopt(args, SHORTOPTS, LONGOPTS))
+
+    def test_getopt_errors(self):
+        for args in (["-x"], ["-d"], ["--replay"], ["--re", "x"],
+                     ["--start=1"], ["--nope"]):
+            with self.assertRaises(getopt.GetoptError):
+                getopt.getopt(args, SHORTOPTS, LONGOPTS)
+            with self.assertRaises(radi.GetoptError):
+                radi.getopt(args, SHORTOPTS, LONGOPTS)
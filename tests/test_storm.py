@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# test_storm.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import asyncio
+import collections
+import random
+import unittest
+
+from libradi import decoder
+from libradi import storm
+
+
+class Collector(libradi.server.AccountingServer):
+
+    def __init__(self, secret):
+        super().__init__(secret)
+        self.packets = []
+
+    def process(self, data, addr):
+        self.packets.append(bytes(data))
+        return super().process(data, addr)
+
+
+def decode(packet):
+    values = {}
+    for vendor_id, attr_id, value in decoder.iter_attributes(packet):
+        attr_def = libradi.dictionary.get_attribute_by_id(attr_id, vendor_id)
+        values[attr_def.attr_name] = str(decoder.decode_value(attr_def,
+                                                              value))
+    return values
+
+
+class StormTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+
+    def run_storm(self, nas_storm, secret="secret", **kwargs):
+        async def run():
+            server = await libradi.server.start_server(("127.0.0.1", 0),
+                                                       "secret", Collector)
+            port = server.transport.get_extra_info("sockname")[1]
+            client = await libradi.client.open_client(
+                ("127.0.0.1", port), secret, **kwargs)
+            try:
+                return await nas_storm.run(client, 32), server
+            finally:
+                client.close()
+                server.close()
+
+        return asyncio.run(run())
+
+    def test_parse_distribution(self):
+        rand = random.Random(1)
+        self.assertEqual(2.0, storm.parse_distribution("constant:2")(rand))
+        delays = [storm.parse_distribution("uniform:5")(rand)
+                  for n in range(1000)]
+        self.assertTrue(0 <= min(delays) and max(delays) <= 5)
+        delays = [storm.parse_distribution("exponential:2")(rand)
+                  for n in range(1000)]
+        self.assertAlmostEqual(2.0, sum(delays) / len(delays), delta=0.3)
+        for spec in ("uniform", "exponential:0", "normal:1", "uniform:x",
+                     "constant:-1"):
+            with self.assertRaises(ValueError):
+                storm.parse_distribution(spec)
+
+    def test_schedule(self):
+        nas_storm = storm.Storm(4, 50, "exponential:1", down_time=2.0,
+                                spread=0.5)
+        events = list(nas_storm.events())
+        self.assertEqual(len(nas_storm), len(events))
+        self.assertEqual(sorted(events), events)
+        for nas in nas_storm.nas:
+            times = [(session, due) for due, index, session in events
+                     if index == nas.index]
+            self.assertEqual([(storm.OFF, nas.reboot),
+                              (storm.ON, nas.reboot + 2.0)], times[:2])
+            self.assertTrue(all(due >= nas.reboot + 2.0
+                                for session, due in times[2:]))
+            self.assertEqual(list(range(50)),
+                             sorted(session for session, due in times[2:]))
+
+    def test_storm(self):
+        nas_storm = storm.Storm(3, 20, "uniform:0.2", down_time=0.05,
+                                avps=[("Called-Station-Id", "web.apn")])
+        (phases, lag), server = self.run_storm(nas_storm, timeout=0.5)
+        self.assertEqual([(3, 3, 0), (3, 3, 0), (60, 60, 0)],
+                         [(phase.sent, phase.acked, phase.lost)
+                          for phase in phases])
+        self.assertEqual(60, phases[2].histogram.total)
+        self.assertEqual(66, len(server.packets))
+
+        status = collections.defaultdict(list)
+        users = set()
+        for packet in server.packets:
+            values = decode(packet)
+            nas = (values["NAS-IP-Address"], values["NAS-Identifier"])
+            status[nas].append(values["Acct-Status-Type"])
+            if values["Acct-Status-Type"] == "1":
+                users.add(values["User-Name"])
+                self.assertEqual(values["User-Name"], values["3GPP-IMSI"])
+                self.assertEqual("web.apn", values["Called-Station-Id"])
+        self.assertEqual({("10.255.0.1", "nas0"), ("10.255.0.2", "nas1"),
+                          ("10.255.0.3", "nas2")}, set(status))
+        for statuses in status.values():
+            self.assertEqual(["8", "7"] + ["1"] * 20, statuses)
+        self.assertEqual(60, len(users))
+
+    def test_loss(self):
+        (phases, lag), server = self.run_storm(
+            storm.Storm(2, 5, "constant:0", down_time=0), "wrong",
+            timeout=0.05, retries=0)
+        self.assertEqual([2, 2, 10], [phase.lost for phase in phases])
+        self.assertEqual(0, sum(phase.acked for phase in phases))
+        self.assertEqual(14, server.invalid)
+
+
+if __name__ == "__main__":
+    unittest.main()
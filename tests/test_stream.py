@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+#
+# test_stream.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import asyncio
+import functools
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from libradi import stream
+
+
+class Collector(stream.PacketStream):
+
+    def __init__(self):
+        super().__init__()
+        self.packets = []
+
+    def packet_received(self, packet):
+        self.packets.append(bytes(packet))
+
+    def feed(self, data, chunk):
+        for offset in range(0, len(data), chunk):
+            part = data[offset:offset + chunk]
+            buffer = self.get_buffer(len(part))
+            buffer[:len(part)] = part
+            self.buffer_updated(len(part))
+
+
+class StreamTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.cert = os.path.join(cls.tmpdir, "cert.pem")
+        cls.key = os.path.join(cls.tmpdir, "key.pem")
+        if shutil.which("openssl"):
+            subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048",
+                            "-nodes", "-days", "1", "-subj", "/CN=radsec",
+                            "-keyout", cls.key, "-out", cls.cert],
+                           check=True, capture_output=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+
+    def create_message(self, secret="secret"):
+        message = libradi.RadiusMessage(secret)
+        message.add_avp(libradi.RadiusAvp("User-Name", "alice"))
+        message.add_avp(libradi.RadiusAvp("Acct-Status-Type", 1))
+        return message
+
+    def run_pool(self, count, secret="secret", tls=False, connections=2,
+                 protocol=libradi.server.AccountingServer, requests=None):
+        server_ssl = client_ssl = None
+        if tls:
+            if not os.path.exists(self.cert):
+                self.skipTest("openssl is not available")
+            server_ssl = stream.server_context(self.cert, self.key)
+            client_ssl = stream.client_context(self.cert)
+
+        async def run():
+            listener, server = await stream.start_stream_server(
+                ("127.0.0.1", 0), "secret", protocol, server_ssl)
+            port = listener.sockets[0].getsockname()[1]
+            pool = await stream.open_pool(("127.0.0.1", port), secret,
+                                          client_ssl, connections,
+                                          timeout=0.5)
+            message = self.create_message(secret)
+            try:
+                if requests is None:
+                    responses = await asyncio.gather(
+                        *[pool.request(message) for n in range(count)])
+                else:
+                    responses = await requests(pool)
+            finally:
+                pool.close()
+                listener.close()
+                await listener.wait_closed()
+            return responses, pool, server
+
+        return asyncio.run(run())
+
+    def test_framing(self):
+        packets = [self.create_message().dump() for n in range(3)]
+        packets.append(b"\x05\x01\x00\x14" + bytes(16))
+        for chunk in (1, 7, 1000):
+            collector = Collector()
+            collector.feed(b"".join(packets), chunk)
+            self.assertEqual(packets, collector.packets)
+            self.assertEqual(0, collector.filled)
+
+    def test_partial_packet(self):
+        collector = Collector()
+        packet = self.create_message().dump()
+        collector.feed(packet + packet[:30], 1000)
+        self.assertEqual([packet], collector.packets)
+        self.assertEqual(packet[:30], bytes(collector.buffer[:30]))
+        self.assertEqual(30, collector.filled)
+
+    def test_tcp(self):
+        responses, pool, server = self.run_pool(600)
+        self.assertEqual(600, pool.stats.acked)
+        self.assertEqual(600, server.responses)
+        self.assertEqual(2, len(pool.connections))
+        for response in responses:
+            self.assertEqual(libradi.server.ACCOUNTING_RESPONSE, response[0])
+
+    def test_tls(self):
+        responses, pool, server = self.run_pool(300, tls=True)
+        self.assertEqual((300, 0), (pool.stats.acked, pool.stats.timeouts))
+        self.assertEqual(300, server.responses)
+
+    def test_timeout(self):
+        responses, pool, server = self.run_pool(3, "wrong", connections=1)
+        self.assertEqual([None] * 3, responses)
+        self.assertEqual((3, 0), (pool.stats.timeouts,
+                                  pool.stats.retransmits))
+        self.assertEqual(3, server.invalid)
+
+    def test_reconnect(self):
+        async def requests(pool):
+            first = await pool.request(self.create_message())
+            pool.connections[0].transport.abort()
+            await asyncio.sleep(0.01)
+            self.assertTrue(pool.connections[0].closed)
+            second = await pool.request(self.create_message())
+            self.assertFalse(pool.connections[0].closed)
+            return first, second
+
+        responses, pool, server = self.run_pool(0, connections=1,
+                                                requests=requests)
+        self.assertEqual([libradi.server.ACCOUNTING_RESPONSE] * 2,
+                         [response[0] for response in responses])
+
+    def test_eap_over_tls(self):
+        async def requests(pool):
+            return await asyncio.gather(
+                *[libradi.eap.EapConversation(pool, f"user{n}", "pw").run()
+                  for n in range(20)])
+
+        responses, pool, server = self.run_pool(
+            0, tls=True, requests=requests,
+            protocol=functools.partial(libradi.server.EapServer,
+                                       password="pw"))
+        self.assertEqual([libradi.eap.ACCESS_ACCEPT] * 20, responses)
+        self.assertEqual(20, server.accepts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# test_usage.py
+# Author: Alex Kozadaev (2014)
+#
+
+import libradi
+import unittest
+
+from libradi import usage
+
+
+class UsageTest(unittest.TestCase):
+
+    def setUp(self):
+        libradi.dictionary.initialize("dict", "dictionary")
+        self.model = usage.UsageModel(seed=3)
+
+    def test_sessions(self):
+        first, second = self.model.session(7, 10.0), self.model.session(7)
+        self.assertEqual((first.input_rate, first.output_rate, first.phase),
+                         (second.input_rate, second.output_rate,
+                          second.phase))
+        rates = [self.model.session(n).output_rate for n in range(5000)]
+        self.assertAlmostEqual(20000, sum(rates) / len(rates), delta=1000)
+        self.assertEqual(5000, len(set(rates)))
+
+    def test_counters(self):
+        session = self.model.session(1, 100.0)
+        self.assertEqual((0,) * 7, self.model.counters(session, 50.0))
+        previous = self.model.counters(session, 100.0)
+        for timestamp in range(101, 2000, 7):
+            counters = self.model.counters(session, timestamp)
+            self.assertTrue(all(value >= last for value, last in
+                                zip(counters, previous)))
+            previous = counters
+        self.assertEqual(1898, previous[-1])  # at 1998
+        # the waves even out over the whole periods
+        input_octets = self.model.counters(session, 100.0 + 600)[0]
+        self.assertAlmostEqual(session.input_rate * 600, input_octets,
+                               delta=1)
+
+    def test_gigawords(self):
+        model = usage.UsageModel("constant:1e9", "constant:3e9",
+                                 input_packet=1000, burstiness=0)
+        session = model.session(0)
+        self.assertEqual((5 * 10 ** 9 - 2 ** 32, 15 * 10 ** 9 - 3 * 2 ** 32,
+                          1, 3, 5 * 10 ** 6, 12500000, 5),
+                         model.counters(session, 5.0))
+
+    def test_dump(self):
+        session = self.model.session(2)
+        binary = self.model.dump(session, 1234.0)
+        values = [int(value.value) for attr, value in
+                  libradi.decoder.decode_attributes(
+                      b"\x04\x00" + (20 + len(binary)).to_bytes(2, "big") +
+                      bytes(16) + binary)]
+        self.assertEqual(list(self.model.counters(session, 1234.0)), values)
+
+    def test_invalid(self):
+        for kwargs in ({"input_rate": "normal:1"}, {"input_packet": 0},
+                       {"burstiness": 2}, {"period": 0}):
+            with self.assertRaises(ValueError):
+                usage.UsageModel(**kwargs)
+
+
+if __name__ == "__main__":
+    unittest.main()